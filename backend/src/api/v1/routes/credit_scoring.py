@@ -2,17 +2,27 @@
 Credit Scoring API Routes
 Multimodal credit assessment using ML + Gemini AI
 """
-from fastapi import APIRouter, HTTPException
-from typing import Optional, Dict, Any
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from typing import Optional, Dict, Any, Callable, List, Literal, Tuple
+from pydantic import BaseModel, Field
 from datetime import datetime
+import asyncio
+import json
+import math
 
 from utils.config import get_settings
+from services.gemini.rate_limiter import BATCH, current_priority, quota_priority
+from utils.concurrency import SingleFlight
 from supabase import create_client
 
 # Try to import scoring engine, but make it optional
 try:
     from services.scoring.adaptive_engine import AdaptiveScoringEngine
+    from services.scoring.explanations import DeferredExplanations
+    from services.scoring.rescoring import RescoringEngine
+    from services.scoring.backtesting import Backtester, join_outcomes
     SCORING_AVAILABLE = True
 except ImportError as e:
     SCORING_AVAILABLE = False
@@ -23,16 +33,63 @@ supabase = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
 
 router = APIRouter(prefix="/credit-scoring", tags=["Credit Scoring"])
 
-# Initialize scoring engine if available
+# Initialize scoring engine if available (the ML model and Gemini clients load on first use)
 scoring_engine = AdaptiveScoringEngine() if SCORING_AVAILABLE else None
 
 
+def _store_explanation(assessment_id: str, explanation: str):
+    """Write a deferred explanation onto its credit_assessments row"""
+    supabase.table('credit_assessments').update({'risk_explanation': explanation}).eq('id', assessment_id).execute()
+
+
+# Rows per request when paging through a table (PostgREST caps each response)
+FETCH_PAGE_SIZE = 1000
+
+
+def _fetch_all(build_query: Callable[[], Any], limit: Optional[int] = None) -> List[Dict]:
+    """
+    Run a select page by page with .range() until it runs out of rows
+
+    Args:
+        build_query: Returns a fresh, consistently ordered select for each page
+        limit: Stop after this many rows (None for all)
+    """
+    rows: List[Dict] = []
+    while limit is None or len(rows) < limit:
+        page_size = FETCH_PAGE_SIZE if limit is None else min(FETCH_PAGE_SIZE, limit - len(rows))
+        page = build_query().range(len(rows), len(rows) + page_size - 1).execute().data or []
+        if not page:
+            break
+        rows.extend(page)
+    return rows
+
+
+# Concurrent /assess calls for the same borrower and options (double-clicks,
+# client retries) share one running assessment
+in_flight_assessments = SingleFlight()
+
+deferred_explanations = DeferredExplanations(
+    generate=scoring_engine.generate_explanation,
+    persist=_store_explanation,
+    fallback=scoring_engine.fallback_explanation,
+) if SCORING_AVAILABLE else None
+
+
 # Pydantic models
 class CreditAssessmentRequest(BaseModel):
     borrower_id: str
     include_photos: bool = True
     include_field_notes: bool = True
     save_to_database: bool = True
+    # inline: explanation in the response; background: generated after responding;
+    # on_demand: generated on first GET /assessments/{id}/explanation (deferred
+    # modes need save_to_database, otherwise explanation_status is "unavailable")
+    explanation_mode: Literal["inline", "background", "on_demand"] = "inline"
+    # Latency budget for the whole assessment; stages still running when it
+    # runs out fall back to rule-based results (see degraded_stages)
+    time_budget_ms: Optional[int] = Field(default=None, gt=0)
+    # Re-score even when nothing changed since the latest stored assessment
+    force_refresh: bool = False
 
 
 class CreditAssessmentResponse(BaseModel):
@@ -48,9 +105,338 @@ class CreditAssessmentResponse(BaseModel):
     income_validation: Optional[Dict[str, Any]]
     loan_recommendation: Optional[Dict[str, Any]]
     risk_explanation: Optional[str]
+    assessment_id: Optional[str] = None
+    explanation_id: Optional[str] = None
+    explanation_status: Optional[str] = None
+    stage_timings: Optional[Dict[str, float]] = None
+    degraded_stages: List[str] = []
+    reused_assessment: bool = False
     model_version: str
 
 
+class RescoreRequest(BaseModel):
+    # Rule overrides merged over the live tables (see services/scoring/rescoring.py)
+    fusion_weights: Optional[Dict[str, float]] = None
+    risk_cutoffs: Optional[List[Tuple[float, str]]] = None
+    vision_points: Optional[Dict[str, Dict[str, float]]] = None
+    nlp_sentiment_points: Optional[List[Tuple[float, float]]] = None
+    nlp_low_sentiment_points: Optional[float] = None
+    nlp_behavior_points: Optional[Dict[str, Dict[str, float]]] = None
+    nlp_risk_flag_points: Optional[Dict[str, float]] = None
+    # Most recent assessments to rescore
+    limit: int = Field(default=1000, gt=0, le=100000)
+    # Return up to this many assessments whose risk category changed
+    max_changes: int = Field(default=50, ge=0)
+
+
+class LoanSimulationRequest(BaseModel):
+    # Loan amounts to try (default: 25% to 125% of the assessment's max safe loan)
+    amounts: Optional[List[float]] = None
+    term_weeks: List[int] = [12, 16, 20, 24, 36, 52]
+    income_multipliers: List[float] = [0.7, 0.85, 1.0, 1.15, 1.3]
+
+
+# Largest (amount x term x income) grid one simulation may evaluate
+MAX_SIMULATION_CELLS = 10000
+
+
+class BacktestRequest(BaseModel):
+    vision_weights: List[float] = Field(default_factory=lambda: [round(0.1 * step, 1) for step in range(11)], min_length=1)
+    nlp_weights: List[float] = Field(default_factory=lambda: [round(0.1 * step, 1) for step in range(11)], min_length=1)
+    # Each entry: minimum scores for low, medium and high risk (default: live cutoffs)
+    risk_cutoffs: Optional[List[Tuple[float, float, float]]] = None
+    approve_categories: List[Literal["low", "medium", "high", "very_high"]] = ["low", "medium"]
+    min_approval_rate: float = Field(default=0.5, ge=0, le=1)
+    # Configurations returned, lowest expected loss first
+    top: int = Field(default=20, gt=0)
+
+
+def _build_assessment_row(borrower_id: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    """Map an engine result onto the credit_assessments columns"""
+    income = result.get('income_validation') or {}
+    loan = result.get('loan_recommendation') or {}
+
+    return {
+        'borrower_id': borrower_id,
+        'ml_baseline_score': result['ml_baseline_score'],
+        'ml_model_version': result.get('ml_model_version'),
+        'ml_features_used': result.get('ml_features_used'),
+        'vision_score_adjustment': result.get('vision_score_adjustment', 0.0),
+        'vision_confidence': result.get('vision_confidence'),
+        'vision_insights': result.get('vision_insights'),
+        'nlp_score_adjustment': result.get('nlp_score_adjustment', 0.0),
+        'nlp_confidence': result.get('nlp_confidence'),
+        'nlp_insights': result.get('nlp_insights'),
+        'final_credit_score': result['final_credit_score'],
+        'risk_category': result['risk_category'],
+        'claimed_income': income.get('claimed_income'),
+        'ai_estimated_income': income.get('ai_estimated_income'),
+        'income_consistency_score': income.get('income_consistency_score'),
+        'income_variance_percentage': income.get('variance_percentage'),
+        'recommended_loan_amount': loan.get('recommended_loan_amount'),
+        'max_safe_loan_amount': loan.get('max_safe_loan_amount'),
+        'recommended_term_weeks': loan.get('recommended_term_weeks'),
+        'recommendation_confidence': loan.get('recommendation_confidence'),
+        'risk_explanation': result.get('risk_explanation'),
+        'risk_factors': result.get('risk_factors'),
+        'positive_factors': result.get('positive_factors'),
+        'assessment_version': result.get('model_version'),
+        'input_fingerprint': result.get('input_fingerprint'),
+    }
+
+
+def _save_assessment(borrower_id: str, result: Dict[str, Any]) -> Optional[str]:
+    """Insert an assessment row and return its id (None if it could not be saved)"""
+    row = _build_assessment_row(borrower_id, result)
+    try:
+        try:
+            response = supabase.table('credit_assessments').insert(row).execute()
+        except Exception as db_error:
+            # Databases created before input_fingerprint existed
+            print(f"Warning: Could not save assessment with input fingerprint, retrying without: {db_error}")
+            row.pop('input_fingerprint')
+            response = supabase.table('credit_assessments').insert(row).execute()
+    except Exception as db_error:
+        # Fall back to the core score columns if the full row is rejected
+        print(f"Warning: Could not save full assessment, saving scores only: {db_error}")
+        try:
+            response = supabase.table('credit_assessments').insert({
+                'borrower_id': borrower_id,
+                'ml_baseline_score': result['ml_baseline_score'],
+                'vision_score_adjustment': result.get('vision_score_adjustment', 0.0),
+                'nlp_score_adjustment': result.get('nlp_score_adjustment', 0.0),
+                'final_credit_score': result['final_credit_score'],
+                'risk_category': result['risk_category']
+            }).execute()
+        except Exception as db_error:
+            # Log error but don't fail the assessment
+            print(f"Warning: Could not save to database: {db_error}")
+            return None
+
+    return response.data[0]['id'] if response.data else None
+
+
+def _latest_assessment_row(borrower_id: str) -> Optional[Dict[str, Any]]:
+    """Latest stored assessment for a borrower (None if there is none or it cannot be read)"""
+    try:
+        response = supabase.table('credit_assessments').select('*').eq(
+            'borrower_id', borrower_id
+        ).order('assessed_at', desc=True).limit(1).execute()
+    except Exception as db_error:
+        print(f"Warning: Could not load latest assessment: {db_error}")
+        return None
+
+    return response.data[0] if response.data else None
+
+
+def _persist_artifact_analyses(artifact_updates: Optional[Dict[str, Any]]):
+    """Store newly computed vision/NLP analyses on their photo and field note rows"""
+    if not artifact_updates:
+        return
+
+    for update in artifact_updates.get('photos', []):
+        analysis = update['analysis']
+        completed = update['status'] == 'completed'
+        photo_data = {
+            'vision_analysis_status': update['status'],
+            'vision_analysis_result': analysis if completed else None,
+            'business_scale': analysis.get('business_scale') if completed else None,
+            'inventory_density': analysis.get('inventory_density') if completed else None,
+            'asset_quality': analysis.get('asset_quality') if completed else None,
+            'socioeconomic_indicators': analysis.get('socioeconomic_indicators') if completed else None,
+            'analyzed_at': update['analyzed_at'],
+        }
+        try:
+            supabase.table('photos').update(photo_data).eq('id', update['id']).execute()
+        except Exception as db_error:
+            print(f"Warning: Could not save photo analysis {update['id']}: {db_error}")
+
+    for update in artifact_updates.get('field_notes', []):
+        analysis = update['analysis']
+        completed = update['status'] == 'completed'
+        note_data = {
+            'nlp_analysis_status': update['status'],
+            'nlp_analysis_result': analysis if completed else None,
+            'extracted_income_estimate': analysis.get('extracted_income_estimate') if completed else None,
+            'sentiment_score': analysis.get('sentiment_score') if completed else None,
+            'risk_flags': analysis.get('risk_flags') if completed else None,
+            'behavioral_insights': analysis.get('behavioral_insights') if completed else None,
+            'analyzed_at': update['analyzed_at'],
+        }
+        try:
+            supabase.table('field_notes').update(note_data).eq('id', update['id']).execute()
+        except Exception as db_error:
+            print(f"Warning: Could not save field note analysis {update['id']}: {db_error}")
+
+
+def _load_assessment_inputs(request: CreditAssessmentRequest):
+    """Load borrower data with loan/repayment history, photos and field notes for an assessment"""
+    # Get borrower data
+    borrower_response = supabase.table('borrowers').select('*').eq('id', request.borrower_id).execute()
+    if not borrower_response.data:
+        raise HTTPException(status_code=404, detail="Borrower not found")
+
+    borrower_data = borrower_response.data[0]
+
+    # Get loans and repayments
+    loans_response = supabase.table('loans').select('*').eq('borrower_id', request.borrower_id).execute()
+    borrower_data['loans'] = loans_response.data
+
+    # Get repayments for each loan
+    all_repayments = []
+    for loan in loans_response.data:
+        repayments_response = supabase.table('repayments').select('*').eq('loan_id', loan['id']).execute()
+        all_repayments.extend(repayments_response.data)
+
+    borrower_data['repayments'] = all_repayments
+
+    # Calculate loan history statistics
+    borrower_data['loan_history'] = {
+        'num_loans': len(loans_response.data),
+        'avg_loan_amount': sum(loan['loan_amount'] for loan in loans_response.data) / len(loans_response.data) if loans_response.data else 0,
+        'total_borrowed': sum(loan['loan_amount'] for loan in loans_response.data)
+    }
+
+    # Calculate repayment history statistics
+    if all_repayments:
+        on_time = sum(1 for r in all_repayments if r['days_overdue'] == 0)
+        total_repayments = len(all_repayments)
+        avg_overdue = sum(r['days_overdue'] for r in all_repayments) / total_repayments
+
+        borrower_data['repayment_history'] = {
+            'num_loans': len(loans_response.data),
+            'on_time_rate': on_time / total_repayments,
+            'avg_days_overdue': avg_overdue,
+            'default_rate': 0.0,  # Can be enhanced with actual default tracking
+            'total_repayments': total_repayments
+        }
+    else:
+        borrower_data['repayment_history'] = {
+            'num_loans': 0,
+            'on_time_rate': 0.5,
+            'avg_days_overdue': 0.0,
+            'default_rate': 0.0,
+            'total_repayments': 0
+        }
+
+    # Get photos if requested
+    photos = None
+    if request.include_photos:
+        photos_response = supabase.table('photos').select('*').eq('borrower_id', request.borrower_id).execute()
+        photos = photos_response.data
+
+    # Get field notes if requested
+    field_notes = None
+    if request.include_field_notes:
+        notes_response = supabase.table('field_notes').select('*').eq('borrower_id', request.borrower_id).execute()
+        field_notes = notes_response.data
+
+    return borrower_data, photos, field_notes
+
+
+async def _finalize_assessment(request: CreditAssessmentRequest, assessment_result: Dict[str, Any]) -> Dict[str, Any]:
+    """Persist an engine result (Supabase writes run in a worker thread) and build the /assess response"""
+    # Write new per-photo / per-note analyses back for reuse by later assessments
+    await asyncio.to_thread(_persist_artifact_analyses, assessment_result.pop('artifact_updates', None))
+    explanation_context = assessment_result.pop('explanation_context', None)
+
+    # Save to database if requested (an unchanged, reused assessment already is)
+    reused_assessment_id = assessment_result.pop('reused_assessment_id', None)
+    assessment_id = reused_assessment_id
+    if request.save_to_database and reused_assessment_id is None:
+        assessment_id = await asyncio.to_thread(_save_assessment, request.borrower_id, assessment_result)
+
+    # Hand deferred explanations a handle the client can fetch later; only a
+    # saved row can be resolved by every worker
+    explanation_id = None
+    explanation_status = "completed"
+    if request.explanation_mode != "inline" and explanation_context is not None:
+        if assessment_id is None:
+            explanation_status = "unavailable"
+        else:
+            explanation_id = assessment_id
+            deferred_explanations.register(explanation_id, explanation_context)
+            if request.explanation_mode == "background":
+                deferred_explanations.start(explanation_id)
+            explanation_status = deferred_explanations.status(explanation_id)
+
+    return {
+        "borrower_id": request.borrower_id,
+        "assessment_date": datetime.now(),
+        **assessment_result,
+        "assessment_id": assessment_id,
+        "explanation_id": explanation_id,
+        "explanation_status": explanation_status,
+        "reused_assessment": reused_assessment_id is not None
+    }
+
+
+def _require_scoring_engine():
+    """Raise 503 when the scoring engine could not be loaded"""
+    if not SCORING_AVAILABLE or scoring_engine is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Credit scoring engine not available. ML dependencies (scikit-learn) not installed."
+        )
+
+
+async def _request_options(request: CreditAssessmentRequest) -> Dict[str, Any]:
+    """Engine options derived from a request: time budget and the assessment to reuse"""
+    options = {}
+    if request.time_budget_ms is not None:
+        options['time_budget'] = request.time_budget_ms / 1000
+    if not request.force_refresh:
+        options['latest_assessment'] = await asyncio.to_thread(_latest_assessment_row, request.borrower_id)
+    return options
+
+
+def _format_sse(event: str, data: Any) -> str:
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def _assessment_key(request: CreditAssessmentRequest) -> tuple:
+    """
+    Coalescing key: the borrower, every assessment option and the quota priority
+
+    The priority is part of the key so an /assess call never waits on a flight
+    whose Gemini calls were started at batch priority.
+    """
+    return (current_priority(), *sorted(request.model_dump().items()))
+
+
+async def _run_assessment(
+    request: CreditAssessmentRequest,
+    inputs: Optional[tuple] = None,
+    ml_result: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Load inputs, run the engine and persist the result for one /assess request
+
+    /batch-assess passes inputs it already loaded and the ML result from its
+    batch prediction.
+    """
+    borrower_data, photos, field_notes = inputs or _load_assessment_inputs(request)
+
+    options = {
+        'save_to_db': False,  # We'll save manually
+        'defer_explanation': request.explanation_mode != "inline",
+        **(await _request_options(request))
+    }
+    if ml_result is not None:
+        options['ml_result'] = ml_result
+
+    # Perform assessment
+    assessment_result = await scoring_engine.assess_borrower(
+        borrower_data=borrower_data,
+        photos=photos,
+        field_notes=field_notes,
+        options=options
+    )
+
+    return await _finalize_assessment(request, assessment_result)
+
+
 # Routes
 @router.post("/assess", response_model=CreditAssessmentResponse)
 async def assess_borrower(request: CreditAssessmentRequest):
@@ -69,111 +455,218 @@ async def assess_borrower(request: CreditAssessmentRequest):
     - **include_photos**: Include photo analysis (default: True)
     - **include_field_notes**: Include field note analysis (default: True)
     - **save_to_database**: Save assessment to credit_assessments table (default: True)
+    - **explanation_mode**: inline (default), background or on_demand; deferred modes return
+      an explanation_id to fetch from /assessments/{explanation_id}/explanation
+    - **time_budget_ms**: Optional latency budget; vision, NLP and explanation work still
+      running when it runs out uses the fallback analysis and is listed in degraded_stages
+    - **force_refresh**: Re-score even if the inputs match the latest stored assessment
+      (otherwise that assessment is returned with reused_assessment set)
     """
-    # Check if scoring engine is available
-    if not SCORING_AVAILABLE or scoring_engine is None:
-        raise HTTPException(
-            status_code=503,
-            detail="Credit scoring engine not available. ML dependencies (scikit-learn) not installed."
-        )
+    _require_scoring_engine()
 
     try:
-        # Get borrower data
-        borrower_response = supabase.table('borrowers').select('*').eq('id', request.borrower_id).execute()
-        if not borrower_response.data:
-            raise HTTPException(status_code=404, detail="Borrower not found")
+        # Identical requests already running share that assessment and its saved row
+        return await in_flight_assessments.do(
+            _assessment_key(request), lambda: _run_assessment(request)
+        )
 
-        borrower_data = borrower_response.data[0]
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Assessment error: {str(e)}")
 
-        # Get loans and repayments
-        loans_response = supabase.table('loans').select('*').eq('borrower_id', request.borrower_id).execute()
-        borrower_data['loans'] = loans_response.data
 
-        # Get repayments for each loan
-        all_repayments = []
-        for loan in loans_response.data:
-            repayments_response = supabase.table('repayments').select('*').eq('loan_id', loan['id']).execute()
-            all_repayments.extend(repayments_response.data)
+@router.post("/assess/stream")
+async def assess_borrower_stream(request: CreditAssessmentRequest, http_request: Request):
+    """
+    Perform a credit assessment, streaming each stage as Server-Sent Events
 
-        borrower_data['repayments'] = all_repayments
+    Takes the same body as /assess. Events are sent as soon as their stage
+    finishes: ml_baseline, vision_photo (one per photo), vision, nlp_note
+    (one per note), nlp, score, income_validation, loan_recommendation and
+    explanation (inline mode only). The stream ends with an assessment event
+    holding the full /assess response, or an error event.
+    """
+    _require_scoring_engine()
 
-        # Calculate loan history statistics
-        borrower_data['loan_history'] = {
-            'num_loans': len(loans_response.data),
-            'avg_loan_amount': sum(loan['loan_amount'] for loan in loans_response.data) / len(loans_response.data) if loans_response.data else 0,
-            'total_borrowed': sum(loan['loan_amount'] for loan in loans_response.data)
-        }
+    # Resolve the borrower up front so an unknown id is still a plain 404
+    try:
+        borrower_data, photos, field_notes = _load_assessment_inputs(request)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Assessment error: {str(e)}")
 
-        # Calculate repayment history statistics
-        if all_repayments:
-            on_time = sum(1 for r in all_repayments if r['days_overdue'] == 0)
-            total_repayments = len(all_repayments)
-            avg_overdue = sum(r['days_overdue'] for r in all_repayments) / total_repayments
-
-            borrower_data['repayment_history'] = {
-                'num_loans': len(loans_response.data),
-                'on_time_rate': on_time / total_repayments,
-                'avg_days_overdue': avg_overdue,
-                'default_rate': 0.0,  # Can be enhanced with actual default tracking
-                'total_repayments': total_repayments
-            }
-        else:
-            borrower_data['repayment_history'] = {
-                'num_loans': 0,
-                'on_time_rate': 0.5,
-                'avg_days_overdue': 0.0,
-                'default_rate': 0.0,
-                'total_repayments': 0
-            }
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def on_event(event: str, data: Dict[str, Any]):
+        await queue.put((event, data))
+
+    async def run_assessment():
+        try:
+            assessment_result = await scoring_engine.assess_borrower(
+                borrower_data=borrower_data,
+                photos=photos,
+                field_notes=field_notes,
+                options={
+                    'save_to_db': False,
+                    'defer_explanation': request.explanation_mode != "inline",
+                    'on_event': on_event,
+                    **(await _request_options(request))
+                }
+            )
+            response = await _finalize_assessment(request, assessment_result)
+            await queue.put(("assessment", jsonable_encoder(response)))
+        except Exception as e:
+            await queue.put(("error", {"detail": f"Assessment error: {str(e)}"}))
+        finally:
+            await queue.put(None)
+
+    async def event_stream():
+        task = asyncio.create_task(run_assessment())
+        try:
+            while True:
+                message = await queue.get()
+                if message is None:
+                    break
+                yield _format_sse(*message)
+                if await http_request.is_disconnected():
+                    break
+        finally:
+            # Stop the assessment if the client went away before it finished
+            if not task.done():
+                task.cancel()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/assessments/{explanation_id}/explanation")
+async def get_assessment_explanation(explanation_id: str):
+    """
+    Get the risk explanation for an assessment, generating it on first fetch
+
+    - **explanation_id**: explanation_id returned by /assess (the saved assessment id)
 
-        # Get photos if requested
-        photos = None
-        if request.include_photos:
-            photos_response = supabase.table('photos').select('*').eq('borrower_id', request.borrower_id).execute()
-            photos = photos_response.data
-
-        # Get field notes if requested
-        field_notes = None
-        if request.include_field_notes:
-            notes_response = supabase.table('field_notes').select('*').eq('borrower_id', request.borrower_id).execute()
-            field_notes = notes_response.data
-
-        # Perform assessment
-        assessment_result = await scoring_engine.assess_borrower(
-            borrower_data=borrower_data,
-            photos=photos,
-            field_notes=field_notes,
-            options={'save_to_db': False}  # We'll save manually
+    explanation_status is "fallback" when Gemini could not generate the
+    explanation; the rule-based text is returned but not stored, so a later
+    fetch tries again.
+    """
+    if not SCORING_AVAILABLE or scoring_engine is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Credit scoring engine not available. ML dependencies (scikit-learn) not installed."
         )
 
-        # Save to database if requested
-        # Note: Only saving basic fields that exist in the database schema
-        if request.save_to_database:
-            assessment_data = {
-                'borrower_id': request.borrower_id,
-                'ml_baseline_score': assessment_result['ml_baseline_score'],
-                'vision_score_adjustment': assessment_result.get('vision_score_adjustment', 0.0),
-                'nlp_score_adjustment': assessment_result.get('nlp_score_adjustment', 0.0),
-                'final_credit_score': assessment_result['final_credit_score'],
-                'risk_category': assessment_result['risk_category']
-            }
+    try:
+        context = None
+        if deferred_explanations.status(explanation_id) is None:
+            # Not registered in this process - fall back to the stored assessment
+            response = supabase.table('credit_assessments').select('*').eq('id', explanation_id).execute()
+            if not response.data:
+                raise HTTPException(status_code=404, detail="Assessment explanation not found")
+
+            assessment = response.data[0]
+            if assessment.get('risk_explanation'):
+                return {
+                    "explanation_id": explanation_id,
+                    "explanation_status": "completed",
+                    "risk_explanation": assessment['risk_explanation']
+                }
 
-            try:
-                supabase.table('credit_assessments').insert(assessment_data).execute()
-            except Exception as db_error:
-                # Log error but don't fail the assessment
-                print(f"Warning: Could not save to database: {db_error}")
+            context = scoring_engine.explanation_context_from_assessment(assessment)
+
+        explanation = await deferred_explanations.resolve(explanation_id, context)
+        completed = deferred_explanations.status(explanation_id) == "completed"
 
         return {
-            "borrower_id": request.borrower_id,
-            "assessment_date": datetime.now(),
-            **assessment_result
+            "explanation_id": explanation_id,
+            "explanation_status": "completed" if completed else "fallback",
+            "risk_explanation": explanation
         }
 
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Assessment error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Explanation error: {str(e)}")
+
+
+@router.post("/assessments/{assessment_id}/simulate")
+async def simulate_loan_scenarios(assessment_id: str, request: LoanSimulationRequest):
+    """
+    What-if loan scenarios for a stored assessment
+
+    Evaluates every (amount, term_weeks, income multiplier) combination with
+    the loan recommendation rules, using the assessment's risk category and
+    estimated income. No ML or Gemini calls are made.
+
+    - **amounts**: Loan amounts (default: 25%-125% of the max safe loan)
+    - **term_weeks**: Loan terms in weeks
+    - **income_multipliers**: Income scenarios relative to the estimated income
+    """
+    _require_scoring_engine()
+
+    try:
+        response = supabase.table('credit_assessments').select('*').eq('id', assessment_id).execute()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    if not response.data:
+        raise HTTPException(status_code=404, detail="Assessment not found")
+
+    assessment = response.data[0]
+    risk_category = assessment['risk_category']
+    monthly_income = assessment.get('ai_estimated_income')
+    if monthly_income is None:
+        # Scores-only rows: rebuild the income estimate from the stored insights
+        rebuilt = scoring_engine.assessment_from_row(assessment, assessment.get('ml_features_used') or {})
+        monthly_income = rebuilt['income_validation']['ai_estimated_income']
+    monthly_income = float(monthly_income)
+
+    # Max safe loan at the estimated income (a one-cell grid)
+    baseline = scoring_engine.simulate_loans(risk_category, monthly_income, [0], [1], [1.0])
+    max_safe_loan = float(baseline['max_safe_loan_amount'][0, 0, 0])
+    amounts = request.amounts or [round(max_safe_loan * share, -3) for share in (0.25, 0.5, 0.75, 1.0, 1.25)]
+
+    cells = len(amounts) * len(request.term_weeks) * len(request.income_multipliers)
+    if cells == 0 or cells > MAX_SIMULATION_CELLS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Scenario grid must have between 1 and {MAX_SIMULATION_CELLS} cells (got {cells})"
+        )
+    if any(term <= 0 for term in request.term_weeks):
+        raise HTTPException(status_code=400, detail="term_weeks must be positive")
+
+    grid = scoring_engine.simulate_loans(
+        risk_category, monthly_income, amounts, request.term_weeks, request.income_multipliers
+    )
+    columns = {name: values.ravel().tolist() for name, values in grid.items()}
+    ratios = columns.pop('repayment_to_income_ratio')
+
+    return {
+        "assessment_id": assessment_id,
+        "borrower_id": assessment.get('borrower_id'),
+        "risk_category": risk_category,
+        "monthly_income": monthly_income,
+        "max_safe_loan_amount": max_safe_loan,
+        "recommended_loan_amount": assessment.get('recommended_loan_amount'),
+        "recommended_term_weeks": assessment.get('recommended_term_weeks'),
+        "axes": {
+            "amounts": amounts,
+            "term_weeks": request.term_weeks,
+            "income_multipliers": request.income_multipliers
+        },
+        "scenarios": [
+            {
+                **{name: values[index] for name, values in columns.items()},
+                # No income means no affordable repayment
+                "repayment_to_income_ratio": ratios[index] if math.isfinite(ratios[index]) else None
+            }
+            for index in range(cells)
+        ]
+    }
 
 
 @router.get("/{borrower_id}/history")
@@ -265,36 +758,194 @@ async def get_risk_distribution():
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
+@router.post("/rescore")
+async def rescore_assessments(request: RescoreRequest):
+    """
+    Re-fuse stored assessments under different scoring rules
+
+    Rebuilds scores, risk categories and loan recommendations from the stored
+    vision/NLP insights and borrower features, without calling Gemini. Nothing
+    is written back.
+
+    - **fusion_weights**, **risk_cutoffs**, **\*_points**: Rule overrides (omitted rules keep live values)
+    - **limit**: Most recent assessments to rescore (default: 1000)
+    - **max_changes**: Assessments with a changed risk category to return (default: 50)
+    """
+    _require_scoring_engine()
+
+    try:
+        rescoring = RescoringEngine(
+            engine=scoring_engine,
+            rules=request.model_dump(exclude={'limit', 'max_changes'}, exclude_none=True)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        assessments = await asyncio.to_thread(
+            _fetch_all,
+            lambda: supabase.table('credit_assessments')
+            .select('id, borrower_id, ml_baseline_score, vision_insights, nlp_insights, '
+                    'ml_features_used, final_credit_score, risk_category')
+            .order('assessed_at', desc=True)
+            .order('id'),
+            request.limit
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+    rescored = await asyncio.to_thread(rescoring.rescore, assessments)
+    changed = rescored['category_changed'].nonzero()[0][:request.max_changes]
+
+    return jsonable_encoder({
+        "summary": rescoring.summarize(rescored),
+        "changes": [
+            {
+                "assessment_id": rescored['assessment_id'][index],
+                "borrower_id": rescored['borrower_id'][index],
+                "previous_score": float(rescored['previous_score'][index]),
+                "final_credit_score": float(rescored['final_credit_score'][index]),
+                "previous_category": rescored['previous_category'][index],
+                "risk_category": rescored['risk_category'][index],
+                "recommended_loan_amount": float(rescored['recommended_loan_amount'][index]),
+            }
+            for index in changed
+        ]
+    })
+
+
+@router.post("/backtest")
+async def backtest_scoring_rules(request: BacktestRequest):
+    """
+    Evaluate fusion weights and risk cutoffs against realized loan outcomes
+
+    Each loan is paired with the assessment it was decided on; defaults come
+    from loans.loan_status and repayments.days_overdue. No Gemini calls are made.
+
+    - **vision_weights**, **nlp_weights**: Fusion weights to try (every pair is evaluated)
+    - **risk_cutoffs**: Cutoff sets to try as [low, medium, high] minimum scores
+    - **approve_categories**: Risk categories that would be lent to
+    - **min_approval_rate**: Approval rate the recommended configuration must reach
+    - **top**: Configurations to return, lowest expected loss first
+    """
+    _require_scoring_engine()
+
+    try:
+        assessments = await asyncio.to_thread(
+            _fetch_all,
+            lambda: supabase.table('credit_assessments')
+            .select('id, borrower_id, loan_id, assessed_at, ml_baseline_score, vision_insights, nlp_insights')
+            .order('id')
+        )
+        loans = await asyncio.to_thread(
+            _fetch_all,
+            lambda: supabase.table('loans')
+            .select('id, borrower_id, loan_amount, loan_status, created_at')
+            .neq('loan_status', 'pending')
+            .order('id')
+        )
+        repayments = await asyncio.to_thread(
+            _fetch_all,
+            lambda: supabase.table('repayments')
+            .select('id, loan_id, days_overdue, paid_amount')
+            .order('id')
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+    rows, outcomes = join_outcomes(assessments, loans, repayments)
+    if not rows:
+        raise HTTPException(status_code=404, detail="No loans with a prior assessment and an outcome to backtest")
+
+    backtester = Backtester(RescoringEngine(engine=scoring_engine))
+    result = await asyncio.to_thread(
+        backtester.backtest,
+        rows,
+        outcomes,
+        vision_weights=request.vision_weights,
+        nlp_weights=request.nlp_weights,
+        cutoff_grid=request.risk_cutoffs,
+        approve_categories=request.approve_categories,
+        min_approval_rate=request.min_approval_rate
+    )
+
+    configurations = result.pop('configurations')
+    return {
+        **result,
+        "configurations_evaluated": len(configurations),
+        "configurations": sorted(
+            configurations,
+            key=lambda c: (c['expected_loss'], -(c['auc'] if c['auc'] is not None else 0))
+        )[:request.top]
+    }
+
+
 @router.post("/batch-assess")
-async def batch_assess_borrowers(borrower_ids: list[str], save_to_database: bool = True):
+async def batch_assess_borrowers(
+    borrower_ids: list[str],
+    save_to_database: bool = True,
+    explanation_mode: Literal["inline", "background", "on_demand"] = "on_demand"
+):
     """
     Perform credit assessment for multiple borrowers
 
     - **borrower_ids**: List of borrower UUIDs
     - **save_to_database**: Save assessments to database (default: True)
+    - **explanation_mode**: Risk explanation handling (default: on_demand, i.e. skipped
+      until fetched from /assessments/{explanation_id}/explanation)
     """
+    _require_scoring_engine()
+
     try:
         results = []
         errors = []
 
+        # Load every borrower first so the ML baselines come from one batch prediction
+        loaded = []
         for borrower_id in borrower_ids:
+            request = CreditAssessmentRequest(
+                borrower_id=borrower_id,
+                include_photos=True,
+                include_field_notes=True,
+                save_to_database=save_to_database,
+                explanation_mode=explanation_mode
+            )
             try:
-                request = CreditAssessmentRequest(
-                    borrower_id=borrower_id,
-                    include_photos=True,
-                    include_field_notes=True,
-                    save_to_database=save_to_database
-                )
-
-                assessment = await assess_borrower(request)
-                results.append(assessment)
-
+                loaded.append((request, _load_assessment_inputs(request)))
             except Exception as e:
                 errors.append({
                     "borrower_id": borrower_id,
                     "error": str(e)
                 })
 
+        ml_model = await scoring_engine.load_ml_model()
+        ml_results = await asyncio.to_thread(ml_model.predict_batch, [inputs[0] for _, inputs in loaded])
+
+        # Batch work yields Gemini quota to interactive /assess calls
+        with quota_priority(BATCH):
+            if settings.NLP_BATCH_MODE:
+                # One set of multi-borrower NLP requests; assessments then hit the NLP memo
+                try:
+                    await scoring_engine.prefetch_field_note_analyses(
+                        [(inputs[0], inputs[2]) for _, inputs in loaded]
+                    )
+                except Exception as e:
+                    print(f"Warning: Field note prefetch failed, analyzing per borrower: {e}")
+
+            for (request, inputs), ml_result in zip(loaded, ml_results):
+                try:
+                    assessment = await in_flight_assessments.do(
+                        _assessment_key(request),
+                        lambda: _run_assessment(request, inputs, ml_result)
+                    )
+                    results.append(assessment)
+
+                except Exception as e:
+                    errors.append({
+                        "borrower_id": request.borrower_id,
+                        "error": str(e)
+                    })
+
         return {
             "total_requested": len(borrower_ids),
             "successful": len(results),
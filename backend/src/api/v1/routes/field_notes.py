@@ -2,6 +2,8 @@
 Field Notes API Routes
 Handles field agent notes and observations
 """
+import asyncio
+
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import JSONResponse
 from typing import List, Optional
@@ -9,6 +11,7 @@ from pydantic import BaseModel, UUID4
 from datetime import datetime, date
 from supabase import create_client
 
+from services.gemini.nlp_extractor import invalidate_note_analysis
 from utils.config import get_settings
 from utils.logger import logger
 
@@ -26,6 +29,13 @@ class FieldNoteCreate(BaseModel):
     field_agent_name: Optional[str] = None
 
 
+class FieldNoteUpdate(BaseModel):
+    note_text: Optional[str] = None
+    note_type: Optional[str] = None
+    visit_date: Optional[date] = None
+    field_agent_name: Optional[str] = None
+
+
 class FieldNoteResponse(BaseModel):
     id: UUID4
     borrower_id: UUID4
@@ -98,6 +108,51 @@ async def get_borrower_field_notes(borrower_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.patch("/{note_id}")
+async def update_field_note(note_id: str, update: FieldNoteUpdate):
+    """
+    Edit a field note
+
+    Editing the note text resets its NLP analysis to pending and drops any
+    memoized Gemini analysis for the note.
+
+    Args:
+        note_id: UUID of the field note to edit
+        update: Fields to change
+
+    Returns:
+        Updated field note
+    """
+    try:
+        update_data = update.model_dump(exclude_unset=True)
+        if not update_data:
+            raise HTTPException(status_code=400, detail="No fields to update")
+
+        if update_data.get("visit_date"):
+            update_data["visit_date"] = update_data["visit_date"].isoformat()
+
+        if "note_text" in update_data:
+            update_data["nlp_analysis_status"] = "pending"
+            update_data["nlp_analysis_result"] = None
+            update_data["analyzed_at"] = None
+
+        response = supabase.table('field_notes').update(update_data).eq('id', note_id).execute()
+
+        if not response.data or len(response.data) == 0:
+            raise HTTPException(status_code=404, detail="Field note not found")
+
+        await asyncio.to_thread(invalidate_note_analysis, note_id)
+
+        logger.info(f"Field note {note_id} updated successfully")
+        return response.data[0]
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error updating field note {note_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.delete("/{note_id}")
 async def delete_field_note(note_id: str):
     """
@@ -118,6 +173,7 @@ async def delete_field_note(note_id: str):
 
         # Delete the note
         delete_response = supabase.table('field_notes').delete().eq('id', note_id).execute()
+        await asyncio.to_thread(invalidate_note_analysis, note_id)
 
         logger.info(f"Field note {note_id} deleted successfully")
         return {"message": "Field note deleted successfully"}
@@ -1,3 +1,8 @@
+import asyncio
+import time
+
+_import_started = time.perf_counter()
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
@@ -5,19 +10,37 @@ from contextlib import asynccontextmanager
 
 from utils.config import get_settings
 from utils.logger import setup_logger
+from services.gemini.vision_analyzer import get_vision_cache
+from services.gemini.nlp_extractor import get_nlp_cache
+from services.gemini.circuit_breaker import breaker_stats
+from services.gemini.rate_limiter import get_quota_scheduler
+from services.ml_model.credit_risk_model import credit_model_stats, get_credit_risk_model
 
 # Import API routes
 from api.v1.routes import borrowers, loans, credit_scoring, photos, field_notes
 
+# Cold-start import cost; run `python -m utils.import_timing app` for a per-module breakdown
+IMPORT_SECONDS = time.perf_counter() - _import_started
+
 settings = get_settings()
 logger = setup_logger(settings.LOG_FILE, settings.LOG_LEVEL)
 
+# Load the model at import time, so `gunicorn --preload -k uvicorn.workers.UvicornWorker`
+# forks workers that already share it (uvicorn --workers spawns fresh processes,
+# which share only memory-mapped compiled models)
+if settings.ML_MODEL_PRELOAD:
+    get_credit_risk_model()
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup and shutdown events"""
     logger.info(f"Starting {settings.APP_NAME} v{settings.APP_VERSION}")
     logger.info(f"Environment: {settings.ENV}")
+    logger.info(f"Application modules imported in {IMPORT_SECONDS:.2f}s")
+    # Load the model before the first request instead of on the event loop
+    # during it (already loaded with ML_MODEL_PRELOAD)
+    await asyncio.to_thread(get_credit_risk_model)
     yield
     logger.info("Shutting down application")
 
@@ -61,6 +84,13 @@ async def health_check():
         "status": "healthy",
         "app": settings.APP_NAME,
         "version": settings.APP_VERSION,
+        "caches": {
+            "gemini_vision": get_vision_cache().stats(),
+            "gemini_nlp": get_nlp_cache().stats(),
+        },
+        "circuit_breakers": breaker_stats(),
+        "gemini_quota": get_quota_scheduler().stats(),
+        "ml_model": credit_model_stats(),
     }
 
 
@@ -54,6 +54,7 @@ class CreditAssessment(Base):
     # Metadata
     assessed_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
     assessment_version = Column(String(50))
+    input_fingerprint = Column(String(64))  # Hash of the inputs, for reusing unchanged assessments
 
     # Relationships
     borrower = relationship("Borrower", back_populates="credit_assessments")
@@ -0,0 +1,252 @@
+"""
+In-process result caches for Gemini analyses
+"""
+import asyncio
+import copy
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Hashable, Iterator, Optional, Tuple
+
+
+def content_hash(data: Any) -> str:
+    """SHA-256 hex digest of bytes or text"""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+class SQLiteResultStore:
+    """
+    Persistent JSON result store backed by a local SQLite file
+
+    Used behind TTLCache so memoized results survive restarts and are
+    shared by workers on the same host. Keys must be strings.
+    """
+
+    def __init__(self, db_path: str, ttl_seconds: float = 3600.0):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, tag TEXT, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_results_tag ON results(tag)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=5.0)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key: str) -> Optional[Tuple[Any, Optional[str], float]]:
+        """Return (value, tag, expires_at as a time.time() timestamp), or None on miss or expiry"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value, tag, expires_at FROM results WHERE key = ?", (key,)
+            ).fetchone()
+
+        if row is None or row[2] < time.time():
+            return None
+
+        return json.loads(row[0]), row[1], row[2]
+
+    def set(self, key: str, value: Any, tag: Optional[str] = None) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO results (key, tag, value, expires_at) VALUES (?, ?, ?, ?)",
+                (key, tag, json.dumps(value, default=str), time.time() + self.ttl_seconds),
+            )
+
+    def invalidate(self, key: str) -> bool:
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM results WHERE key = ?", (key,)).rowcount > 0
+
+    def invalidate_tag(self, tag: str) -> int:
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM results WHERE tag = ?", (tag,)).rowcount
+
+    def clear(self) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM results")
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache with per-entry TTL and hit/miss counters
+
+    Values are deep-copied on the way in and out so callers can mutate
+    the analyses they get back without corrupting the cache. Entries can
+    carry a tag (e.g. a record id) for explicit invalidation, and an
+    optional backing store is read on memory misses and written through.
+    Async callers use aget/aset, which run backing store I/O in a worker
+    thread instead of on the event loop.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 3600.0,
+        backing_store: Optional[SQLiteResultStore] = None,
+    ):
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.backing_store = backing_store
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._tags: Dict[str, set] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, or None on miss or expiry"""
+        value = self._get_memory(key)
+        if value is None and self.backing_store is not None:
+            value = self._get_stored(key)
+        if value is None:
+            self._count_miss()
+        return value
+
+    async def aget(self, key: Hashable) -> Optional[Any]:
+        """get() for async callers; a backing store lookup runs in a worker thread"""
+        value = self._get_memory(key)
+        if value is None and self.backing_store is not None:
+            value = await asyncio.to_thread(self._get_stored, key)
+        if value is None:
+            self._count_miss()
+        return value
+
+    def set(self, key: Hashable, value: Any, tag: Optional[str] = None) -> None:
+        """Store a value, evicting the least recently used entries if full"""
+        stored = self._set_memory(key, value, tag)
+        if self.backing_store is not None:
+            self.backing_store.set(key, stored, tag)
+
+    async def aset(self, key: Hashable, value: Any, tag: Optional[str] = None) -> None:
+        """set() for async callers; the backing store write runs in a worker thread"""
+        stored = self._set_memory(key, value, tag)
+        if self.backing_store is not None:
+            await asyncio.to_thread(self.backing_store.set, key, stored, tag)
+
+    def invalidate(self, key: Hashable) -> bool:
+        """Drop a single entry; returns True if it was present"""
+        with self._lock:
+            removed = self._remove(key)
+
+        if self.backing_store is not None:
+            removed = self.backing_store.invalidate(key) or removed
+        return removed
+
+    def invalidate_tag(self, tag: str) -> int:
+        """Drop every entry stored with the given tag; returns the number dropped"""
+        with self._lock:
+            keys = list(self._tags.get(tag, ()))
+            for key in keys:
+                self._remove(key)
+        removed = len(keys)
+
+        if self.backing_store is not None:
+            removed = max(removed, self.backing_store.invalidate_tag(tag))
+        return removed
+
+    def clear(self) -> None:
+        """Drop all entries (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+        if self.backing_store is not None:
+            self.backing_store.clear()
+
+    def _get_memory(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires_at, tag, value = entry
+            if expires_at >= time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(value)
+            self._remove(key)
+            return None
+
+    def _get_stored(self, key: Hashable) -> Optional[Any]:
+        stored = self.backing_store.get(key)
+        if stored is None:
+            return None
+
+        value, tag, expires_at = stored
+        with self._lock:
+            self.hits += 1
+            # Keep the stored expiry instead of restarting the TTL on every reload
+            self._store(key, value, tag, ttl_seconds=min(self.ttl_seconds, expires_at - time.time()))
+        return copy.deepcopy(value)
+
+    def _set_memory(self, key: Hashable, value: Any, tag: Optional[str]) -> Any:
+        """Store a private copy in memory and return it (never handed to callers)"""
+        stored = copy.deepcopy(value)
+        with self._lock:
+            self._store(key, stored, tag)
+        return stored
+
+    def _count_miss(self) -> None:
+        with self._lock:
+            self.misses += 1
+
+    def _store(self, key: Hashable, value: Any, tag: Optional[str], ttl_seconds: Optional[float] = None) -> None:
+        # Caller holds the lock
+        self._remove(key)
+        ttl_seconds = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        self._entries[key] = (time.monotonic() + ttl_seconds, tag, value)
+        if tag is not None:
+            self._tags.setdefault(tag, set()).add(key)
+
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: Hashable) -> bool:
+        # Caller holds the lock
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+
+        tag = entry[1]
+        if tag is not None:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache size and hit/miss counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "persistent": self.backing_store is not None,
+            }
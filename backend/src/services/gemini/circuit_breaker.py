@@ -0,0 +1,246 @@
+"""
+Circuit breakers for Gemini calls
+
+One breaker per workload (vision, NLP, explanation) tracks the outcome and
+latency of recent calls. When too many fail or run slow the breaker opens
+and calls fail immediately with CircuitOpenError, so callers go straight to
+their fallback analyses instead of waiting out a timeout per call. After a
+cool-down a limited number of probe calls are let through (half-open); if
+they succeed the breaker closes again.
+"""
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Tuple
+
+from utils.config import get_settings
+from utils.logger import logger
+
+settings = get_settings()
+
+# Gemini workloads with their own breaker
+BREAKER_NAMES = ("vision", "nlp", "explanation")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling Gemini while a breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Rolling-window circuit breaker
+
+    Args:
+        name: Workload name, used in logs and stats
+        window_seconds: Only calls finished within this window are counted
+        min_calls: Calls needed in the window before the breaker can open
+        failure_rate_threshold: Failed call ratio that opens the breaker
+        slow_call_seconds: Calls slower than this count as slow
+        slow_call_rate_threshold: Slow call ratio that opens the breaker
+        open_seconds: How long the breaker stays open before probing
+        half_open_max_calls: Probe calls allowed (and needed to close) while half-open
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window_seconds: float = 60.0,
+        min_calls: int = 5,
+        failure_rate_threshold: float = 0.5,
+        slow_call_seconds: float = 20.0,
+        slow_call_rate_threshold: float = 0.8,
+        open_seconds: float = 30.0,
+        half_open_max_calls: int = 1,
+    ):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_calls = max(1, min_calls)
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = max(1, half_open_max_calls)
+
+        self._lock = threading.Lock()
+        self._calls: Deque[Tuple[float, bool, bool]] = deque()  # (finished_at, failed, slow)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._rejected = 0
+        self._times_opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def before_call(self) -> None:
+        """Reserve a call, raising CircuitOpenError if the breaker rejects it"""
+        with self._lock:
+            state = self._current_state(time.monotonic())
+
+            if state == OPEN:
+                self._rejected += 1
+                raise CircuitOpenError(f"Gemini {self.name} circuit is open")
+
+            if state == HALF_OPEN:
+                if self._probes_in_flight >= self.half_open_max_calls:
+                    self._rejected += 1
+                    raise CircuitOpenError(f"Gemini {self.name} circuit is half-open, probe in flight")
+                self._probes_in_flight += 1
+
+    def record_success(self, duration: float) -> None:
+        """Record a completed call and its latency"""
+        slow = duration >= self.slow_call_seconds
+        with self._lock:
+            now = time.monotonic()
+            if self._state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if slow:
+                    self._open(now, "slow probe call")
+                    return
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_max_calls:
+                    self._close()
+                return
+
+            self._record(now, failed=False, slow=slow)
+
+    def record_failure(self, duration: float) -> None:
+        """Record a failed call"""
+        with self._lock:
+            now = time.monotonic()
+            if self._state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                self._open(now, "failed probe call")
+                return
+
+            self._record(now, failed=True, slow=duration >= self.slow_call_seconds)
+
+    def record_cancelled(self, duration: float) -> None:
+        """
+        Record a call its caller cancelled (timeout or deadline) while Gemini was working
+
+        A call cancelled after slow_call_seconds counts as slow; one cancelled
+        sooner says nothing about Gemini and only gives its reservation back.
+        """
+        if duration < self.slow_call_seconds:
+            self.release()
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            if self._state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                self._open(now, "slow probe call")
+                return
+
+            self._record(now, failed=False, slow=True)
+
+    def release(self) -> None:
+        """Give back a reserved call that never reached Gemini or was cancelled early"""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def stats(self) -> Dict:
+        """Current state and rolling window statistics"""
+        with self._lock:
+            now = time.monotonic()
+            state = self._current_state(now)
+            self._prune(now)
+            calls = len(self._calls)
+            failures = sum(1 for _, failed, _ in self._calls if failed)
+            slow = sum(1 for _, _, is_slow in self._calls if is_slow)
+            return {
+                "state": state,
+                "window_calls": calls,
+                "failure_rate": round(failures / calls, 4) if calls else 0.0,
+                "slow_call_rate": round(slow / calls, 4) if calls else 0.0,
+                "open_for_seconds": round(max(0.0, self._opened_at + self.open_seconds - now), 2)
+                if state == OPEN else 0.0,
+                "rejected_calls": self._rejected,
+                "times_opened": self._times_opened,
+            }
+
+    def reset(self) -> None:
+        """Close the breaker and forget recorded calls"""
+        with self._lock:
+            self._calls.clear()
+            self._close()
+
+    # Internal helpers below are called with the lock held
+
+    def _current_state(self, now: float) -> str:
+        if self._state == OPEN and now - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+            logger.info(f"Gemini {self.name} circuit half-open, probing")
+        return self._state
+
+    def _record(self, now: float, failed: bool, slow: bool) -> None:
+        self._calls.append((now, failed, slow))
+        self._prune(now)
+
+        calls = len(self._calls)
+        if self._state != CLOSED or calls < self.min_calls:
+            return
+
+        failure_rate = sum(1 for _, is_failed, _ in self._calls if is_failed) / calls
+        slow_rate = sum(1 for _, _, is_slow in self._calls if is_slow) / calls
+
+        if failure_rate >= self.failure_rate_threshold:
+            self._open(now, f"failure rate {failure_rate:.0%}")
+        elif slow_rate >= self.slow_call_rate_threshold:
+            self._open(now, f"slow call rate {slow_rate:.0%}")
+
+    def _prune(self, now: float) -> None:
+        cutoff = now - self.window_seconds
+        while self._calls and self._calls[0][0] < cutoff:
+            self._calls.popleft()
+
+    def _open(self, now: float, reason: str) -> None:
+        self._state = OPEN
+        self._opened_at = now
+        self._times_opened += 1
+        self._calls.clear()
+        logger.warning(f"Gemini {self.name} circuit opened ({reason}) for {self.open_seconds:g}s")
+
+    def _close(self) -> None:
+        if self._state != CLOSED:
+            logger.info(f"Gemini {self.name} circuit closed")
+        self._state = CLOSED
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Get the process-wide breaker for a Gemini workload (vision, nlp, explanation)"""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        breaker = CircuitBreaker(
+            name,
+            window_seconds=settings.GEMINI_BREAKER_WINDOW_SECONDS,
+            min_calls=settings.GEMINI_BREAKER_MIN_CALLS,
+            failure_rate_threshold=settings.GEMINI_BREAKER_FAILURE_RATE,
+            slow_call_seconds=settings.GEMINI_BREAKER_SLOW_CALL_SECONDS,
+            slow_call_rate_threshold=settings.GEMINI_BREAKER_SLOW_CALL_RATE,
+            open_seconds=settings.GEMINI_BREAKER_OPEN_SECONDS,
+            half_open_max_calls=settings.GEMINI_BREAKER_HALF_OPEN_CALLS,
+        )
+        _breakers[name] = breaker
+    return breaker
+
+
+def breaker_stats() -> Dict[str, Dict]:
+    """Stats for every Gemini workload breaker in this process"""
+    return {name: get_breaker(name).stats() for name in BREAKER_NAMES}
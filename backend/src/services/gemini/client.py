@@ -0,0 +1,128 @@
+"""
+Shared async Gemini client
+
+All Gemini calls (vision, NLP, risk explanations) go through this module so
+they use the library's async API instead of blocking the event loop, and so
+the SDK is configured once per process rather than in every constructor.
+The SDK itself is imported on first use; it is slow to import and most
+requests never call Gemini.
+"""
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Optional
+
+from services.gemini.circuit_breaker import get_breaker
+from services.gemini.rate_limiter import estimate_tokens, get_quota_scheduler
+from utils.config import get_settings
+from utils.logger import logger
+
+settings = get_settings()
+
+
+# The SDK holds one process-wide key
+_configured_key: Optional[str] = None
+_configure_lock = threading.Lock()
+
+
+def configure_gemini(api_key: Optional[str] = None) -> None:
+    """
+    Configure the Gemini SDK with an explicit key, or with GOOGLE_API_KEY if
+    it is not configured yet
+
+    A call without a key never replaces a key an analyzer configured.
+    """
+    global _configured_key
+    with _configure_lock:
+        key = api_key or _configured_key or settings.GOOGLE_API_KEY
+        if key == _configured_key:
+            return
+
+        import google.generativeai as genai
+
+        genai.configure(api_key=key)
+        _configured_key = key
+        logger.info("Gemini client configured")
+
+
+@lru_cache()
+def get_model(model_name: str) -> Any:
+    """Get the cached GenerativeModel for a model name"""
+    import google.generativeai as genai
+
+    configure_gemini()
+    return genai.GenerativeModel(model_name)
+
+
+async def generate_text(model_name: str, contents: Any, breaker: Optional[str] = None) -> str:
+    """
+    Generate content without blocking the event loop
+
+    Every call first waits for Gemini quota (see rate_limiter) at the
+    priority of the calling context.
+
+    Args:
+        model_name: Gemini model to call
+        contents: Prompt string or list of parts (images and text)
+        breaker: Circuit breaker guarding this workload (vision, nlp, explanation);
+            raises CircuitOpenError without calling Gemini while it is open
+
+    Returns:
+        Response text
+    """
+
+    model = get_model(model_name)
+    circuit = get_breaker(breaker) if breaker else None
+    if circuit is not None:
+        circuit.before_call()
+
+    finished = False
+    started = None
+    try:
+        scheduler = get_quota_scheduler()
+        estimated_tokens = estimate_tokens(contents)
+        await scheduler.acquire(model_name, estimated_tokens)
+
+        started = time.monotonic()
+        try:
+            response = await model.generate_content_async(
+                contents,
+                request_options={"timeout": settings.GEMINI_REQUEST_TIMEOUT_SECONDS},
+            )
+            text = response.text
+        except Exception:
+            if circuit is not None:
+                circuit.record_failure(time.monotonic() - started)
+            finished = True
+            raise
+
+        if circuit is not None:
+            circuit.record_success(time.monotonic() - started)
+        finished = True
+
+        usage = getattr(response, "usage_metadata", None)
+        await scheduler.record_usage(model_name, estimated_tokens, getattr(usage, "total_token_count", None))
+        return text
+    finally:
+        if circuit is not None and not finished:
+            if started is None:
+                # Out of quota, or cancelled while waiting for it: Gemini was never called
+                circuit.release()
+            else:
+                # Cancelled by a caller's timeout or deadline while Gemini was working
+                circuit.record_cancelled(time.monotonic() - started)
+
+
+def extract_json_text(response_text: str) -> str:
+    """Strip markdown code fences the model sometimes wraps JSON in"""
+
+    if "```json" in response_text:
+        json_start = response_text.index("```json") + 7
+        json_end = response_text.index("```", json_start)
+        return response_text[json_start:json_end].strip()
+    elif "```" in response_text:
+        json_start = response_text.index("```") + 3
+        json_end = response_text.index("```", json_start)
+        return response_text[json_start:json_end].strip()
+
+    return response_text
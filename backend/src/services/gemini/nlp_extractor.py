@@ -1,29 +1,145 @@
-import google.generativeai as genai
-from typing import Dict, Optional
+from typing import Dict, List, Optional
+from contextlib import nullcontext
+from functools import lru_cache
+import asyncio
 import json
 import re
 
+from services.gemini.cache import SQLiteResultStore, TTLCache, content_hash
+from services.gemini.client import configure_gemini, extract_json_text, generate_text
+from utils.concurrency import acquire_slot, remaining_time
 from utils.config import get_settings
 from utils.logger import logger
 
 settings = get_settings()
 
+# Bump whenever the field note prompt or the expected response shape change
+NLP_PROMPT_VERSION = "2"
+
+# Score points for the note sentiment: (minimum sentiment, points), best first
+NLP_SENTIMENT_POINTS = (
+    (0.8, 5),
+    (0.7, 3),
+    (0.5, 0),
+)
+NLP_LOW_SENTIMENT_POINTS = -3
+NLP_DEFAULT_SENTIMENT = 0.6
+
+# Score points per behavioral insight: field -> (value assumed when missing, {value: points})
+NLP_BEHAVIOR_POINTS = {
+    "cooperation_level": ("medium", {"high": 2, "low": -2}),
+    "transparency": ("medium", {"high": 2, "low": -2}),
+    "financial_planning": ("basic", {"good": 2, "strong": 2, "weak": -2}),
+}
+
+# Score points per risk flag, by severity
+NLP_RISK_FLAG_POINTS = {
+    "high": -2,
+    "medium": -1,
+}
+
+# Borrower context fields that _build_nlp_analysis_prompt renders
+NLP_CONTEXT_FIELDS = (
+    'full_name',
+    'business_type',
+    'claimed_monthly_income',
+    'years_in_business',
+    'village',
+    'district',
+)
+
+# Extraction fields requested for every note, shared by single and batched prompts
+NLP_EXTRACTION_INSTRUCTIONS = """1. **extracted_income_estimate** (number):
+   - Estimate monthly income based on the narrative (in Indonesian Rupiah)
+   - Look for mentions of daily income, weekly sales, customer numbers, etc.
+   - Calculate realistic estimate considering business type and activity level
+   - If unclear, provide a range midpoint
+
+2. **sentiment_score** (0.0 to 1.0):
+   - Overall sentiment of the narrative
+   - 0.0-0.3: Negative (concerns, problems, reluctance)
+   - 0.4-0.6: Neutral (factual, mixed)
+   - 0.7-1.0: Positive (optimistic, cooperative, stable)
+
+3. **risk_flags** (array of objects):
+   - Identify concerning indicators: [{"flag": "description", "severity": "low|medium|high"}]
+   - Examples: irregular_income, no_financial_records, family_financial_pressure, business_challenges, debt_concerns, health_issues, unstable_secondary_income
+
+4. **behavioral_insights** (object):
+   - cooperation_level: "low|medium|high" (how cooperative is the borrower)
+   - transparency: "low|medium|high" (how open about business details)
+   - business_knowledge: "weak|basic|good|strong" (understanding of their business)
+   - financial_planning: "weak|basic|good|strong" (financial management capability)
+   - trustworthiness: "low|medium|high" (overall trustworthiness impression)
+
+5. **key_entities** (object):
+   Extract and structure:
+   - daily_income_mentions: [amounts mentioned]
+   - weekly_income_mentions: [amounts mentioned]
+   - production_volumes: [specific quantities]
+   - customer_base_indicators: [customer numbers, frequency]
+   - asset_requests: [what they want to buy/improve]
+   - family_situation: [relevant family info]
+   - business_challenges: [problems mentioned]
+   - business_strengths: [positive indicators]
+
+6. **income_consistency_indicators** (object):
+   - has_regular_customers: true/false
+   - income_pattern: "stable|seasonal|irregular"
+   - cash_flow_description: brief assessment
+
+7. **confidence_score** (0.0 to 1.0):
+   - Your confidence in this analysis
+   - Based on clarity and detail of the note
+"""
+
+
+@lru_cache()
+def get_nlp_cache() -> TTLCache:
+    """Process-wide memo of field note analyses, optionally persisted to SQLite"""
+    backing_store = None
+    if settings.NLP_CACHE_DB_PATH:
+        backing_store = SQLiteResultStore(
+            settings.NLP_CACHE_DB_PATH,
+            ttl_seconds=settings.NLP_CACHE_TTL_SECONDS,
+        )
+
+    return TTLCache(
+        max_entries=settings.NLP_CACHE_MAX_ENTRIES,
+        ttl_seconds=settings.NLP_CACHE_TTL_SECONDS,
+        backing_store=backing_store,
+    )
+
+
+def invalidate_note_analysis(note_id: str) -> int:
+    """Drop memoized analyses for a field note that was edited or deleted"""
+    removed = get_nlp_cache().invalidate_tag(str(note_id))
+    if removed:
+        logger.info(f"Invalidated {removed} memoized NLP analyses for field note {note_id}")
+    return removed
+
 
 class GeminiNLPExtractor:
     """Gemini NLP service for extracting insights from field agent notes"""
 
     def __init__(self, api_key: Optional[str] = None):
         self.api_key = api_key or settings.GOOGLE_API_KEY
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel(settings.GEMINI_MODEL)
+        # The default key is configured on the first Gemini call
+        if api_key:
+            configure_gemini(api_key)
+        self.model_name = settings.GEMINI_MODEL
 
-    async def analyze_field_note(self, note_text: str, borrower_context: Dict) -> Dict:
+    async def analyze_field_note(self, note_text: str, borrower_context: Dict, note_id: Optional[str] = None) -> Dict:
         """
         Extract insights from field agent notes using Gemini NLP
 
+        Results are memoized on the normalized note text, the borrower
+        context fields the prompt uses and the prompt version.
+
         Args:
             note_text: Field agent's narrative report
             borrower_context: Borrower information for context
+            note_id: Field note id, used to invalidate the memo when the note changes
 
         Returns:
             {
@@ -37,11 +153,20 @@ class GeminiNLPExtractor:
         """
 
         try:
+            cache_key = self._cache_key(note_text, borrower_context)
+            cached = await get_nlp_cache().aget(cache_key)
+            if cached is not None:
+                logger.info("Gemini NLP memo hit for field note")
+                return cached
+
             prompt = self._build_nlp_analysis_prompt(note_text, borrower_context)
 
-            response = self.model.generate_content(prompt)
+            response_text = await generate_text(self.model_name, prompt, breaker="nlp")
+
+            analysis = self._parse_nlp_response(response_text)
 
-            analysis = self._parse_nlp_response(response.text)
+            if not analysis.get('fallback'):
+                await get_nlp_cache().aset(cache_key, analysis, tag=str(note_id) if note_id else None)
 
             logger.info("Gemini NLP analysis completed for field note")
 
@@ -51,6 +176,102 @@ class GeminiNLPExtractor:
             logger.error(f"Error in Gemini NLP analysis: {e}")
             return self._fallback_nlp_analysis(note_text, borrower_context)
 
+    async def analyze_field_notes_batch(
+        self,
+        entries: List[Dict],
+        chunk_timeout: Optional[float] = None,
+        deadline: Optional[float] = None,
+        limiter: Optional[asyncio.Semaphore] = None
+    ) -> Dict[str, Dict]:
+        """
+        Extract insights from several field notes with one Gemini request per chunk
+
+        Notes may belong to one borrower or to several (batch jobs); the
+        prompt states each borrower context once. Memoized notes are served
+        from the memo. Each chunk request has its own timeout; notes of a
+        chunk that failed or timed out, or that its reply left out, are
+        missing from the result so the caller can retry them one by one.
+
+        Args:
+            entries: [{"note_id": str, "note_text": str, "borrower_context": Dict}]
+            chunk_timeout: Seconds allowed per chunk request (None for no limit)
+            deadline: Monotonic deadline capping each chunk's timeout; chunks
+                not started by then are skipped
+            limiter: Semaphore held around each chunk request only, waited on
+                no longer than the deadline allows
+
+        Returns:
+            Analyses keyed by note_id (possibly partial), same shape as analyze_field_note
+        """
+
+        results: Dict[str, Dict] = {}
+        pending: List[Dict] = []
+
+        for entry in entries:
+            cache_key = self._cache_key(entry['note_text'], entry['borrower_context'])
+            cached = await get_nlp_cache().aget(cache_key)
+            if cached is not None:
+                results[entry['note_id']] = cached
+            else:
+                pending.append(dict(entry, cache_key=cache_key))
+
+        chunk_size = max(1, settings.NLP_BATCH_MAX_NOTES)
+        for offset in range(0, len(pending), chunk_size):
+            chunk = pending[offset:offset + chunk_size]
+            note_ids = [entry['note_id'] for entry in chunk]
+
+            remaining = remaining_time(deadline)
+            if remaining is not None and remaining <= 0:
+                logger.warning(f"Deadline passed, skipping {len(pending) - offset} batched field notes")
+                break
+
+            analyses = {}
+            try:
+                prompt = self._build_nlp_batch_prompt(chunk)
+                async with acquire_slot(limiter, deadline) if limiter is not None else nullcontext():
+                    # Budget left once a slot is free, capped by the chunk timeout
+                    timeout = chunk_timeout
+                    remaining = remaining_time(deadline)
+                    if remaining is not None:
+                        timeout = remaining if not timeout else min(timeout, remaining)
+                    response_text = await asyncio.wait_for(
+                        generate_text(self.model_name, prompt, breaker="nlp"), timeout
+                    )
+                analyses = self._parse_nlp_batch_response(response_text, note_ids)
+                logger.info(f"Gemini NLP batch analysis completed for {len(analyses)}/{len(chunk)} notes")
+            except asyncio.TimeoutError:
+                logger.error(f"Gemini NLP batch analysis timed out for {len(chunk)} notes")
+            except Exception as e:
+                logger.error(f"Error in Gemini NLP batch analysis: {e}")
+
+            for entry in chunk:
+                analysis = analyses.get(entry['note_id'])
+                if analysis is not None:
+                    await get_nlp_cache().aset(entry['cache_key'], analysis, tag=entry['note_id'])
+                    results[entry['note_id']] = analysis
+
+        return results
+
+    def _cache_key(self, note_text: str, borrower_context: Dict) -> str:
+        """Memo key over normalized note text, prompt context fields, prompt version and model"""
+        normalized_text = " ".join((note_text or "").split())
+        context = {field: borrower_context.get(field) for field in NLP_CONTEXT_FIELDS}
+        payload = json.dumps(
+            [normalized_text, context, NLP_PROMPT_VERSION, self.model_name],
+            sort_keys=True,
+            default=str,
+        )
+        return content_hash(payload)
+
+    def _build_context_block(self, borrower_context: Dict) -> str:
+        """Render the borrower context lines shared by single and batched prompts"""
+
+        return f"""- Name: {borrower_context.get('full_name', 'Unknown')}
+- Business Type: {borrower_context.get('business_type', 'Unknown')}
+- Claimed Monthly Income: Rp {borrower_context.get('claimed_monthly_income', 0):,.0f}
+- Years in Business: {borrower_context.get('years_in_business', 'Unknown')} years
+- Location: {borrower_context.get('village', '')}, {borrower_context.get('district', '')}"""
+
     def _build_nlp_analysis_prompt(self, note_text: str, borrower_context: Dict) -> str:
         """Build comprehensive prompt for field note analysis"""
 
@@ -58,61 +279,50 @@ class GeminiNLPExtractor:
 You are analyzing a field agent's narrative report about a micro-entrepreneur borrower in rural Indonesia for credit assessment.
 
 **Borrower Context:**
-- Name: {borrower_context.get('full_name', 'Unknown')}
-- Business Type: {borrower_context.get('business_type', 'Unknown')}
-- Claimed Monthly Income: Rp {borrower_context.get('claimed_monthly_income', 0):,.0f}
-- Years in Business: {borrower_context.get('years_in_business', 'Unknown')} years
-- Location: {borrower_context.get('village', '')}, {borrower_context.get('district', '')}
+{self._build_context_block(borrower_context)}
 
 **Field Agent Note:**
 {note_text}
 
 Please analyze this note and extract the following information in JSON format:
 
-1. **extracted_income_estimate** (number):
-   - Estimate monthly income based on the narrative (in Indonesian Rupiah)
-   - Look for mentions of daily income, weekly sales, customer numbers, etc.
-   - Calculate realistic estimate considering business type and activity level
-   - If unclear, provide a range midpoint
-
-2. **sentiment_score** (0.0 to 1.0):
-   - Overall sentiment of the narrative
-   - 0.0-0.3: Negative (concerns, problems, reluctance)
-   - 0.4-0.6: Neutral (factual, mixed)
-   - 0.7-1.0: Positive (optimistic, cooperative, stable)
+{NLP_EXTRACTION_INSTRUCTIONS}
+Respond ONLY with valid JSON format. Be objective and base your assessment strictly on the text provided.
+"""
 
-3. **risk_flags** (array of objects):
-   - Identify concerning indicators: [{"flag": "description", "severity": "low|medium|high"}]
-   - Examples: irregular_income, no_financial_records, family_financial_pressure, business_challenges, debt_concerns, health_issues, unstable_secondary_income
+        return prompt
 
-4. **behavioral_insights** (object):
-   - cooperation_level: "low|medium|high" (how cooperative is the borrower)
-   - transparency: "low|medium|high" (how open about business details)
-   - business_knowledge: "weak|basic|good|strong" (understanding of their business)
-   - financial_planning: "weak|basic|good|strong" (financial management capability)
-   - trustworthiness: "low|medium|high" (overall trustworthiness impression)
+    def _build_nlp_batch_prompt(self, entries: List[Dict]) -> str:
+        """Build one prompt covering several notes, grouped by borrower"""
+
+        groups: Dict[str, Dict] = {}
+        for entry in entries:
+            context = entry['borrower_context']
+            group_key = str(context.get('id') or id(context))
+            group = groups.setdefault(group_key, {"context": context, "notes": []})
+            group["notes"].append(entry)
+
+        sections = []
+        for number, group in enumerate(groups.values(), start=1):
+            notes_str = "\n\n".join(
+                f"[note_id: {entry['note_id']}]\n{entry['note_text']}" for entry in group["notes"]
+            )
+            sections.append(
+                f"**Borrower {number} Context:**\n"
+                f"{self._build_context_block(group['context'])}\n\n"
+                f"**Field Agent Notes for Borrower {number}:**\n"
+                f"{notes_str}"
+            )
 
-5. **key_entities** (object):
-   Extract and structure:
-   - daily_income_mentions: [amounts mentioned]
-   - weekly_income_mentions: [amounts mentioned]
-   - production_volumes: [specific quantities]
-   - customer_base_indicators: [customer numbers, frequency]
-   - asset_requests: [what they want to buy/improve]
-   - family_situation: [relevant family info]
-   - business_challenges: [problems mentioned]
-   - business_strengths: [positive indicators]
+        prompt = f"""
+You are analyzing field agents' narrative reports about micro-entrepreneur borrowers in rural Indonesia for credit assessment.
 
-6. **income_consistency_indicators** (object):
-   - has_regular_customers: true/false
-   - income_pattern: "stable|seasonal|irregular"
-   - cash_flow_description: brief assessment
+{chr(10).join(sections)}
 
-7. **confidence_score** (0.0 to 1.0):
-   - Your confidence in this analysis
-   - Based on clarity and detail of the note
+Please analyze EACH note separately, using only that note and its borrower's context, and extract the following information:
 
-Respond ONLY with valid JSON format. Be objective and base your assessment strictly on the text provided.
+{NLP_EXTRACTION_INSTRUCTIONS}
+Respond ONLY with a valid JSON array containing exactly one object per note. Each object must have a "note_id" field copied exactly from the note header, plus the fields above. Be objective and base each assessment strictly on its own note text.
 """
 
         return prompt
@@ -122,16 +332,7 @@ Respond ONLY with valid JSON format. Be objective and base your assessment stric
 
         try:
             # Extract JSON from response
-            if "```json" in response_text:
-                json_start = response_text.index("```json") + 7
-                json_end = response_text.index("```", json_start)
-                json_str = response_text[json_start:json_end].strip()
-            elif "```" in response_text:
-                json_start = response_text.index("```") + 3
-                json_end = response_text.index("```", json_start)
-                json_str = response_text[json_start:json_end].strip()
-            else:
-                json_str = response_text
+            json_str = extract_json_text(response_text)
 
             parsed = json.loads(json_str)
             parsed['raw_analysis'] = response_text
@@ -145,6 +346,37 @@ Respond ONLY with valid JSON format. Be objective and base your assessment stric
             # Try regex extraction as fallback
             return self._regex_extraction_fallback(response_text)
 
+    def _parse_nlp_batch_response(self, response_text: str, note_ids: List[str]) -> Dict[str, Dict]:
+        """
+        Parse a batched NLP response into analyses keyed by note id
+
+        Items that are malformed or carry an unknown note id are dropped so
+        the caller can fall back to per-note calls for them.
+        """
+
+        try:
+            parsed = json.loads(extract_json_text(response_text))
+        except Exception as e:
+            logger.error(f"Error parsing Gemini NLP batch response: {e}")
+            logger.debug(f"Response text: {response_text}")
+            return {}
+
+        if not isinstance(parsed, list):
+            logger.error("Gemini NLP batch response is not a JSON array")
+            return {}
+
+        expected = set(note_ids)
+        analyses = {}
+        for item in parsed:
+            if not isinstance(item, dict):
+                continue
+            note_id = str(item.pop('note_id', ''))
+            if note_id in expected and note_id not in analyses:
+                item['raw_analysis'] = json.dumps(item, ensure_ascii=False)
+                analyses[note_id] = item
+
+        return analyses
+
     def _regex_extraction_fallback(self, note_text: str) -> Dict:
         """Fallback: Use regex to extract basic information"""
 
@@ -224,50 +456,31 @@ Respond ONLY with valid JSON format. Be objective and base your assessment stric
         """
         Calculate credit score adjustment based on NLP analysis
 
+        Points come from the NLP_*_POINTS tables.
+
         Returns: Score adjustment (-15 to +15 points)
         """
 
         adjustment = 0.0
 
         # Sentiment impact (+/- 5 points)
-        sentiment = nlp_results.get('sentiment_score', 0.6)
-        if sentiment >= 0.8:
-            adjustment += 5
-        elif sentiment >= 0.7:
-            adjustment += 3
-        elif sentiment >= 0.5:
-            adjustment += 0
+        sentiment = nlp_results.get('sentiment_score', NLP_DEFAULT_SENTIMENT)
+        for threshold, points in NLP_SENTIMENT_POINTS:
+            if sentiment >= threshold:
+                adjustment += points
+                break
         else:
-            adjustment -= 3
+            adjustment += NLP_LOW_SENTIMENT_POINTS
 
         # Behavioral insights (+/- 6 points)
         behavioral = nlp_results.get('behavioral_insights', {})
+        for field, (default, points) in NLP_BEHAVIOR_POINTS.items():
+            adjustment += points.get(behavioral.get(field, default), 0)
 
-        cooperation = behavioral.get('cooperation_level', 'medium')
-        if cooperation == 'high':
-            adjustment += 2
-        elif cooperation == 'low':
-            adjustment -= 2
-
-        transparency = behavioral.get('transparency', 'medium')
-        if transparency == 'high':
-            adjustment += 2
-        elif transparency == 'low':
-            adjustment -= 2
-
-        financial_planning = behavioral.get('financial_planning', 'basic')
-        if financial_planning in ['good', 'strong']:
-            adjustment += 2
-        elif financial_planning == 'weak':
-            adjustment -= 2
-
-        # Risk flags impact (- 4 points max)
+        # Risk flags impact
         risk_flags = nlp_results.get('risk_flags', [])
-        high_severity_flags = [f for f in risk_flags if f.get('severity') == 'high']
-        medium_severity_flags = [f for f in risk_flags if f.get('severity') == 'medium']
-
-        adjustment -= len(high_severity_flags) * 2
-        adjustment -= len(medium_severity_flags) * 1
+        for severity, points in NLP_RISK_FLAG_POINTS.items():
+            adjustment += sum(1 for f in risk_flags if f.get('severity') == severity) * points
 
         # Confidence factor
         confidence = nlp_results.get('confidence_score', 0.7)
@@ -0,0 +1,315 @@
+"""
+Token-bucket quota scheduler for Gemini calls
+
+Every Gemini request draws from two buckets per model: one for requests
+(RPM) and one for estimated tokens (TPM). Bucket levels live in a local
+SQLite file when GEMINI_QUOTA_DB_PATH is set, so all uvicorn workers on a
+host share one quota; otherwise they are kept in process.
+
+Calls are either interactive (/assess) or batch (/batch-assess and other
+background work). Batch calls may not draw a bucket below a reserved share
+of its capacity, and wait while interactive calls in the same process are
+queued, so interactive requests go first when quota is tight.
+"""
+import asyncio
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from utils.config import get_settings
+from utils.logger import logger
+
+settings = get_settings()
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+
+# Rough Gemini token costs used before the real usage is known
+CHARS_PER_TOKEN = 4
+IMAGE_TOKENS = 258
+
+_priority: ContextVar[str] = ContextVar("gemini_quota_priority", default=INTERACTIVE)
+
+# name -> (level, updated_at)
+BucketLevels = Dict[str, Optional[Tuple[float, float]]]
+
+
+class QuotaExceededError(Exception):
+    """Raised when a Gemini call could not get quota within the max wait"""
+
+
+@contextmanager
+def quota_priority(priority: str) -> Iterator[None]:
+    """Run the enclosed Gemini calls (and tasks started inside) at the given priority"""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> str:
+    """Priority the current context's Gemini calls run at"""
+    return _priority.get()
+
+
+def estimate_tokens(contents: Any) -> int:
+    """Estimate the tokens a request will consume, including the expected response"""
+
+    parts = contents if isinstance(contents, list) else [contents]
+    tokens = 0
+    for part in parts:
+        if isinstance(part, str):
+            tokens += len(part) // CHARS_PER_TOKEN + 1
+        else:
+            # Image parts ({"mime_type", "data"} dicts or PIL images)
+            tokens += IMAGE_TOKENS
+
+    return tokens + settings.GEMINI_ESTIMATED_OUTPUT_TOKENS
+
+
+class MemoryBucketStore:
+    """Bucket levels held in this process"""
+
+    # Cheap enough to run on the event loop
+    blocking = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._levels: Dict[str, Tuple[float, float]] = {}
+
+    def transact(self, names: List[str], update: Callable[[BucketLevels], Tuple[Any, Dict]]) -> Any:
+        with self._lock:
+            result, new_levels = update({name: self._levels.get(name) for name in names})
+            self._levels.update(new_levels)
+            return result
+
+
+class SQLiteBucketStore:
+    """
+    Bucket levels in a local SQLite file shared by worker processes
+
+    transact() blocks on the file lock (up to the 5s busy timeout), so the
+    scheduler calls it from a worker thread. Each thread keeps its own
+    connection.
+    """
+
+    blocking = True
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            "name TEXT PRIMARY KEY, level REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5.0, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def transact(self, names: List[str], update: Callable[[BucketLevels], Tuple[Any, Dict]]) -> Any:
+        conn = self._connection()
+        # Take the write lock up front so read-modify-write is atomic across processes
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            placeholders = ",".join("?" for _ in names)
+            rows = conn.execute(
+                f"SELECT name, level, updated_at FROM buckets WHERE name IN ({placeholders})", names
+            ).fetchall()
+            levels: BucketLevels = {name: None for name in names}
+            levels.update({name: (level, updated_at) for name, level, updated_at in rows})
+
+            result, new_levels = update(levels)
+            conn.executemany(
+                "INSERT OR REPLACE INTO buckets (name, level, updated_at) VALUES (?, ?, ?)",
+                [(name, level, updated_at) for name, (level, updated_at) in new_levels.items()]
+            )
+            conn.execute("COMMIT")
+            return result
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+
+class QuotaScheduler:
+    """
+    Request and token buckets per Gemini model
+
+    Args:
+        requests_per_minute: Request quota per model (0 disables the request bucket)
+        tokens_per_minute: Token quota per model (0 disables the token bucket)
+        store: Where bucket levels live (MemoryBucketStore or SQLiteBucketStore)
+        batch_reserve: Share of each bucket batch calls may not use
+        max_wait_seconds: Longest a call waits for quota before QuotaExceededError
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        store=None,
+        batch_reserve: float = 0.2,
+        max_wait_seconds: float = 30.0,
+    ):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.store = store or MemoryBucketStore()
+        self.batch_reserve = min(max(batch_reserve, 0.0), 0.9)
+        self.max_wait_seconds = max_wait_seconds
+
+        self._interactive_waiting = 0
+        self._granted = {INTERACTIVE: 0, BATCH: 0}
+        self._waited_seconds = {INTERACTIVE: 0.0, BATCH: 0.0}
+        self._rejected = 0
+
+    async def acquire(self, model_name: str, tokens: int, priority: Optional[str] = None) -> None:
+        """Wait until the model's buckets can cover one request and the estimated tokens"""
+
+        priority = priority or current_priority()
+        buckets = self._buckets(model_name, tokens)
+        if not buckets:
+            return
+
+        started = time.monotonic()
+        interactive = priority != BATCH
+        if interactive:
+            self._interactive_waiting += 1
+        try:
+            while True:
+                if not interactive and self._interactive_waiting:
+                    wait = 0.05
+                else:
+                    wait = await self._transact(
+                        [name for name, *_ in buckets],
+                        lambda levels: self._take(levels, buckets, interactive)
+                    )
+                    if wait <= 0:
+                        break
+
+                waited = time.monotonic() - started
+                if waited + wait > self.max_wait_seconds:
+                    self._rejected += 1
+                    raise QuotaExceededError(
+                        f"Gemini quota for {model_name} not available within {self.max_wait_seconds:g}s"
+                    )
+                # Re-check often so queued interactive calls are noticed
+                await asyncio.sleep(min(wait, 1.0))
+        finally:
+            if interactive:
+                self._interactive_waiting -= 1
+
+        waited = time.monotonic() - started
+        priority_class = INTERACTIVE if interactive else BATCH
+        self._granted[priority_class] += 1
+        self._waited_seconds[priority_class] += waited
+        if waited > 1.0:
+            logger.info(f"Waited {waited:.1f}s for Gemini quota on {model_name} ({priority})")
+
+    async def record_usage(self, model_name: str, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        """Correct the token bucket once the real token count of a call is known"""
+
+        if not actual_tokens or self.tokens_per_minute <= 0:
+            return
+
+        delta = actual_tokens - estimated_tokens
+        if delta == 0:
+            return
+
+        name = f"{model_name}:tokens"
+        capacity = float(self.tokens_per_minute)
+
+        def update(levels: BucketLevels):
+            now = time.time()
+            level = self._refill(levels[name], capacity, capacity / 60.0, now)
+            # Over-use can run the bucket negative, delaying later calls
+            return None, {name: (max(-capacity, min(capacity, level - delta)), now)}
+
+        await self._transact([name], update)
+
+    async def _transact(self, names: List[str], update: Callable[[BucketLevels], Tuple[Any, Dict]]) -> Any:
+        """Run a store transaction, off the event loop when the store blocks"""
+        if getattr(self.store, "blocking", True):
+            return await asyncio.to_thread(self.store.transact, names, update)
+        return self.store.transact(names, update)
+
+    def stats(self) -> Dict:
+        """Quota settings and grant/wait counters for this process"""
+        return {
+            "requests_per_minute": self.requests_per_minute,
+            "tokens_per_minute": self.tokens_per_minute,
+            "shared": isinstance(self.store, SQLiteBucketStore),
+            "granted": dict(self._granted),
+            "waited_seconds": {key: round(value, 2) for key, value in self._waited_seconds.items()},
+            "interactive_waiting": self._interactive_waiting,
+            "rejected": self._rejected,
+        }
+
+    def _buckets(self, model_name: str, tokens: int) -> List[Tuple[str, float, float, float]]:
+        """(name, capacity, refill per second, amount) for each enabled bucket"""
+
+        buckets = []
+        if self.requests_per_minute > 0:
+            capacity = float(self.requests_per_minute)
+            buckets.append((f"{model_name}:requests", capacity, capacity / 60.0, 1.0))
+        if self.tokens_per_minute > 0:
+            capacity = float(self.tokens_per_minute)
+            buckets.append((f"{model_name}:tokens", capacity, capacity / 60.0, float(tokens)))
+        return buckets
+
+    def _take(self, levels: BucketLevels, buckets, interactive: bool) -> Tuple[float, Dict]:
+        """Debit every bucket if all can cover the call, else return the wait needed"""
+
+        now = time.time()
+        refreshed = {}
+        wait = 0.0
+        for name, capacity, rate, amount in buckets:
+            level = self._refill(levels[name], capacity, rate, now)
+            floor = 0.0 if interactive else capacity * self.batch_reserve
+            # A single call larger than the bucket only needs a full bucket
+            amount = min(amount, capacity - floor)
+            if level - amount < floor:
+                wait = max(wait, (amount + floor - level) / rate)
+            refreshed[name] = (level, amount)
+
+        if wait > 0:
+            return wait, {name: (level, now) for name, (level, _) in refreshed.items()}
+
+        return 0.0, {name: (level - amount, now) for name, (level, amount) in refreshed.items()}
+
+    @staticmethod
+    def _refill(state: Optional[Tuple[float, float]], capacity: float, rate: float, now: float) -> float:
+        if state is None:
+            return capacity
+        level, updated_at = state
+        return min(capacity, level + max(0.0, now - updated_at) * rate)
+
+
+_scheduler: Optional[QuotaScheduler] = None
+
+
+def get_quota_scheduler() -> QuotaScheduler:
+    """Get the process-wide Gemini quota scheduler"""
+    global _scheduler
+    if _scheduler is None:
+        store = (
+            SQLiteBucketStore(settings.GEMINI_QUOTA_DB_PATH)
+            if settings.GEMINI_QUOTA_DB_PATH else MemoryBucketStore()
+        )
+        _scheduler = QuotaScheduler(
+            requests_per_minute=settings.GEMINI_RPM_LIMIT,
+            tokens_per_minute=settings.GEMINI_TPM_LIMIT,
+            store=store,
+            batch_reserve=settings.GEMINI_QUOTA_BATCH_RESERVE,
+            max_wait_seconds=settings.GEMINI_QUOTA_MAX_WAIT_SECONDS,
+        )
+    return _scheduler
@@ -1,22 +1,49 @@
-import google.generativeai as genai
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
+from contextlib import nullcontext
+from functools import lru_cache
+import asyncio
 import json
 from pathlib import Path
 import httpx
 
+from services.gemini.cache import TTLCache, content_hash
+from services.gemini.client import configure_gemini, extract_json_text, generate_text
+from utils.concurrency import acquire_slot, remaining_time
 from utils.config import get_settings
 from utils.logger import logger
 
 settings = get_settings()
 
+# Bump whenever the photo prompts or the expected response shape change
+VISION_PROMPT_VERSION = "1"
+
+# Score points per analysis field value: field -> (value assumed when missing, {value: points})
+VISION_ADJUSTMENT_POINTS = {
+    "business_scale": ("small", {"large": 5, "medium": 2, "small": 0}),
+    "inventory_density": ("moderate", {"high": 3, "moderate": 1}),
+    "asset_quality": ("fair", {"excellent": 5, "good": 3, "fair": 1, "poor": -2}),
+    "housing_condition": (None, {"good": 4, "adequate": 2, "basic": 0, "poor": -3}),
+}
+
+
+@lru_cache()
+def get_vision_cache() -> TTLCache:
+    """Process-wide cache of Gemini Vision results"""
+    return TTLCache(
+        max_entries=settings.VISION_CACHE_MAX_ENTRIES,
+        ttl_seconds=settings.VISION_CACHE_TTL_SECONDS,
+    )
+
 
 class GeminiVisionAnalyzer:
     """Gemini Vision API service for analyzing business/house photos"""
 
     def __init__(self, api_key: Optional[str] = None):
         self.api_key = api_key or settings.GOOGLE_API_KEY
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel(settings.GEMINI_VISION_MODEL)
+        # The default key is configured on the first Gemini call
+        if api_key:
+            configure_gemini(api_key)
+        self.model_name = settings.GEMINI_VISION_MODEL
 
     async def _load_image(self, image_source: str) -> bytes:
         """
@@ -67,14 +94,23 @@ class GeminiVisionAnalyzer:
             # Load image from URL or local path
             image_data = await self._load_image(image_path)
 
+            cache_key = self._cache_key(image_data, photo_type, prompt)
+            cached = await get_vision_cache().aget(cache_key)
+            if cached is not None:
+                logger.info(f"Gemini Vision cache hit for {photo_type}")
+                return cached
+
             # Generate analysis
-            response = self.model.generate_content([
+            response_text = await generate_text(self.model_name, [
                 {"mime_type": "image/jpeg", "data": image_data},
                 prompt
-            ])
+            ], breaker="vision")
 
             # Parse response
-            analysis = self._parse_vision_response(response.text, "business")
+            analysis = self._parse_vision_response(response_text, "business")
+
+            if not analysis.get('fallback'):
+                await get_vision_cache().aset(cache_key, analysis)
 
             logger.info(f"Gemini Vision analysis completed for {photo_type}")
 
@@ -104,14 +140,23 @@ class GeminiVisionAnalyzer:
             # Load image from URL or local path
             image_data = await self._load_image(image_path)
 
+            cache_key = self._cache_key(image_data, photo_type, prompt)
+            cached = await get_vision_cache().aget(cache_key)
+            if cached is not None:
+                logger.info(f"Gemini Vision cache hit for {photo_type}")
+                return cached
+
             # Generate analysis
-            response = self.model.generate_content([
+            response_text = await generate_text(self.model_name, [
                 {"mime_type": "image/jpeg", "data": image_data},
                 prompt
-            ])
+            ], breaker="vision")
 
             # Parse response
-            analysis = self._parse_vision_response(response.text, "house")
+            analysis = self._parse_vision_response(response_text, "house")
+
+            if not analysis.get('fallback'):
+                await get_vision_cache().aset(cache_key, analysis)
 
             logger.info(f"Gemini Vision analysis completed for house photo")
 
@@ -121,6 +166,132 @@ class GeminiVisionAnalyzer:
             logger.error(f"Error in Gemini Vision house analysis: {e}")
             return self._fallback_house_analysis(photo_type)
 
+    async def analyze_photos_batch(
+        self,
+        photos: List[Dict],
+        borrower_context: Dict = None,
+        deadline: Optional[float] = None,
+        limiter: Optional[asyncio.Semaphore] = None
+    ) -> Dict:
+        """
+        Analyze several photos of one borrower in a single multimodal request
+
+        Photos are packed into as few requests as the per-request caps allow
+        (VISION_BATCH_MAX_IMAGES / VISION_BATCH_MAX_BYTES). Cached photos are
+        served from the vision cache. Photos missing from an unparseable or
+        incomplete response are left as None for the caller to retry.
+
+        Args:
+            photos: [{"image_path": str, "photo_type": str}]
+            borrower_context: Additional context about the borrower
+            deadline: Monotonic deadline capping each request; requests not
+                started by then are skipped
+            limiter: Semaphore held around each request only, waited on no
+                longer than the deadline allows
+
+        Returns:
+            {
+                "analyses": [per-photo analysis or None, in input order],
+                "summary": str (combined observations across photos)
+            }
+        """
+
+        analyses: List[Optional[Dict]] = [None] * len(photos)
+        summaries: List[str] = []
+
+        images = await asyncio.gather(
+            *(self._load_image(photo['image_path']) for photo in photos),
+            return_exceptions=True
+        )
+
+        context_key = self._build_context_block(borrower_context)
+        pending = []
+        for index, (photo, image_data) in enumerate(zip(photos, images)):
+            if isinstance(image_data, Exception):
+                logger.error(f"Error loading image for batch vision analysis: {image_data}")
+                continue
+
+            cache_key = self._cache_key(image_data, photo['photo_type'], f"batch\n{context_key}")
+            cached = await get_vision_cache().aget(cache_key)
+            if cached is not None:
+                analyses[index] = cached
+            else:
+                pending.append((index, photo, image_data, cache_key))
+
+        for chunk in self._chunk_batch(pending):
+            remaining = remaining_time(deadline)
+            if remaining is not None and remaining <= 0:
+                logger.warning("Deadline passed, skipping the remaining batched photos")
+                break
+
+            try:
+                contents = []
+                for number, (_, photo, image_data, _) in enumerate(chunk, start=1):
+                    contents.append(f"Photo {number} (photo_type: {photo['photo_type']}):")
+                    contents.append({"mime_type": "image/jpeg", "data": image_data})
+                contents.append(self._build_batch_photo_prompt(len(chunk), borrower_context))
+
+                async with acquire_slot(limiter, deadline) if limiter is not None else nullcontext():
+                    response_text = await asyncio.wait_for(
+                        generate_text(self.model_name, contents, breaker="vision"), remaining_time(deadline)
+                    )
+                chunk_analyses, summary = self._parse_vision_batch_response(response_text, len(chunk))
+                if summary:
+                    summaries.append(summary)
+
+                for (index, photo, _, cache_key), analysis in zip(chunk, chunk_analyses):
+                    if analysis is not None:
+                        analyses[index] = analysis
+                        await get_vision_cache().aset(cache_key, analysis)
+
+                logger.info(
+                    f"Gemini Vision batch analysis completed for "
+                    f"{sum(a is not None for a in chunk_analyses)}/{len(chunk)} photos"
+                )
+
+            except asyncio.TimeoutError:
+                logger.error(f"Gemini Vision batch analysis timed out for {len(chunk)} photos")
+            except Exception as e:
+                logger.error(f"Error in Gemini Vision batch analysis: {e}")
+
+        return {
+            "analyses": analyses,
+            "summary": " ".join(summaries)
+        }
+
+    def _chunk_batch(self, pending: List[tuple]) -> List[List[tuple]]:
+        """Split pending photos into requests within the image count and byte caps"""
+
+        max_images = max(1, settings.VISION_BATCH_MAX_IMAGES)
+        max_bytes = settings.VISION_BATCH_MAX_BYTES
+
+        chunks: List[List[tuple]] = []
+        current: List[tuple] = []
+        current_bytes = 0
+
+        for item in pending:
+            size = len(item[2])
+            if current and (len(current) >= max_images or current_bytes + size > max_bytes):
+                chunks.append(current)
+                current, current_bytes = [], 0
+            current.append(item)
+            current_bytes += size
+
+        if current:
+            chunks.append(current)
+
+        return chunks
+
+    def _cache_key(self, image_data: bytes, photo_type: str, prompt: str) -> Tuple[str, str, str, str]:
+        """
+        Cache key for a vision result
+
+        The rendered prompt is hashed into the version component because the
+        business prompt embeds borrower context.
+        """
+        prompt_version = f"{VISION_PROMPT_VERSION}:{content_hash(prompt)[:16]}"
+        return (content_hash(image_data), photo_type, prompt_version, self.model_name)
+
     def _build_business_photo_prompt(self, photo_type: str, borrower_context: Dict = None) -> str:
         """Build comprehensive prompt for business photo analysis"""
 
@@ -223,22 +394,96 @@ Respond ONLY with valid JSON format.
 
         return prompt
 
+    def _build_context_block(self, borrower_context: Dict = None) -> str:
+        """Borrower context lines for the batched photo prompt"""
+
+        if not borrower_context:
+            return ""
+
+        return f"""
+Borrower Context:
+- Business Type: {borrower_context.get('business_type', 'Unknown')}
+- Claimed Monthly Income: Rp {borrower_context.get('claimed_monthly_income', 0):,.0f}
+- Location: {borrower_context.get('village', '')}, {borrower_context.get('district', '')}
+"""
+
+    def _build_batch_photo_prompt(self, num_photos: int, borrower_context: Dict = None) -> str:
+        """Build prompt for analyzing several labelled photos of one borrower at once"""
+
+        prompt = f"""
+You are analyzing {num_photos} photos of one micro-entrepreneur borrower's business and house in rural Indonesia for credit assessment purposes.
+Each photo above is labelled "Photo N (photo_type: ...)".
+{self._build_context_block(borrower_context)}
+
+Analyze EACH photo separately and objectively.
+
+For photos whose photo_type is a business photo (business_exterior, business_interior, inventory, assets), report:
+- business_scale: small|medium|large (for micro-businesses)
+- inventory_density: low|moderate|high
+- asset_quality: poor|fair|good|excellent
+- socioeconomic_indicators: building_condition, equipment_modernity, organization_level, cleanliness, signage_quality, visible_inventory_items
+- estimated_value_range: rough total business asset value in Rupiah (e.g., "Rp 5M - 10M")
+- credit_relevant_observations: business robustness, cash flow indicators, growth potential, risk factors
+- confidence_score: 0.0 to 1.0
+
+For photos whose photo_type is a house photo (house_exterior, house_interior), report:
+- housing_condition: poor|basic|adequate|good
+- visible_assets: list of valuable items or infrastructure
+- living_standard: lower|lower-middle|middle
+- socioeconomic_indicators: building_materials, roof_condition, windows_doors_quality, visible_amenities, surrounding_environment
+- area_size_estimate: rough house size in square meters
+- confidence_score: 0.0 to 1.0
+
+Respond ONLY with valid JSON of the form:
+{{"photos": [{{"photo_number": 1, ...fields above...}}, ...], "summary": "2-3 sentences combining what all photos indicate about the borrower"}}
+Include exactly one entry per photo.
+"""
+
+        return prompt
+
+    def _parse_vision_batch_response(self, response_text: str, num_photos: int) -> Tuple[List[Optional[Dict]], str]:
+        """
+        Parse a batched vision response
+
+        Returns:
+            (analyses by photo position, None where missing or malformed; combined summary)
+        """
+
+        analyses: List[Optional[Dict]] = [None] * num_photos
+
+        try:
+            json_str = extract_json_text(response_text)
+            parsed = json.loads(json_str)
+        except Exception as e:
+            logger.error(f"Error parsing Gemini Vision batch response: {e}")
+            logger.debug(f"Response text: {response_text}")
+            return analyses, ""
+
+        if not isinstance(parsed, dict) or not isinstance(parsed.get('photos'), list):
+            logger.error("Gemini Vision batch response has no photos array")
+            return analyses, ""
+
+        for item in parsed['photos']:
+            if not isinstance(item, dict):
+                continue
+            try:
+                position = int(item.pop('photo_number')) - 1
+            except (KeyError, TypeError, ValueError):
+                continue
+            if 0 <= position < num_photos and analyses[position] is None:
+                item['raw_analysis'] = json.dumps(item, ensure_ascii=False)
+                analyses[position] = item
+
+        summary = parsed.get('summary')
+        return analyses, summary if isinstance(summary, str) else ""
+
     def _parse_vision_response(self, response_text: str, analysis_type: str) -> Dict:
         """Parse Gemini Vision API response"""
 
         try:
             # Try to extract JSON from response
             # Sometimes the model wraps JSON in markdown code blocks
-            if "```json" in response_text:
-                json_start = response_text.index("```json") + 7
-                json_end = response_text.index("```", json_start)
-                json_str = response_text[json_start:json_end].strip()
-            elif "```" in response_text:
-                json_start = response_text.index("```") + 3
-                json_end = response_text.index("```", json_start)
-                json_str = response_text[json_start:json_end].strip()
-            else:
-                json_str = response_text
+            json_str = extract_json_text(response_text)
 
             parsed = json.loads(json_str)
             parsed['raw_analysis'] = response_text
@@ -296,49 +541,17 @@ Respond ONLY with valid JSON format.
         """
         Calculate credit score adjustment based on vision analysis
 
+        Points per field come from VISION_ADJUSTMENT_POINTS.
+
         Returns: Score adjustment (-15 to +15 points)
         """
 
         adjustment = 0.0
 
-        # Business scale impact (+/- 5 points)
-        business_scale = vision_results.get('business_scale', 'small')
-        if business_scale == 'large':
-            adjustment += 5
-        elif business_scale == 'medium':
-            adjustment += 2
-        elif business_scale == 'small':
-            adjustment += 0
-
-        # Inventory density (+/- 3 points)
-        inventory = vision_results.get('inventory_density', 'moderate')
-        if inventory == 'high':
-            adjustment += 3
-        elif inventory == 'moderate':
-            adjustment += 1
-
-        # Asset quality (+/- 5 points)
-        asset_quality = vision_results.get('asset_quality', 'fair')
-        if asset_quality == 'excellent':
-            adjustment += 5
-        elif asset_quality == 'good':
-            adjustment += 3
-        elif asset_quality == 'fair':
-            adjustment += 1
-        elif asset_quality == 'poor':
-            adjustment -= 2
-
-        # Housing condition (for house photos) (+/- 4 points)
-        housing = vision_results.get('housing_condition')
-        if housing:
-            if housing == 'good':
-                adjustment += 4
-            elif housing == 'adequate':
-                adjustment += 2
-            elif housing == 'basic':
-                adjustment += 0
-            elif housing == 'poor':
-                adjustment -= 3
+        # Business scale (+/- 5), inventory density (+/- 3), asset quality (+/- 5)
+        # and, for house photos, housing condition (+/- 4)
+        for field, (default, points) in VISION_ADJUSTMENT_POINTS.items():
+            adjustment += points.get(vision_results.get(field, default), 0)
 
         # Confidence factor
         confidence = vision_results.get('confidence_score', 0.7)
@@ -0,0 +1,97 @@
+"""
+Single-row feature path microbenchmark
+
+Times one /assess worth of feature work per call: the old dict + DataFrame
+construction against FeatureSpec.row / scaled_row, and (given a saved model)
+the sklearn and compiled-forest predict_proba calls plus the full predict()
+round trip.
+
+    python -m services.ml_model.benchmark [model_path] --calls 20000
+"""
+import argparse
+import timeit
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from services.ml_model.credit_risk_model import CreditRiskModel
+from services.ml_model.features import FEATURE_SPEC, FeatureSpec, encode_business_type
+
+SAMPLE_BORROWER = {
+    'age': 42,
+    'years_in_business': 6.5,
+    'num_dependents': 3,
+    'claimed_monthly_income': 4500000,
+    'financial_literacy_score': 62,
+    'has_bank_account': True,
+    'keeps_financial_records': False,
+    'business_type': 'Warung Nasi',
+    'loan_history': {'num_loans': 4, 'avg_loan_amount': 2500000, 'total_borrowed': 10000000},
+    'repayment_history': {
+        'on_time_rate': 0.92, 'avg_days_overdue': 1.5, 'default_rate': 0.0, 'total_repayments': 96,
+    },
+}
+
+
+def legacy_features(borrower_data: Dict):
+    """The per-call path FeatureSpec replaced: a feature dict turned into a one-row DataFrame"""
+    import pandas as pd
+
+    features = {}
+    for name, section, field, default, kind in FEATURE_SPEC:
+        source = borrower_data if section is None else borrower_data.get(section, {})
+        if kind == 'flag':
+            features[name] = 1 if source.get(field) else 0
+        elif kind == 'business_type':
+            features[name] = encode_business_type(source.get(field, default))
+        else:
+            features[name] = source.get(field, default)
+
+    return pd.DataFrame([features]).to_numpy(dtype=float)
+
+
+def time_call(function: Callable[[], object], calls: int) -> float:
+    """Best-of-5 cost of one call, in microseconds"""
+    function()
+    return min(timeit.repeat(function, number=calls, repeat=5)) / calls * 1e6
+
+
+def run_benchmark(model_path: Optional[str] = None, calls: int = 20000) -> Dict[str, float]:
+    """Per-call microseconds for each path (predict paths only when a model is given)"""
+
+    spec = FeatureSpec()
+    borrower = SAMPLE_BORROWER
+    if not np.array_equal(legacy_features(borrower), spec.row(borrower)):
+        raise AssertionError("FeatureSpec.row differs from the legacy feature path")
+
+    results = {
+        "legacy_features": time_call(lambda: legacy_features(borrower), calls),
+        "spec_row": time_call(lambda: spec.row(borrower), calls),
+    }
+
+    model = CreditRiskModel(model_path) if model_path else None
+    if model is not None and model.model is not None:
+        scaler = model.scaler
+        results["legacy_scaled"] = time_call(lambda: scaler.transform(legacy_features(borrower)), calls)
+        results["spec_scaled_row"] = time_call(lambda: model._scaled_row(borrower), calls)
+        results["sklearn_predict_proba"] = time_call(
+            lambda: model.model.predict_proba(model._scaled_row(borrower)), max(calls // 100, 1)
+        )
+        if model.forest is not None:
+            forest = model.forest
+            results["compiled_predict_proba"] = time_call(
+                lambda: forest.predict_proba(spec.row(borrower)), max(calls // 10, 1)
+            )
+        results["predict"] = time_call(lambda: model.predict(borrower), max(calls // 10, 1))
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the single-row feature path")
+    parser.add_argument("model_path", nargs="?", help="Saved model to include predict() timings")
+    parser.add_argument("--calls", type=int, default=20000, help="Calls per timing run (default: 20000)")
+    args = parser.parse_args()
+
+    for name, microseconds in run_benchmark(args.model_path, args.calls).items():
+        print(f"  {name:<20} {microseconds:>10.2f} us/call")
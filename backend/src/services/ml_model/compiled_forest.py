@@ -0,0 +1,328 @@
+"""
+Compiled random forest for the credit risk model
+
+Flattens a trained RandomForestClassifier and its StandardScaler into plain
+NumPy arrays (one node table for all trees) and evaluates them with
+vectorized NumPy, without scikit-learn's per-call validation and thread
+pool. Probabilities match RandomForestClassifier.predict_proba: features
+are cast to float32 like sklearn does before the threshold tests, and leaf
+values are normalized the same way.
+
+The arrays are saved as individual .npy files next to a small JSON header,
+so an artifact can be loaded with np.load(mmap_mode=...). save() writes a
+new versioned directory and swaps a symlink to it, never rewriting files a
+running worker may have mapped.
+
+    python -m services.ml_model.compiled_forest credit_model.pkl compiled_model/
+"""
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from utils.logger import logger
+
+HEADER_FILE = "forest.json"
+FORMAT_VERSION = 1
+
+# Node table arrays, saved one .npy file each
+ARRAY_NAMES = (
+    "feature", "threshold", "children", "missing_left", "value", "roots", "mean", "scale", "feature_importances",
+)
+
+# Rows evaluated together, bounding the (rows, trees) traversal arrays
+CHUNK_ROWS = 4096
+
+
+class CompiledForest:
+    """
+    Flat-array random forest evaluator
+
+    children[node] holds the (left, right) node indices. Leaves point to
+    themselves as both children, so every row walks max_depth steps and rows
+    that reached a leaf stay there.
+
+    Args:
+        arrays: Node table (see ARRAY_NAMES)
+        max_depth: Deepest tree in the forest
+        classes: Class labels, in predict_proba column order
+        feature_names: Model input columns
+        model_version: Version of the model the forest was compiled from
+        supports_missing: Whether NaN features are routed by missing_left
+            (scikit-learn >= 1.3 trees) instead of rejected
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], max_depth: int, classes: List,
+                 feature_names: List[str], model_version: str = "1.0.0", supports_missing: bool = True):
+        # Plain ndarray views: memory-mapped arrays stay backed by the file,
+        # without np.memmap's per-operation subclass handling
+        self.memory_mapped = any(isinstance(array, np.memmap) for array in arrays.values())
+        self.feature = np.asarray(arrays["feature"])
+        self.threshold = np.asarray(arrays["threshold"])
+        self.children = np.asarray(arrays["children"])
+        self.missing_left = np.asarray(arrays["missing_left"])
+        self.value = np.asarray(arrays["value"])
+        self.roots = np.asarray(arrays["roots"])
+        self.mean = np.asarray(arrays["mean"])
+        self.scale = np.asarray(arrays["scale"])
+        self.feature_importances = np.asarray(arrays["feature_importances"])
+        self.max_depth = int(max_depth)
+        self.classes = list(classes)
+        self.feature_names = list(feature_names)
+        self.model_version = model_version
+        self.supports_missing = bool(supports_missing)
+
+    @classmethod
+    def from_sklearn(cls, model, scaler, feature_names: List[str], model_version: str = "1.0.0") -> "CompiledForest":
+        """
+        Compile a fitted RandomForestClassifier and StandardScaler
+
+        Raises:
+            ValueError: If the model or scaler is not a supported type
+        """
+
+        if getattr(model, "n_outputs_", 1) != 1 or not hasattr(model, "estimators_"):
+            raise ValueError("Only single-output fitted forests can be compiled")
+        if scaler is not None and not hasattr(scaler, "scale_") and not hasattr(scaler, "mean_"):
+            raise ValueError(f"Unsupported scaler: {type(scaler).__name__}")
+
+        n_features = model.n_features_in_
+        n_classes = len(model.classes_)
+        features, thresholds, children, missing_lefts, values, roots = [], [], [], [], [], []
+        supports_missing = True
+        offset = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            nodes = np.arange(tree.node_count)
+            leaf = tree.children_left == -1
+
+            features.append(np.where(leaf, 0, tree.feature))
+            thresholds.append(np.where(leaf, 0.0, tree.threshold))
+            children.append(np.column_stack([
+                np.where(leaf, nodes, tree.children_left),
+                np.where(leaf, nodes, tree.children_right),
+            ]) + offset)
+
+            missing_left = getattr(tree, "missing_go_to_left", None)
+            supports_missing = supports_missing and missing_left is not None
+            missing_lefts.append(np.zeros(tree.node_count, dtype=bool) if missing_left is None else missing_left.astype(bool))
+
+            # scikit-learn >= 1.4 stores class fractions; older versions store
+            # weighted counts that predict_proba normalizes
+            value = np.array(tree.value[:, 0, :n_classes], dtype=np.float64)
+            normalizer = value.sum(axis=1)[:, np.newaxis]
+            if not np.allclose(normalizer[normalizer > 0.0], 1.0):
+                normalizer[normalizer == 0.0] = 1.0
+                value /= normalizer
+            values.append(value)
+
+            roots.append(offset)
+            offset += tree.node_count
+
+        mean = getattr(scaler, "mean_", None) if getattr(scaler, "with_mean", True) else None
+        scale = getattr(scaler, "scale_", None) if getattr(scaler, "with_std", True) else None
+        arrays = {
+            "feature": np.concatenate(features).astype(np.int32),
+            "threshold": np.concatenate(thresholds).astype(np.float64),
+            "children": np.concatenate(children).astype(np.int32),
+            "missing_left": np.concatenate(missing_lefts),
+            "value": np.concatenate(values),
+            "roots": np.array(roots, dtype=np.int32),
+            # Subtracting 0 and dividing by 1 leave the features unchanged
+            "mean": np.zeros(n_features) if mean is None else np.asarray(mean, dtype=np.float64),
+            "scale": np.ones(n_features) if scale is None else np.asarray(scale, dtype=np.float64),
+            "feature_importances": np.asarray(model.feature_importances_, dtype=np.float64),
+        }
+
+        return cls(
+            arrays,
+            max_depth=max(estimator.tree_.max_depth for estimator in model.estimators_),
+            classes=model.classes_.tolist(),
+            feature_names=feature_names,
+            model_version=model_version,
+            supports_missing=supports_missing,
+        )
+
+    @property
+    def node_count(self) -> int:
+        return len(self.feature)
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the node table in bytes"""
+        return sum(getattr(self, name).nbytes for name in ARRAY_NAMES)
+
+    def predict_proba(self, features: np.ndarray) -> np.ndarray:
+        """
+        Class probabilities for unscaled feature rows
+
+        Args:
+            features: Feature matrix, shape (rows, features), before scaling
+
+        Returns:
+            Array of shape (rows, classes), like RandomForestClassifier.predict_proba
+
+        Raises:
+            ValueError: For features scikit-learn would reject (infinite or
+                beyond float32 after scaling, NaN on forests without missing
+                value support)
+        """
+
+        features = np.asarray(features, dtype=np.float64)
+        if features.ndim == 1:
+            features = features[np.newaxis, :]
+
+        if len(features) <= CHUNK_ROWS:
+            return self._predict_chunk(features)
+
+        return np.concatenate([
+            self._predict_chunk(features[start:start + CHUNK_ROWS])
+            for start in range(0, len(features), CHUNK_ROWS)
+        ])
+
+    def _predict_chunk(self, features: np.ndarray) -> np.ndarray:
+        # StandardScaler.transform arithmetic, then sklearn's float32 input cast
+        with np.errstate(over="ignore"):
+            scaled = ((features - self.mean) / self.scale).astype(np.float32)
+
+        if np.isinf(scaled).any():
+            raise ValueError("Input X contains infinity or a value too large for dtype('float32').")
+        missing = np.isnan(scaled)
+        has_missing = missing.any()
+        if has_missing and not self.supports_missing:
+            raise ValueError("Input X contains NaN.")
+
+        # Flat (row, feature) offsets into the scaled matrix
+        row_offsets = (np.arange(len(scaled)) * scaled.shape[1])[:, np.newaxis]
+        scaled, missing = scaled.ravel(), missing.ravel()
+
+        nodes = np.broadcast_to(self.roots, (len(row_offsets), len(self.roots)))
+        for _ in range(self.max_depth):
+            cells = row_offsets + self.feature[nodes]
+            go_left = scaled[cells] <= self.threshold[nodes]
+            if has_missing:
+                go_left |= missing[cells] & self.missing_left[nodes]
+            nodes = self.children[nodes, (~go_left).view(np.int8)]
+
+        # Summed in tree order, then averaged, like the forest's accumulation
+        return self.value[nodes].sum(axis=1) / len(self.roots)
+
+    def save(self, directory: str) -> None:
+        """
+        Write the node arrays (.npy) and header (forest.json) as a new artifact version
+
+        Each save writes a fresh versioned directory next to directory
+        (.<name>.v<timestamp>-*) and points directory, a symlink, at it with
+        one rename. Loaders see either the old version or the new one, and
+        files other processes have mapped are never rewritten. The previous
+        version is kept for loads still reading it; older ones are removed.
+        """
+
+        path = Path(directory)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        version_prefix = f".{path.name}.v"
+        version = Path(tempfile.mkdtemp(prefix=f"{version_prefix}{time.time_ns()}-", dir=path.parent))
+        try:
+            self._write(version)
+            os.chmod(version, 0o755)
+
+            previous = None
+            if path.is_symlink():
+                previous = (path.parent / os.readlink(path)).name
+            elif path.exists():
+                # A plain directory from an older save cannot be swapped in one
+                # rename; move it aside as the previous version (this save only)
+                aside = Path(tempfile.mkdtemp(prefix=f"{version_prefix}0-", dir=path.parent))
+                aside.rmdir()
+                os.rename(path, aside)
+                previous = aside.name
+                logger.warning(f"Replacing plain artifact directory {directory}; later saves swap atomically")
+
+            link = path.parent / f".{path.name}.link-{os.getpid()}-{time.time_ns()}"
+            os.symlink(version.name, link)
+            os.replace(link, path)
+        except BaseException:
+            shutil.rmtree(version, ignore_errors=True)
+            raise
+
+        for stale in path.parent.glob(f"{version_prefix}*"):
+            if stale.name not in (version.name, previous) and stale.is_dir() and not stale.is_symlink():
+                shutil.rmtree(stale, ignore_errors=True)
+
+        logger.info(f"Compiled forest saved to {directory} ({self.node_count} nodes, {self.nbytes / 1024:.0f} KiB)")
+
+    def _write(self, path: Path) -> None:
+        for name in ARRAY_NAMES:
+            np.save(path / f"{name}.npy", np.ascontiguousarray(getattr(self, name)))
+
+        header = {
+            "format_version": FORMAT_VERSION,
+            "max_depth": self.max_depth,
+            "classes": self.classes,
+            "feature_names": self.feature_names,
+            "model_version": self.model_version,
+            "supports_missing": self.supports_missing,
+            "node_count": self.node_count,
+            "trees": len(self.roots),
+        }
+        (path / HEADER_FILE).write_text(json.dumps(header, indent=2))
+
+    @classmethod
+    def load(cls, directory: str, mmap_mode: Optional[str] = None) -> "CompiledForest":
+        """
+        Load a compiled forest saved with save()
+
+        With mmap_mode="r" the arrays are read-only views of the files, so
+        every process loading the same artifact shares one copy of the pages
+        through the OS page cache.
+
+        Args:
+            directory: Artifact directory
+            mmap_mode: Passed to np.load for every array (e.g. "r")
+
+        Raises:
+            ValueError: If the artifact format is not supported
+        """
+
+        # Resolved once, so a concurrent save() cannot mix files of two versions
+        path = Path(directory).resolve()
+        header = json.loads((path / HEADER_FILE).read_text())
+        if header.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported compiled forest format: {header.get('format_version')}")
+
+        arrays = {name: np.load(path / f"{name}.npy", mmap_mode=mmap_mode) for name in ARRAY_NAMES}
+        return cls(
+            arrays,
+            max_depth=header["max_depth"],
+            classes=header["classes"],
+            feature_names=header["feature_names"],
+            model_version=header.get("model_version", "1.0.0"),
+            supports_missing=header.get("supports_missing", True),
+        )
+
+    @staticmethod
+    def is_artifact(path: str) -> bool:
+        """Whether path is a compiled forest directory"""
+        return (Path(path) / HEADER_FILE).is_file()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from services.ml_model.credit_risk_model import CreditRiskModel
+
+    parser = argparse.ArgumentParser(description="Compile a saved credit risk model into flat NumPy arrays")
+    parser.add_argument("model_path", help="Model saved with CreditRiskModel.save_model")
+    parser.add_argument("output_dir", help="Directory for the compiled artifact")
+    args = parser.parse_args()
+
+    credit_model = CreditRiskModel(args.model_path)
+    if credit_model.model is None:
+        raise SystemExit(f"Could not load a model from {args.model_path}")
+
+    credit_model.export_compiled(args.output_dir)
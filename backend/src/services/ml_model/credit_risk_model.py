@@ -1,29 +1,54 @@
 import numpy as np
-import pandas as pd
-from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
-from sklearn.preprocessing import LabelEncoder, StandardScaler
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import classification_report, roc_auc_score
-import joblib
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple, Union
 import json
+import threading
 
+from services.ml_model.compiled_forest import CompiledForest
+from services.ml_model.features import FeatureSpec
+from utils.config import get_settings
 from utils.logger import logger
 
 
+def _frame_records(borrowers: Union[List[Dict], Any]) -> List[Dict]:
+    """Borrower dicts from a list of dicts or a columnar frame (DataFrame or dict of columns)"""
+
+    if isinstance(borrowers, (list, tuple)):
+        return list(borrowers)
+
+    if hasattr(borrowers, 'columns'):
+        columns = {name: borrowers[name].tolist() for name in borrowers.columns}
+    else:
+        columns = {name: list(values) for name, values in borrowers.items()}
+
+    count = len(next(iter(columns.values()), []))
+    # Empty cells behave like absent fields, so the prepare_features defaults apply
+    return [
+        {
+            name: values[index] for name, values in columns.items()
+            if values[index] is not None and values[index] == values[index]
+        }
+        for index in range(count)
+    ]
+
+
 class CreditRiskModel:
     """ML model for baseline credit risk assessment"""
 
-    def __init__(self, model_path: str = None):
+    def __init__(self, model_path: str = None, mmap_mode: Optional[str] = None):
+        # scikit-learn and joblib are imported only to train, save or load
+        # a model, keeping them off the import path of the API workers
         self.model = None
-        self.scaler = StandardScaler()
+        self.scaler = None
+        # Flat-array copy of model + scaler used for predictions when available
+        self.forest = None
         self.label_encoders = {}
-        self.feature_names = []
+        self.feature_spec = FeatureSpec()
+        self.feature_names = list(self.feature_spec.names)
         self.model_version = "1.0.0"
 
         if model_path and Path(model_path).exists():
-            self.load_model(model_path)
+            self.load_model(model_path, mmap_mode=mmap_mode)
 
     def prepare_features(self, borrower_data: Dict) -> np.ndarray:
         """
@@ -36,63 +61,21 @@ class CreditRiskModel:
         - Financial literacy score
         - Business type (encoded)
         - Has bank account, keeps records (binary)
-        """
 
-        features = {}
-
-        # Demographics
-        features['age'] = borrower_data.get('age', 35)
-        features['years_in_business'] = borrower_data.get('years_in_business', 2.0)
-        features['num_dependents'] = borrower_data.get('num_dependents', 2)
-        features['monthly_income'] = borrower_data.get('claimed_monthly_income', 3000000)
-
-        # Financial literacy & behavior
-        features['financial_literacy_score'] = borrower_data.get('financial_literacy_score', 50)
-        features['has_bank_account'] = 1 if borrower_data.get('has_bank_account') else 0
-        features['keeps_financial_records'] = 1 if borrower_data.get('keeps_financial_records') else 0
+        Columns and defaults are declared in features.FEATURE_SPEC.
+        """
 
-        # Loan history features
-        loan_history = borrower_data.get('loan_history', {})
-        features['num_previous_loans'] = loan_history.get('num_loans', 0)
-        features['avg_loan_amount'] = loan_history.get('avg_loan_amount', 0)
-        features['total_borrowed'] = loan_history.get('total_borrowed', 0)
+        return self.feature_spec.row(borrower_data).copy()
 
-        # Repayment history features
-        repayment_history = borrower_data.get('repayment_history', {})
-        features['on_time_rate'] = repayment_history.get('on_time_rate', 0.5)  # 0-1
-        features['avg_days_overdue'] = repayment_history.get('avg_days_overdue', 5.0)
-        features['default_rate'] = repayment_history.get('default_rate', 0.0)  # 0-1
-        features['total_repayments'] = repayment_history.get('total_repayments', 0)
-
-        # Business type encoding
-        business_type = borrower_data.get('business_type', 'Unknown')
-        features['business_type_encoded'] = self._encode_business_type(business_type)
-
-        # Convert to DataFrame for consistency
-        df = pd.DataFrame([features])
-        self.feature_names = list(features.keys())
-
-        return df.values
-
-    def _encode_business_type(self, business_type: str) -> int:
-        """Encode business type to numeric value"""
-        business_mapping = {
-            'Warung Kelontong': 1,
-            'Warung Gorengan': 2,
-            'Jahit Pakaian': 3,
-            'Jualan Sayur': 4,
-            'Catering': 5,
-            'Salon': 6,
-            'Toko Pulsa': 7,
-            'Warung Nasi': 8,
-            'Industri Kerupuk': 9,
-        }
+    def _scaled_row(self, borrower_data: Dict) -> np.ndarray:
+        """Scaled feature row for predict, built in the spec's reusable buffers"""
 
-        for key in business_mapping:
-            if key in business_type:
-                return business_mapping[key]
+        scaler = self.scaler
+        if getattr(scaler, 'with_mean', False) and getattr(scaler, 'with_std', False) \
+                and getattr(scaler, 'mean_', None) is not None:
+            return self.feature_spec.scaled_row(borrower_data, scaler.mean_, scaler.scale_)
 
-        return 0  # Unknown
+        return scaler.transform(self.feature_spec.row(borrower_data))
 
     def predict(self, borrower_data: Dict) -> Dict:
         """
@@ -109,47 +92,147 @@ class CreditRiskModel:
         """
 
         try:
-            # Prepare features
-            features = self.prepare_features(borrower_data)
-
             # If no model is loaded, use rule-based scoring
-            if self.model is None:
+            if not self.has_model:
                 logger.warning("ML model not loaded, using rule-based scoring")
                 return self._rule_based_scoring(borrower_data)
 
-            # Scale features
-            features_scaled = self.scaler.transform(features)
+            # Predict probability (the compiled forest scales internally)
+            if self.forest is not None:
+                prob = self.forest.predict_proba(self.feature_spec.row(borrower_data))[0]
+            else:
+                prob = self.model.predict_proba(self._scaled_row(borrower_data))[0]
+
+            return self._prediction_result(prob, self._feature_importance())
 
-            # Predict probability
-            prob = self.model.predict_proba(features_scaled)[0]
-            # Assuming class 1 is "good credit", convert to 0-100 score
-            baseline_score = float(prob[1] * 100)
+        except Exception as e:
+            logger.error(f"Error in ML prediction: {e}")
+            # Fallback to rule-based scoring
+            return self._rule_based_scoring(borrower_data)
 
-            # Determine risk category
-            risk_category = self._categorize_risk(baseline_score)
+    def predict_batch(self, borrowers: Union[List[Dict], Any]) -> List[Dict]:
+        """
+        Predict credit risk scores for many borrowers at once
 
-            # Calculate confidence
-            confidence = float(max(prob))
+        Builds one feature matrix, then scales it and calls predict_proba
+        once for the whole batch. Results match predict() row by row.
 
-            # Feature importance
-            feature_importance = {}
-            if hasattr(self.model, 'feature_importances_'):
-                importances = self.model.feature_importances_
-                for name, importance in zip(self.feature_names, importances):
-                    feature_importance[name] = float(importance)
+        Args:
+            borrowers: Borrower dicts, or a columnar frame (pandas DataFrame or
+                dict of equal-length columns) with the same fields
+
+        Returns:
+            One predict() result per borrower, in order
+        """
 
-            return {
-                "baseline_score": round(baseline_score, 2),
-                "risk_category": risk_category,
-                "confidence": round(confidence, 2),
-                "feature_importance": feature_importance,
-                "model_version": self.model_version
-            }
+        records = _frame_records(borrowers)
+        if not records:
+            return []
 
+        if not self.has_model:
+            logger.warning(f"ML model not loaded, using rule-based scoring for {len(records)} borrowers")
+            return [self._rule_based_scoring(borrower_data) for borrower_data in records]
+
+        try:
+            features = self.feature_spec.matrix(records)
+            # sklearn's native loops win on large matrices; the compiled forest
+            # covers compiled-only artifacts (same probabilities either way)
+            if self.model is not None:
+                probabilities = self.model.predict_proba(self.scaler.transform(features))
+            else:
+                probabilities = self.forest.predict_proba(features)
         except Exception as e:
-            logger.error(f"Error in ML prediction: {e}")
-            # Fallback to rule-based scoring
-            return self._rule_based_scoring(borrower_data)
+            # A bad row fails the whole matrix; predict() isolates it
+            logger.error(f"Error in batch ML prediction, predicting row by row: {e}")
+            return [self.predict(borrower_data) for borrower_data in records]
+
+        feature_importance = self._feature_importance()
+        return [self._prediction_result(prob, feature_importance) for prob in probabilities]
+
+    def _prediction_result(self, prob: np.ndarray, feature_importance: Dict[str, float]) -> Dict:
+        """predict() result from one row of predict_proba"""
+
+        # Assuming class 1 is "good credit", convert to 0-100 score
+        baseline_score = float(prob[1] * 100)
+
+        # Determine risk category
+        risk_category = self._categorize_risk(baseline_score)
+
+        # Calculate confidence
+        confidence = float(max(prob))
+
+        return {
+            "baseline_score": round(baseline_score, 2),
+            "risk_category": risk_category,
+            "confidence": round(confidence, 2),
+            "feature_importance": dict(feature_importance),
+            "model_version": self.model_version
+        }
+
+    def _feature_importance(self) -> Dict[str, float]:
+        """Feature name -> importance of the loaded model (empty if it has none)"""
+
+        feature_importance = {}
+        # RandomForestClassifier.feature_importances_ is recomputed over every
+        # tree on each access; the compiled forest stores it once
+        if self.forest is not None:
+            importances = self.forest.feature_importances
+        elif hasattr(self.model, 'feature_importances_'):
+            importances = self.model.feature_importances_
+        else:
+            importances = []
+
+        for name, importance in zip(self.feature_names, importances):
+            feature_importance[name] = float(importance)
+        return feature_importance
+
+    def stats(self) -> Dict:
+        """Which model backend is loaded and how much memory its arrays take"""
+        if self.forest is not None:
+            backend = "compiled"
+        elif self.model is not None:
+            backend = "sklearn"
+        else:
+            backend = "rule-based"
+
+        return {
+            "backend": backend,
+            "model_version": self.model_version,
+            "memory_mapped": bool(self.forest is not None and self.forest.memory_mapped),
+            "compiled_nbytes": self.forest.nbytes if self.forest is not None else 0,
+            "sklearn_loaded": self.model is not None,
+        }
+
+    @property
+    def has_model(self) -> bool:
+        """Whether an ML model (sklearn or compiled) is loaded"""
+        return self.model is not None or self.forest is not None
+
+    def compile_model(self) -> CompiledForest:
+        """Compile the trained model and scaler into a flat-array forest and use it for predictions"""
+
+        self.forest = CompiledForest.from_sklearn(
+            self.model, self.scaler, self.feature_names, self.model_version
+        )
+        logger.info(
+            f"Compiled {len(self.forest.roots)} trees ({self.forest.node_count} nodes, "
+            f"{self.forest.nbytes / 1024:.0f} KiB)"
+        )
+        return self.forest
+
+    def _compile_or_warn(self) -> None:
+        try:
+            self.compile_model()
+        except ValueError as e:
+            self.forest = None
+            logger.warning(f"Model not compiled, predicting with scikit-learn: {e}")
+
+    def export_compiled(self, directory: str) -> None:
+        """Save the compiled forest, loadable with load_model(directory) without scikit-learn"""
+
+        if self.forest is None:
+            self.compile_model()
+        self.forest.save(directory)
 
     def _rule_based_scoring(self, borrower_data: Dict) -> Dict:
         """
@@ -234,11 +317,16 @@ class CreditRiskModel:
             labels: List of binary labels (1 = good credit, 0 = bad credit)
         """
 
+        from sklearn.ensemble import RandomForestClassifier
+        from sklearn.metrics import classification_report, roc_auc_score
+        from sklearn.model_selection import train_test_split
+        from sklearn.preprocessing import StandardScaler
+
         logger.info(f"Training credit risk model with {len(training_data)} samples")
 
         # Prepare feature matrix
-        X = np.array([self.prepare_features(data) for data in training_data])
-        X = X.reshape(len(training_data), -1)
+        X = self.feature_spec.matrix(training_data)
+        self.feature_names = list(self.feature_spec.names)
         y = np.array(labels)
 
         # Split data
@@ -247,6 +335,7 @@ class CreditRiskModel:
         )
 
         # Scale features
+        self.scaler = StandardScaler()
         X_train_scaled = self.scaler.fit_transform(X_train)
         X_test_scaled = self.scaler.transform(X_test)
 
@@ -270,10 +359,14 @@ class CreditRiskModel:
         logger.info(f"ROC-AUC: {roc_auc_score(y_test, y_prob):.3f}")
         logger.info(f"\n{classification_report(y_test, y_pred)}")
 
+        self._compile_or_warn()
+
         return self.model
 
     def save_model(self, filepath: str):
         """Save trained model to disk"""
+        import joblib
+
         Path(filepath).parent.mkdir(parents=True, exist_ok=True)
 
         model_data = {
@@ -286,14 +379,35 @@ class CreditRiskModel:
         joblib.dump(model_data, filepath)
         logger.info(f"Model saved to {filepath}")
 
-    def load_model(self, filepath: str):
-        """Load trained model from disk"""
+    def load_model(self, filepath: str, mmap_mode: Optional[str] = None):
+        """
+        Load trained model from disk (a save_model file or an export_compiled directory)
+
+        Args:
+            filepath: Model file or compiled model directory
+            mmap_mode: np.load mmap_mode for compiled model arrays (e.g. "r");
+                pickled models are always read into process memory
+        """
         try:
+            if CompiledForest.is_artifact(filepath):
+                self.forest = CompiledForest.load(filepath, mmap_mode=mmap_mode)
+                self.feature_names = self.forest.feature_names
+                self.model_version = self.forest.model_version
+                mapped = " (memory-mapped)" if self.forest.memory_mapped else ""
+                logger.info(f"Compiled model loaded from {filepath}{mapped}")
+                logger.info(f"Model version: {self.model_version}")
+                return
+
+            import joblib
+
             model_data = joblib.load(filepath)
             self.model = model_data['model']
             self.scaler = model_data['scaler']
             self.feature_names = model_data['feature_names']
+            if list(self.feature_names) != list(self.feature_spec.names):
+                logger.warning("Model feature names differ from the feature spec; predictions may be wrong")
             self.model_version = model_data.get('model_version', '1.0.0')
+            self._compile_or_warn()
 
             logger.info(f"Model loaded from {filepath}")
             logger.info(f"Model version: {self.model_version}")
@@ -301,3 +415,42 @@ class CreditRiskModel:
         except Exception as e:
             logger.error(f"Error loading model: {e}")
             logger.warning("Model will use rule-based scoring fallback")
+
+
+_credit_risk_model: Optional[CreditRiskModel] = None
+_credit_risk_model_lock = threading.Lock()
+
+
+def get_credit_risk_model() -> CreditRiskModel:
+    """
+    Get the process-wide credit risk model
+
+    Loads ML_COMPILED_MODEL_PATH (memory-mapped when ML_MODEL_MMAP is set)
+    if it exists, otherwise ML_MODEL_PATH. Loaded before workers fork
+    (ML_MODEL_PRELOAD with gunicorn --preload), the model is shared
+    copy-on-write; memory-mapped arrays are shared between any processes
+    mapping the same files.
+    """
+    global _credit_risk_model
+    if _credit_risk_model is not None:
+        return _credit_risk_model
+
+    # Loaded from worker threads: only the first caller reads the model file
+    with _credit_risk_model_lock:
+        if _credit_risk_model is None:
+            settings = get_settings()
+            compiled_path = settings.ML_COMPILED_MODEL_PATH
+            if compiled_path and CompiledForest.is_artifact(compiled_path):
+                _credit_risk_model = CreditRiskModel(compiled_path, mmap_mode="r" if settings.ML_MODEL_MMAP else None)
+            else:
+                if compiled_path:
+                    logger.warning(f"No compiled model at {compiled_path}, loading {settings.ML_MODEL_PATH}")
+                _credit_risk_model = CreditRiskModel(settings.ML_MODEL_PATH)
+    return _credit_risk_model
+
+
+def credit_model_stats() -> Dict:
+    """Stats of the process-wide model, without loading it"""
+    if _credit_risk_model is None:
+        return {"loaded": False}
+    return {"loaded": True, **_credit_risk_model.stats()}
@@ -0,0 +1,140 @@
+"""
+Compiled feature spec for the credit risk model
+
+The model's input columns are declared once, in a fixed order, and a
+FeatureSpec fills them straight from the borrower dict into preallocated
+per-thread buffers: no intermediate dict, DataFrame or array per call.
+"""
+import threading
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Substring of business_type -> encoded value (first match wins, 0 = unknown)
+BUSINESS_TYPE_CODES = {
+    'Warung Kelontong': 1,
+    'Warung Gorengan': 2,
+    'Jahit Pakaian': 3,
+    'Jualan Sayur': 4,
+    'Catering': 5,
+    'Salon': 6,
+    'Toko Pulsa': 7,
+    'Warung Nasi': 8,
+    'Industri Kerupuk': 9,
+}
+
+# How a column is read from the borrower dict
+VALUE = "value"              # the field itself, or the default when absent
+FLAG = "flag"                # 1 when the field is truthy, else 0
+BUSINESS_TYPE = "business_type"
+
+# Stand-in for a missing section (never mutated)
+_EMPTY_SECTION: Dict = {}
+
+# Model columns in order: (feature name, section of the borrower dict or None, field, default, kind)
+FEATURE_SPEC: Tuple[Tuple, ...] = (
+    # Demographics
+    ('age', None, 'age', 35, VALUE),
+    ('years_in_business', None, 'years_in_business', 2.0, VALUE),
+    ('num_dependents', None, 'num_dependents', 2, VALUE),
+    ('monthly_income', None, 'claimed_monthly_income', 3000000, VALUE),
+
+    # Financial literacy & behavior
+    ('financial_literacy_score', None, 'financial_literacy_score', 50, VALUE),
+    ('has_bank_account', None, 'has_bank_account', None, FLAG),
+    ('keeps_financial_records', None, 'keeps_financial_records', None, FLAG),
+
+    # Loan history
+    ('num_previous_loans', 'loan_history', 'num_loans', 0, VALUE),
+    ('avg_loan_amount', 'loan_history', 'avg_loan_amount', 0, VALUE),
+    ('total_borrowed', 'loan_history', 'total_borrowed', 0, VALUE),
+
+    # Repayment history
+    ('on_time_rate', 'repayment_history', 'on_time_rate', 0.5, VALUE),  # 0-1
+    ('avg_days_overdue', 'repayment_history', 'avg_days_overdue', 5.0, VALUE),
+    ('default_rate', 'repayment_history', 'default_rate', 0.0, VALUE),  # 0-1
+    ('total_repayments', 'repayment_history', 'total_repayments', 0, VALUE),
+
+    # Business type
+    ('business_type_encoded', None, 'business_type', 'Unknown', BUSINESS_TYPE),
+)
+
+
+def encode_business_type(business_type: str) -> int:
+    """Encode business type to numeric value"""
+    for key, code in BUSINESS_TYPE_CODES.items():
+        if key in business_type:
+            return code
+
+    return 0  # Unknown
+
+
+class FeatureSpec:
+    """
+    Fixed-order feature extraction
+
+    Args:
+        spec: Column declarations, see FEATURE_SPEC
+    """
+
+    def __init__(self, spec: Sequence[Tuple] = FEATURE_SPEC):
+        self.spec = tuple(spec)
+        self.names = tuple(name for name, *_ in self.spec)
+        self.size = len(self.spec)
+
+        # Columns grouped by section so each section is looked up once per row
+        groups: Dict[Optional[str], list] = {}
+        for column, (_, section, field, default, kind) in enumerate(self.spec):
+            groups.setdefault(section, []).append((column, field, default, kind))
+        self._groups = tuple((section, tuple(columns)) for section, columns in groups.items())
+
+        # One buffer per thread: predictions run in asyncio.to_thread workers
+        self._local = threading.local()
+
+    def row(self, borrower_data: Dict) -> np.ndarray:
+        """
+        Feature row (shape (1, size)) for one borrower
+
+        The array is this thread's reusable buffer: it is overwritten by the
+        next call on the same thread, so copy it to keep it.
+        """
+        buffers = getattr(self._local, 'row', None)
+        if buffers is None:
+            buffer = np.empty((1, self.size))
+            buffers = self._local.row = (buffer, buffer[0])
+
+        self._fill(buffers[1], borrower_data)
+        return buffers[0]
+
+    def scaled_row(self, borrower_data: Dict, mean: np.ndarray, scale: np.ndarray) -> np.ndarray:
+        """
+        Standardized feature row, (row - mean) / scale, in a second reusable buffer
+
+        Same arithmetic, in the same order, as StandardScaler.transform.
+        """
+        row = self.row(borrower_data)
+        buffer = getattr(self._local, 'scaled', None)
+        if buffer is None:
+            buffer = self._local.scaled = np.empty((1, self.size))
+
+        np.subtract(row, mean, out=buffer)
+        np.divide(buffer, scale, out=buffer)
+        return buffer
+
+    def matrix(self, borrowers: Sequence[Dict], out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Feature matrix (shape (len(borrowers), size)), one row per borrower"""
+        matrix = out if out is not None else np.empty((len(borrowers), self.size))
+        for index, borrower_data in enumerate(borrowers):
+            self._fill(matrix[index], borrower_data)
+        return matrix
+
+    def _fill(self, target: np.ndarray, borrower_data: Dict) -> None:
+        for section, columns in self._groups:
+            source = borrower_data if section is None else borrower_data.get(section, _EMPTY_SECTION)
+            for column, field, default, kind in columns:
+                if kind is VALUE:
+                    target[column] = source.get(field, default)
+                elif kind is FLAG:
+                    target[column] = 1 if source.get(field) else 0
+                else:
+                    target[column] = encode_business_type(source.get(field, default))
@@ -1,15 +1,137 @@
-from typing import Dict, List, Optional
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence
 from decimal import Decimal
-import google.generativeai as genai
-
-from services.ml_model.credit_risk_model import CreditRiskModel
-from services.gemini.vision_analyzer import GeminiVisionAnalyzer
-from services.gemini.nlp_extractor import GeminiNLPExtractor
+from datetime import datetime, timezone
+from functools import cached_property
+import asyncio
+import json
+import time
+
+import numpy as np
+
+from services.ml_model.credit_risk_model import CreditRiskModel, get_credit_risk_model
+from services.gemini.vision_analyzer import GeminiVisionAnalyzer, VISION_PROMPT_VERSION
+from services.gemini.nlp_extractor import GeminiNLPExtractor, NLP_PROMPT_VERSION
+from services.gemini.cache import content_hash
+from services.gemini.client import generate_text
+from services.scoring.pipeline import StagePipeline
+from utils.concurrency import (
+    DeadlineExceeded,
+    gather_bounded,
+    get_process_limiter,
+    make_deadline,
+    remaining_time,
+)
 from utils.config import get_settings
 from utils.logger import logger
 
 settings = get_settings()
 
+ASSESSMENT_VERSION = "1.0.0"
+
+# Weight of each Gemini adjustment when fused with the ML baseline
+FUSION_WEIGHTS = {
+    "vision": 0.5,
+    "nlp": 0.5,
+}
+
+# Risk bands: minimum final score for each category, best first
+RISK_CUTOFFS = (
+    (75, "low"),
+    (55, "medium"),
+    (35, "high"),
+)
+LOWEST_RISK_CATEGORY = "very_high"
+
+# Share of monthly income that can safely go to repayments, per risk category
+SAFE_REPAYMENT_RATES = {
+    "low": 0.30,
+    "medium": 0.25,
+    "high": 0.20,
+    "very_high": 0.15,
+}
+
+# Loan sizing per risk category: (max loan as a multiple of monthly income, term in weeks)
+LOAN_SIZING = {
+    "low": (3.0, 24),
+    "medium": (2.0, 20),
+    "high": (1.0, 16),
+    "very_high": (0.5, 12),
+}
+
+# Weeks per month when converting weekly repayments to monthly
+WEEKS_PER_MONTH = 4.3
+
+# Weight of each monthly income estimate in the AI income estimate
+INCOME_ESTIMATE_WEIGHTS = {
+    "nlp": 0.40,
+    "vision": 0.35,
+    "benchmark": 0.25,
+}
+
+# Typical monthly income by business type (matched as a substring)
+INCOME_BENCHMARKS = {
+    "Warung Kelontong": 3500000,
+    "Warung Gorengan": 2500000,
+    "Jahit Pakaian": 3000000,
+    "Jualan Sayur": 2000000,
+    "Catering": 4500000,
+    "Salon": 3000000,
+    "Toko Pulsa": 3200000,
+    "Warung Nasi": 3800000,
+    "Industri Kerupuk": 2800000,
+}
+DEFAULT_BENCHMARK_INCOME = 3000000
+
+# Async callback receiving (event name, payload) as assessment stages complete
+EventCallback = Callable[[str, Dict], Awaitable[None]]
+
+# Borrower fields read by the risk explanation prompt and its fallback
+EXPLANATION_BORROWER_FIELDS = (
+    'full_name',
+    'business_type',
+    'claimed_monthly_income',
+    'years_in_business',
+    'financial_literacy_score',
+    'has_bank_account',
+    'keeps_financial_records',
+)
+
+
+def _parse_timestamp(value) -> Optional[datetime]:
+    """Parse an ISO timestamp from Supabase into an aware datetime"""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        try:
+            parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _round_values(values: np.ndarray, ndigits: int) -> np.ndarray:
+    """
+    Round like Python's round(value, ndigits), element-wise
+
+    np.round scales by 10**ndigits first, which can land on the other side
+    of a .5 tie than the exact decimal rounding Python does. Elements whose
+    scaled value is that close to a tie are re-rounded with round().
+    """
+
+    values = np.asarray(values, dtype=float)
+    scaled = values * (10.0 ** ndigits)
+    rounded = np.round(scaled) / (10.0 ** ndigits)
+
+    # inf (e.g. repayment ratios without income) is never a tie
+    with np.errstate(invalid='ignore'):
+        near_tie = np.abs(np.abs(scaled - np.floor(scaled)) - 0.5) <= np.abs(scaled) * 1e-12 + 1e-9
+    for index in zip(*np.nonzero(near_tie)):
+        rounded[index] = round(float(values[index]), ndigits)
+
+    return rounded
+
 
 class AdaptiveScoringEngine:
     """
@@ -23,13 +145,30 @@ class AdaptiveScoringEngine:
     """
 
     def __init__(self):
-        self.ml_model = CreditRiskModel(settings.ML_MODEL_PATH)
-        self.vision_analyzer = GeminiVisionAnalyzer()
-        self.nlp_extractor = GeminiNLPExtractor()
+        # Gemini model for explanation generation (client configured once per process)
+        self.explanation_model_name = settings.GEMINI_MODEL
 
-        # Configure Gemini for explanation generation
-        genai.configure(api_key=settings.GOOGLE_API_KEY)
-        self.explanation_model = genai.GenerativeModel(settings.GEMINI_MODEL)
+    # Components are built on first use, so constructing the engine (and
+    # importing the routes) does not load the model file
+
+    @cached_property
+    def ml_model(self) -> CreditRiskModel:
+        # Shared by every engine in the process, see get_credit_risk_model
+        return get_credit_risk_model()
+
+    async def load_ml_model(self) -> CreditRiskModel:
+        """ml_model, loaded in a worker thread on first use so the event loop never reads the model file"""
+        if 'ml_model' in self.__dict__:
+            return self.ml_model
+        return await asyncio.to_thread(lambda: self.ml_model)
+
+    @cached_property
+    def vision_analyzer(self) -> GeminiVisionAnalyzer:
+        return GeminiVisionAnalyzer()
+
+    @cached_property
+    def nlp_extractor(self) -> GeminiNLPExtractor:
+        return GeminiNLPExtractor()
 
     async def assess_borrower(
         self,
@@ -43,64 +182,336 @@ class AdaptiveScoringEngine:
 
         Args:
             borrower_data: Borrower information and history
-            photos: List of photo records with paths
-            field_notes: List of field agent notes
-            options: Assessment options (include_vision, include_nlp)
+            photos: List of photo records with paths (stored completed analyses are reused)
+            field_notes: List of field agent notes (stored completed analyses are reused)
+            options: Assessment options (include_vision, include_nlp, nlp_batch,
+                vision_batch, defer_explanation, on_event, time_budget,
+                latest_assessment, ml_result)
 
         Returns:
-            Complete credit assessment with all scores and explanations
+            Complete credit assessment with all scores, explanations,
+            per-stage wall times (stage_timings, milliseconds) and the newly
+            computed photo/note analyses to persist (artifact_updates).
+            With defer_explanation, risk_explanation is None and
+            explanation_context holds the inputs for generate_explanation.
+            With on_event, each stage result is also emitted as it completes
+            (ml_baseline, vision_photo, vision, nlp_note, nlp, score,
+            income_validation, loan_recommendation, explanation).
+            With time_budget (seconds), vision/NLP/explanation work still
+            running when the budget runs out falls back to the rule-based
+            paths and the stage is listed in degraded_stages.
+            When latest_assessment (the borrower's latest stored row) carries
+            the same input_fingerprint, it is returned without re-scoring.
+            ml_result (from ml_model.predict_batch) replaces the ML prediction.
         """
 
         options = options or {}
         include_vision = options.get('include_vision', True)
         include_nlp = options.get('include_nlp', True)
+        defer_explanation = options.get('defer_explanation', False)
+        on_event = options.get('on_event')
+        deadline = make_deadline(options.get('time_budget', settings.ASSESSMENT_TIME_BUDGET_SECONDS))
+        degraded_stages = []
+
+        fingerprint_photos = photos if include_vision else None
+        fingerprint_notes = field_notes if include_nlp else None
+        ml_model = await self.load_ml_model()
+        fingerprint = self.input_fingerprint(
+            borrower_data, fingerprint_photos, fingerprint_notes, ml_model.model_version
+        )
+        latest = options.get('latest_assessment')
+        if (
+            latest
+            and latest.get('input_fingerprint') == fingerprint
+            and (latest.get('risk_explanation') or defer_explanation)
+        ):
+            logger.info(f"Inputs unchanged since assessment {latest.get('id')}, reusing it")
+            return self.assessment_from_row(latest, borrower_data, defer_explanation)
 
         logger.info(f"Starting assessment for borrower {borrower_data.get('id', 'unknown')}")
 
-        # Step 1: ML Baseline Prediction
-        ml_result = self.ml_model.predict(borrower_data)
-        logger.info(f"ML baseline score: {ml_result['baseline_score']}")
-
-        # Step 2: Vision Analysis (if photos available)
-        vision_result = None
-        vision_adjustment = 0.0
-        vision_confidence = 0.0
-
-        if include_vision and photos:
-            vision_result = await self._analyze_photos(photos, borrower_data)
-            vision_adjustment = vision_result.get('score_adjustment', 0.0)
-            vision_confidence = vision_result.get('confidence', 0.7)
-            logger.info(f"Vision adjustment: {vision_adjustment:+.2f} points")
-
-        # Step 3: NLP Analysis (if field notes available)
-        nlp_result = None
-        nlp_adjustment = 0.0
-        nlp_confidence = 0.0
-
-        if include_nlp and field_notes:
-            nlp_result = await self._analyze_field_notes(field_notes, borrower_data)
-            nlp_adjustment = nlp_result.get('score_adjustment', 0.0)
-            nlp_confidence = nlp_result.get('confidence', 0.7)
-            logger.info(f"NLP adjustment: {nlp_adjustment:+.2f} points")
-
-        # Step 4: Fuse Scores
-        final_score = self._fuse_scores(
-            ml_result['baseline_score'],
-            vision_adjustment,
-            nlp_adjustment
+        # Stage 1: ML Baseline Prediction
+        async def ml_stage(inputs: Dict) -> Dict:
+            ml_result = options.get('ml_result') or await asyncio.to_thread(ml_model.predict, borrower_data)
+            logger.info(f"ML baseline score: {ml_result['baseline_score']}")
+            await self._emit(on_event, 'ml_baseline', ml_result)
+            return ml_result
+
+        # Stage 2: Vision Analysis (if photos available)
+        async def vision_stage(inputs: Dict) -> Optional[Dict]:
+            if not (include_vision and photos):
+                return None
+            vision_result = await self._analyze_photos(
+                photos, borrower_data,
+                batch=options.get('vision_batch', settings.VISION_BATCH_MODE),
+                on_event=on_event,
+                deadline=deadline
+            )
+            if vision_result['degraded']:
+                degraded_stages.append('vision')
+            logger.info(f"Vision adjustment: {vision_result.get('score_adjustment', 0.0):+.2f} points")
+            await self._emit(on_event, 'vision', {
+                "score_adjustment": round(vision_result['score_adjustment'], 2),
+                "confidence": round(vision_result['confidence'], 2),
+                "summary": vision_result['insights'].get('summary')
+            })
+            return vision_result
+
+        # Stage 3: NLP Analysis (if field notes available)
+        async def nlp_stage(inputs: Dict) -> Optional[Dict]:
+            if not (include_nlp and field_notes):
+                return None
+            nlp_result = await self._analyze_field_notes(
+                field_notes, borrower_data,
+                batch=options.get('nlp_batch', settings.NLP_BATCH_MODE),
+                on_event=on_event,
+                deadline=deadline
+            )
+            if nlp_result['degraded']:
+                degraded_stages.append('nlp')
+            logger.info(f"NLP adjustment: {nlp_result.get('score_adjustment', 0.0):+.2f} points")
+            await self._emit(on_event, 'nlp', {
+                "score_adjustment": round(nlp_result['score_adjustment'], 2),
+                "confidence": round(nlp_result['confidence'], 2),
+                "summary": nlp_result['insights'].get('summary')
+            })
+            return nlp_result
+
+        # Stage 4: Fuse Scores
+        async def fusion_stage(inputs: Dict) -> Dict:
+            vision_result, nlp_result = inputs['vision'], inputs['nlp']
+            vision_adjustment = vision_result.get('score_adjustment', 0.0) if vision_result else 0.0
+            nlp_adjustment = nlp_result.get('score_adjustment', 0.0) if nlp_result else 0.0
+            final_score = self._fuse_scores(
+                inputs['ml']['baseline_score'], vision_adjustment, nlp_adjustment
+            )
+            risk_category = self._categorize_risk(final_score)
+            await self._emit(on_event, 'score', {
+                "ml_baseline_score": round(inputs['ml']['baseline_score'], 2),
+                "vision_score_adjustment": round(vision_adjustment, 2),
+                "nlp_score_adjustment": round(nlp_adjustment, 2),
+                "final_credit_score": round(final_score, 2),
+                "risk_category": risk_category
+            })
+            return {
+                "final_score": final_score,
+                "risk_category": risk_category
+            }
+
+        # Stage 5: Income Validation
+        async def income_stage(inputs: Dict) -> Dict:
+            income_validation = self._validate_income(
+                claimed_income=borrower_data.get('claimed_monthly_income', 0),
+                nlp_result=inputs['nlp'],
+                vision_result=inputs['vision'],
+                borrower_data=borrower_data
+            )
+            await self._emit(on_event, 'income_validation', income_validation)
+            return income_validation
+
+        # Stage 6: Loan Recommendation
+        async def loan_stage(inputs: Dict) -> Dict:
+            loan_recommendation = self._recommend_loan(
+                final_score=inputs['fusion']['final_score'],
+                risk_category=inputs['fusion']['risk_category'],
+                income_validation=inputs['income'],
+                borrower_data=borrower_data
+            )
+            await self._emit(on_event, 'loan_recommendation', loan_recommendation)
+            return loan_recommendation
+
+        # Stage 7: Generate Risk Explanation (skipped when the caller defers it)
+        async def explanation_stage(inputs: Dict) -> Optional[str]:
+            if defer_explanation:
+                return None
+            final_score = inputs['fusion']['final_score']
+            risk_category = inputs['fusion']['risk_category']
+            try:
+                remaining = remaining_time(deadline)
+                if remaining is not None and remaining <= 0:
+                    raise DeadlineExceeded("no time left for the explanation")
+                explanation = await asyncio.wait_for(
+                    self._request_risk_explanation(
+                        borrower_data=borrower_data,
+                        ml_result=inputs['ml'],
+                        vision_result=inputs['vision'],
+                        nlp_result=inputs['nlp'],
+                        final_score=final_score,
+                        risk_category=risk_category
+                    ),
+                    remaining
+                )
+            except asyncio.TimeoutError:
+                logger.warning("Time budget exhausted, using fallback risk explanation")
+                degraded_stages.append('explanation')
+                explanation = self._fallback_explanation(borrower_data, final_score, risk_category)
+            except Exception as e:
+                logger.error(f"Error generating risk explanation, using fallback: {e}")
+                degraded_stages.append('explanation')
+                explanation = self._fallback_explanation(borrower_data, final_score, risk_category)
+            await self._emit(on_event, 'explanation', {"risk_explanation": explanation})
+            return explanation
+
+        # Stage 8: Extract Risk Factors
+        async def factors_stage(inputs: Dict) -> tuple:
+            return self._extract_factors(
+                borrower_data, inputs['ml'], inputs['vision'], inputs['nlp']
+            )
+
+        pipeline = StagePipeline()
+        pipeline.add_stage('ml', ml_stage)
+        pipeline.add_stage('vision', vision_stage)
+        pipeline.add_stage('nlp', nlp_stage)
+        pipeline.add_stage('fusion', fusion_stage, depends_on=['ml', 'vision', 'nlp'])
+        pipeline.add_stage('income', income_stage, depends_on=['vision', 'nlp'])
+        pipeline.add_stage('loan', loan_stage, depends_on=['fusion', 'income'])
+        pipeline.add_stage('explanation', explanation_stage, depends_on=['ml', 'vision', 'nlp', 'fusion'])
+        pipeline.add_stage('factors', factors_stage, depends_on=['ml', 'vision', 'nlp'])
+
+        pipeline_start = time.perf_counter()
+        results, stage_timings = await pipeline.run()
+        stage_timings['total'] = round((time.perf_counter() - pipeline_start) * 1000, 2)
+
+        ml_result = results['ml']
+        vision_result = results['vision']
+        nlp_result = results['nlp']
+        final_score = results['fusion']['final_score']
+        risk_category = results['fusion']['risk_category']
+        risk_factors, positive_factors = results['factors']
+
+        vision_adjustment = vision_result.get('score_adjustment', 0.0) if vision_result else 0.0
+        vision_confidence = vision_result.get('confidence', 0.7) if vision_result else 0.0
+        nlp_adjustment = nlp_result.get('score_adjustment', 0.0) if nlp_result else 0.0
+        nlp_confidence = nlp_result.get('confidence', 0.7) if nlp_result else 0.0
+
+        # Compile complete assessment
+        assessment = {
+            "borrower_id": borrower_data.get('id'),
+            "ml_baseline_score": round(ml_result['baseline_score'], 2),
+            "ml_model_version": ml_result['model_version'],
+            "ml_features_used": borrower_data,
+            "vision_score_adjustment": round(vision_adjustment, 2),
+            "vision_confidence": round(vision_confidence, 2),
+            "vision_insights": vision_result.get('insights') if vision_result else None,
+            "nlp_score_adjustment": round(nlp_adjustment, 2),
+            "nlp_confidence": round(nlp_confidence, 2),
+            "nlp_insights": nlp_result.get('insights') if nlp_result else None,
+            "final_credit_score": round(final_score, 2),
+            "risk_category": risk_category,
+            "income_validation": results['income'],
+            "loan_recommendation": results['loan'],
+            "risk_explanation": results['explanation'],
+            "risk_factors": risk_factors,
+            "positive_factors": positive_factors,
+            "artifact_updates": {
+                "photos": vision_result.get('artifact_updates', []) if vision_result else [],
+                "field_notes": nlp_result.get('artifact_updates', []) if nlp_result else []
+            },
+            "explanation_context": self._explanation_context(
+                borrower_data, ml_result, vision_result, nlp_result, final_score, risk_category
+            ) if defer_explanation else None,
+            "stage_timings": stage_timings,
+            "degraded_stages": sorted(degraded_stages),
+            # Only results free of fallbacks may be reused by later assessments,
+            # keyed by the model version that actually scored them
+            "input_fingerprint": self.input_fingerprint(
+                borrower_data, fingerprint_photos, fingerprint_notes, ml_result['model_version']
+            ) if self._is_reusable(ml_result, vision_result, nlp_result, degraded_stages) else None,
+            "model_version": ASSESSMENT_VERSION
+        }
+
+        logger.info(
+            f"Assessment complete. Final score: {final_score:.2f}, Risk: {risk_category} "
+            f"({stage_timings['total']:.0f} ms)"
         )
 
-        risk_category = self._categorize_risk(final_score)
+        return assessment
+
+    def input_fingerprint(
+        self,
+        borrower_data: Dict,
+        photos: Optional[List[Dict]],
+        field_notes: Optional[List[Dict]],
+        ml_model_version: Optional[str] = None
+    ) -> str:
+        """
+        Hash of everything an assessment's result depends on
+
+        Covers the borrower row version, loan/repayment aggregates, the
+        photos and notes analyzed, model and prompt versions, the fusion
+        weights and the risk cutoffs. Photos are identified by id, location
+        and upload time since no content hash is stored for them.
+
+        ml_model_version defaults to the loaded model's version.
+        """
+
+        borrower_version = borrower_data.get('updated_at')
+        if borrower_version is None:
+            # No row version to go on, fall back to the row itself
+            borrower_version = {
+                key: value for key, value in borrower_data.items()
+                if key not in ('loans', 'repayments', 'loan_history', 'repayment_history')
+            }
+
+        fingerprint_inputs = {
+            "borrower_id": borrower_data.get('id'),
+            "borrower_version": borrower_version,
+            "loan_history": borrower_data.get('loan_history'),
+            "repayment_history": borrower_data.get('repayment_history'),
+            "photos": sorted(
+                [
+                    str(photo.get('id')),
+                    photo.get('photo_type'),
+                    photo.get('storage_path') or photo.get('photo_url'),
+                    str(photo.get('uploaded_at'))
+                ]
+                for photo in photos or []
+            ),
+            "field_notes": sorted(
+                [
+                    str(note.get('id')),
+                    content_hash(note.get('note_text') or ''),
+                    str(note.get('created_at'))
+                ]
+                for note in field_notes or []
+            ),
+            "versions": [
+                ASSESSMENT_VERSION,
+                ml_model_version or self.ml_model.model_version,
+                VISION_PROMPT_VERSION,
+                NLP_PROMPT_VERSION,
+                self.vision_analyzer.model_name,
+                self.nlp_extractor.model_name
+            ],
+            "fusion_weights": FUSION_WEIGHTS,
+            "risk_cutoffs": RISK_CUTOFFS
+        }
+
+        return content_hash(json.dumps(fingerprint_inputs, sort_keys=True, default=str))
+
+    def assessment_from_row(self, row: Dict, borrower_data: Dict, defer_explanation: bool = False) -> Dict:
+        """
+        Rebuild an engine result from a stored credit_assessments row
+
+        Income validation and the loan recommendation are recomputed from
+        the stored insights (no Gemini calls), so the result matches a fresh
+        run on the same inputs.
+        """
+
+        vision_insights = row.get('vision_insights')
+        nlp_insights = row.get('nlp_insights')
+        vision_result = {"insights": vision_insights} if vision_insights else None
+        nlp_result = {"insights": nlp_insights} if nlp_insights else None
+
+        final_score = float(row['final_credit_score'])
+        risk_category = row['risk_category']
 
-        # Step 5: Income Validation
         income_validation = self._validate_income(
             claimed_income=borrower_data.get('claimed_monthly_income', 0),
             nlp_result=nlp_result,
             vision_result=vision_result,
             borrower_data=borrower_data
         )
-
-        # Step 6: Loan Recommendation
         loan_recommendation = self._recommend_loan(
             final_score=final_score,
             risk_category=risk_category,
@@ -108,72 +519,131 @@ class AdaptiveScoringEngine:
             borrower_data=borrower_data
         )
 
-        # Step 7: Generate Risk Explanation
-        risk_explanation = await self._generate_risk_explanation(
-            borrower_data=borrower_data,
-            ml_result=ml_result,
-            vision_result=vision_result,
-            nlp_result=nlp_result,
-            final_score=final_score,
-            risk_category=risk_category
-        )
-
-        # Step 8: Extract Risk Factors
-        risk_factors, positive_factors = self._extract_factors(
-            borrower_data, ml_result, vision_result, nlp_result
-        )
+        explanation = row.get('risk_explanation')
 
-        # Compile complete assessment
-        assessment = {
+        return {
             "borrower_id": borrower_data.get('id'),
-            "ml_baseline_score": round(ml_result['baseline_score'], 2),
-            "ml_model_version": ml_result['model_version'],
+            "ml_baseline_score": float(row['ml_baseline_score']),
+            "ml_model_version": row.get('ml_model_version'),
             "ml_features_used": borrower_data,
-            "vision_score_adjustment": round(vision_adjustment, 2),
-            "vision_confidence": round(vision_confidence, 2),
-            "vision_insights": vision_result.get('insights') if vision_result else None,
-            "nlp_score_adjustment": round(nlp_adjustment, 2),
-            "nlp_confidence": round(nlp_confidence, 2),
-            "nlp_insights": nlp_result.get('insights') if nlp_result else None,
-            "final_credit_score": round(final_score, 2),
+            "vision_score_adjustment": float(row.get('vision_score_adjustment') or 0),
+            "vision_confidence": float(row.get('vision_confidence') or 0),
+            "vision_insights": vision_insights,
+            "nlp_score_adjustment": float(row.get('nlp_score_adjustment') or 0),
+            "nlp_confidence": float(row.get('nlp_confidence') or 0),
+            "nlp_insights": nlp_insights,
+            "final_credit_score": final_score,
             "risk_category": risk_category,
             "income_validation": income_validation,
             "loan_recommendation": loan_recommendation,
-            "risk_explanation": risk_explanation,
-            "risk_factors": risk_factors,
-            "positive_factors": positive_factors,
-            "model_version": "1.0.0"
+            "risk_explanation": explanation,
+            "risk_factors": row.get('risk_factors') or [],
+            "positive_factors": row.get('positive_factors') or [],
+            "artifact_updates": {"photos": [], "field_notes": []},
+            "explanation_context": self.explanation_context_from_assessment(row)
+            if defer_explanation and not explanation else None,
+            "stage_timings": {"total": 0.0},
+            "degraded_stages": [],
+            "input_fingerprint": row.get('input_fingerprint'),
+            "reused_assessment_id": row.get('id'),
+            "model_version": row.get('assessment_version') or ASSESSMENT_VERSION
         }
 
-        logger.info(f"Assessment complete. Final score: {final_score:.2f}, Risk: {risk_category}")
+    def _is_reusable(
+        self,
+        ml_result: Dict,
+        vision_result: Optional[Dict],
+        nlp_result: Optional[Dict],
+        degraded_stages: List[str]
+    ) -> bool:
+        """Whether a result was computed without budget, rule-based or Gemini fallbacks"""
 
-        return assessment
+        if degraded_stages or str(ml_result.get('model_version', '')).endswith('-rule-based'):
+            return False
 
-    async def _analyze_photos(self, photos: List[Dict], borrower_data: Dict) -> Dict:
-        """Analyze all photos and aggregate insights"""
+        for result in (vision_result, nlp_result):
+            if result and any(a.get('fallback') for a in result['insights'].get('analyses', [])):
+                return False
 
-        all_analyses = []
-        total_adjustment = 0.0
+        return True
 
-        for photo in photos:
-            photo_path = photo.get('storage_path') or photo.get('photo_url')
-            photo_type = photo.get('photo_type')
+    async def _analyze_photos(
+        self,
+        photos: List[Dict],
+        borrower_data: Dict,
+        batch: bool = False,
+        on_event: Optional[EventCallback] = None,
+        deadline: Optional[float] = None
+    ) -> Dict:
+        """
+        Analyze all photos and aggregate insights
 
-            if 'house' in photo_type:
-                analysis = await self.vision_analyzer.analyze_house_photo(
-                    photo_path, photo_type, borrower_data
-                )
-            else:
-                analysis = await self.vision_analyzer.analyze_business_photo(
-                    photo_path, photo_type, borrower_data
-                )
+        Photos are analyzed concurrently one request each, or packed into
+        multi-image requests when batch is set. A vision_photo event is
+        emitted for each photo as its analysis becomes available. Photos
+        not analyzed by the deadline use the fallback analysis and mark
+        the result as degraded.
+        """
 
-            adjustment = self.vision_analyzer.calculate_vision_score_adjustment(
-                analysis, photo_type
+        async def emit_photo(photo: Dict, analysis: Dict):
+            await self._emit(on_event, 'vision_photo', {
+                "photo_id": photo.get('id'),
+                "photo_type": photo.get('photo_type'),
+                "analysis": analysis,
+                "score_adjustment": round(self.vision_analyzer.calculate_vision_score_adjustment(
+                    analysis, photo.get('photo_type')
+                ), 2)
+            })
+
+        # Reuse completed analyses stored on unchanged photos
+        stored = [self._stored_analysis(photo, 'vision', 'uploaded_at') for photo in photos]
+        pending = [photo for photo, analysis in zip(photos, stored) if analysis is None]
+
+        if on_event is not None:
+            for photo, analysis in zip(photos, stored):
+                if analysis is not None:
+                    await emit_photo(photo, analysis)
+
+        timed_out = []
+
+        def fallback(photo: Dict, error: Exception) -> Dict:
+            if isinstance(error, DeadlineExceeded):
+                timed_out.append(photo)
+            return self._fallback_photo_analysis(photo, error)
+
+        combined_summary = None
+        if batch and pending:
+            fresh, combined_summary = await self._analyze_photos_batched(
+                pending, borrower_data, fallback, deadline
+            )
+            if on_event is not None:
+                for photo, analysis in zip(pending, fresh):
+                    await emit_photo(photo, analysis)
+        else:
+            fresh = await gather_bounded(
+                pending,
+                lambda photo: self._analyze_photo(photo, borrower_data),
+                limit=settings.VISION_MAX_CONCURRENCY,
+                fallback=fallback,
+                process_limiter=get_process_limiter("gemini", settings.GEMINI_MAX_CONCURRENCY),
+                on_result=emit_photo if on_event is not None else None,
+                deadline=deadline,
             )
 
-            total_adjustment += adjustment
-            all_analyses.append(analysis)
+        if timed_out:
+            logger.warning(f"Time budget exhausted for {len(timed_out)} photos, using fallback analysis")
+
+        fresh_iter = iter(fresh)
+        all_analyses = [analysis if analysis is not None else next(fresh_iter) for analysis in stored]
+
+        if len(pending) < len(photos):
+            logger.info(f"Reused {len(photos) - len(pending)} stored photo analyses")
+
+        total_adjustment = 0.0
+        for photo, analysis in zip(photos, all_analyses):
+            total_adjustment += self.vision_analyzer.calculate_vision_score_adjustment(
+                analysis, photo.get('photo_type')
+            )
 
         # Average adjustment across all photos
         avg_adjustment = total_adjustment / len(photos) if photos else 0.0
@@ -184,30 +654,166 @@ class AdaptiveScoringEngine:
             "analyses": all_analyses,
             "summary": self._summarize_vision_insights(all_analyses)
         }
+        if combined_summary:
+            insights["combined_summary"] = combined_summary
 
         return {
             "score_adjustment": avg_adjustment,
             "confidence": sum(a.get('confidence_score', 0.7) for a in all_analyses) / len(all_analyses),
-            "insights": insights
+            "insights": insights,
+            "artifact_updates": self._artifact_updates(pending, fresh),
+            "degraded": bool(timed_out)
         }
 
-    async def _analyze_field_notes(self, field_notes: List[Dict], borrower_data: Dict) -> Dict:
-        """Analyze all field notes and aggregate insights"""
+    async def _analyze_photos_batched(
+        self,
+        photos: List[Dict],
+        borrower_data: Dict,
+        fallback=None,
+        deadline: Optional[float] = None
+    ) -> tuple:
+        """
+        Analyze photos with multi-image requests, returning (analyses in photo order, combined summary)
+
+        The process-wide Gemini slot is held per batch request only. Photos
+        the batch did not cover are retried one request each, bounded like
+        the unbatched path, and fall back when those fail too.
+        """
 
-        all_analyses = []
-        total_adjustment = 0.0
+        fallback = fallback or self._fallback_photo_analysis
+
+        batch_photos = [
+            {
+                "image_path": photo.get('storage_path') or photo.get('photo_url'),
+                "photo_type": photo.get('photo_type') or 'unknown'
+            }
+            for photo in photos
+        ]
+
+        try:
+            result = await self.vision_analyzer.analyze_photos_batch(
+                batch_photos,
+                borrower_data,
+                deadline=deadline,
+                limiter=get_process_limiter("gemini", settings.GEMINI_MAX_CONCURRENCY)
+            )
+            analyses, summary = list(result['analyses']), result['summary']
+        except Exception as e:
+            logger.error(f"Batched vision analysis failed, retrying photos one by one: {e}")
+            analyses, summary = [None] * len(photos), None
+
+        missing = [index for index, analysis in enumerate(analyses) if analysis is None]
+        if missing:
+            logger.info(f"{len(missing)} photos missing from the batched analysis, analyzing them one by one")
+            retried = await gather_bounded(
+                [photos[index] for index in missing],
+                lambda photo: self._analyze_photo(photo, borrower_data),
+                limit=settings.VISION_MAX_CONCURRENCY,
+                fallback=fallback,
+                process_limiter=get_process_limiter("gemini", settings.GEMINI_MAX_CONCURRENCY),
+                deadline=deadline,
+            )
+            for index, analysis in zip(missing, retried):
+                analyses[index] = analysis
+
+        return analyses, summary
+
+    async def _analyze_photo(self, photo: Dict, borrower_data: Dict) -> Dict:
+        """Analyze a single photo with the analyzer matching its type"""
+
+        photo_path = photo.get('storage_path') or photo.get('photo_url')
+        photo_type = photo.get('photo_type')
+
+        if 'house' in photo_type:
+            return await self.vision_analyzer.analyze_house_photo(
+                photo_path, photo_type, borrower_data
+            )
 
-        for note in field_notes:
-            note_text = note.get('note_text', '')
+        return await self.vision_analyzer.analyze_business_photo(
+            photo_path, photo_type, borrower_data
+        )
+
+    def _fallback_photo_analysis(self, photo: Dict, error: Exception) -> Dict:
+        """Fallback for a photo whose analysis task raised"""
+
+        photo_type = photo.get('photo_type') or 'unknown'
 
-            analysis = await self.nlp_extractor.analyze_field_note(
-                note_text, borrower_data
+        if 'house' in photo_type:
+            return self.vision_analyzer._fallback_house_analysis(photo_type)
+
+        return self.vision_analyzer._fallback_business_analysis(photo_type)
+
+    async def _analyze_field_notes(
+        self,
+        field_notes: List[Dict],
+        borrower_data: Dict,
+        batch: bool = False,
+        on_event: Optional[EventCallback] = None,
+        deadline: Optional[float] = None
+    ) -> Dict:
+        """
+        Analyze all field notes and aggregate insights
+
+        Notes are analyzed concurrently one request each, or in a single
+        batched request when batch is set. An nlp_note event is emitted for
+        each note as its analysis becomes available. Notes not analyzed by
+        the deadline use the fallback analysis and mark the result as degraded.
+        """
+
+        async def emit_note(note: Dict, analysis: Dict):
+            await self._emit(on_event, 'nlp_note', {
+                "note_id": note.get('id'),
+                "analysis": analysis,
+                "score_adjustment": round(self.nlp_extractor.calculate_nlp_score_adjustment(analysis), 2)
+            })
+
+        # Reuse completed analyses stored on unchanged notes
+        stored = [self._stored_analysis(note, 'nlp', 'created_at') for note in field_notes]
+        pending = [note for note, analysis in zip(field_notes, stored) if analysis is None]
+
+        if on_event is not None:
+            for note, analysis in zip(field_notes, stored):
+                if analysis is not None:
+                    await emit_note(note, analysis)
+
+        timed_out = []
+
+        def fallback(note: Dict, error: Exception) -> Dict:
+            if isinstance(error, DeadlineExceeded):
+                timed_out.append(note)
+            return self.nlp_extractor._fallback_nlp_analysis(note.get('note_text', ''), borrower_data)
+
+        if batch and pending:
+            fresh = await self._analyze_field_notes_batched(pending, borrower_data, fallback, deadline)
+            if on_event is not None:
+                for note, analysis in zip(pending, fresh):
+                    await emit_note(note, analysis)
+        else:
+            fresh = await gather_bounded(
+                pending,
+                lambda note: self.nlp_extractor.analyze_field_note(
+                    note.get('note_text', ''), borrower_data, note_id=note.get('id')
+                ),
+                limit=settings.NLP_MAX_CONCURRENCY,
+                fallback=fallback,
+                process_limiter=get_process_limiter("gemini", settings.GEMINI_MAX_CONCURRENCY),
+                timeout=settings.NLP_NOTE_TIMEOUT_SECONDS,
+                on_result=emit_note if on_event is not None else None,
+                deadline=deadline,
             )
 
-            adjustment = self.nlp_extractor.calculate_nlp_score_adjustment(analysis)
+        if timed_out:
+            logger.warning(f"Time budget exhausted for {len(timed_out)} field notes, using fallback analysis")
+
+        fresh_iter = iter(fresh)
+        all_analyses = [analysis if analysis is not None else next(fresh_iter) for analysis in stored]
 
-            total_adjustment += adjustment
-            all_analyses.append(analysis)
+        if len(pending) < len(field_notes):
+            logger.info(f"Reused {len(field_notes) - len(pending)} stored field note analyses")
+
+        total_adjustment = 0.0
+        for analysis in all_analyses:
+            total_adjustment += self.nlp_extractor.calculate_nlp_score_adjustment(analysis)
 
         # Average adjustment
         avg_adjustment = total_adjustment / len(field_notes) if field_notes else 0.0
@@ -222,17 +828,171 @@ class AdaptiveScoringEngine:
         return {
             "score_adjustment": avg_adjustment,
             "confidence": sum(a.get('confidence_score', 0.7) for a in all_analyses) / len(all_analyses),
-            "insights": insights
+            "insights": insights,
+            "artifact_updates": self._artifact_updates(pending, fresh),
+            "degraded": bool(timed_out)
         }
 
+    async def _analyze_field_notes_batched(
+        self,
+        field_notes: List[Dict],
+        borrower_data: Dict,
+        fallback=None,
+        deadline: Optional[float] = None
+    ) -> List[Dict]:
+        """
+        Analyze notes with batched NLP requests, returning analyses in note order
+
+        The process-wide Gemini slot is held per chunk request only. Notes
+        the batch did not return are retried one request each, bounded like
+        the unbatched path, and fall back when those fail too.
+        """
+
+        fallback = fallback or (
+            lambda note, error: self.nlp_extractor._fallback_nlp_analysis(note.get('note_text', ''), borrower_data)
+        )
+
+        entries = [
+            {
+                "note_id": str(note.get('id') or f"note-{index}"),
+                "note_text": note.get('note_text', ''),
+                "borrower_context": borrower_data
+            }
+            for index, note in enumerate(field_notes)
+        ]
+
+        try:
+            analyses = await self.nlp_extractor.analyze_field_notes_batch(
+                entries,
+                chunk_timeout=settings.NLP_NOTE_TIMEOUT_SECONDS,
+                deadline=deadline,
+                limiter=get_process_limiter("gemini", settings.GEMINI_MAX_CONCURRENCY)
+            )
+        except Exception as e:
+            logger.error(f"Batched NLP analysis failed, retrying notes one by one: {e}")
+            analyses = {}
+
+        missing = [note for note, entry in zip(field_notes, entries) if entry['note_id'] not in analyses]
+        retried = {}
+        if missing:
+            logger.info(f"{len(missing)} field notes missing from the batched analysis, analyzing them one by one")
+            retried_analyses = await gather_bounded(
+                missing,
+                lambda note: self.nlp_extractor.analyze_field_note(
+                    note.get('note_text', ''), borrower_data, note_id=note.get('id')
+                ),
+                limit=settings.NLP_MAX_CONCURRENCY,
+                fallback=fallback,
+                process_limiter=get_process_limiter("gemini", settings.GEMINI_MAX_CONCURRENCY),
+                timeout=settings.NLP_NOTE_TIMEOUT_SECONDS,
+                deadline=deadline,
+            )
+            retried = {id(note): analysis for note, analysis in zip(missing, retried_analyses)}
+
+        return [
+            analyses[entry['note_id']] if entry['note_id'] in analyses else retried[id(note)]
+            for note, entry in zip(field_notes, entries)
+        ]
+
+    async def prefetch_field_note_analyses(self, borrowers: Sequence[tuple]) -> int:
+        """
+        Analyze the pending field notes of many borrowers with shared batched requests
+
+        Chunks mix notes from several borrowers. The analyses land in the
+        NLP memo, so the per-borrower assessments that follow reuse them
+        without further Gemini calls. Notes with reusable stored analyses
+        are skipped.
+
+        Args:
+            borrowers: (borrower_data, field_notes) pairs
+
+        Returns:
+            Number of notes analyzed or served from the memo
+        """
+
+        entries = []
+        for borrower_data, field_notes in borrowers:
+            for index, note in enumerate(field_notes or []):
+                if self._stored_analysis(note, 'nlp', 'created_at') is not None:
+                    continue
+                entries.append({
+                    "note_id": str(note.get('id') or f"{borrower_data.get('id')}-note-{index}"),
+                    "note_text": note.get('note_text', ''),
+                    "borrower_context": borrower_data
+                })
+
+        if not entries:
+            return 0
+
+        analyses = await self.nlp_extractor.analyze_field_notes_batch(
+            entries,
+            chunk_timeout=settings.NLP_NOTE_TIMEOUT_SECONDS,
+            limiter=get_process_limiter("gemini", settings.GEMINI_MAX_CONCURRENCY)
+        )
+        logger.info(f"Prefetched {len(analyses)}/{len(entries)} field note analyses across {len(borrowers)} borrowers")
+        return len(analyses)
+
+    async def _emit(self, on_event: Optional[EventCallback], event: str, data: Dict):
+        """Send a stage event to the caller's callback, never failing the assessment"""
+
+        if on_event is None:
+            return
+
+        try:
+            await on_event(event, data)
+        except Exception as e:
+            logger.warning(f"Assessment event callback failed for {event}: {e}")
+
+    def _stored_analysis(self, record: Dict, kind: str, changed_field: str) -> Optional[Dict]:
+        """
+        Return the stored analysis for a photo or note if it can be reused
+
+        A stored result is reused when its status is completed and it was
+        analyzed after the record was last created/uploaded.
+        """
+
+        if record.get(f'{kind}_analysis_status') != 'completed':
+            return None
+
+        result = record.get(f'{kind}_analysis_result')
+        if not isinstance(result, dict):
+            return None
+
+        analyzed_at = _parse_timestamp(record.get('analyzed_at'))
+        if analyzed_at is None:
+            return None
+
+        changed_at = _parse_timestamp(record.get(changed_field))
+        if changed_at is not None and changed_at > analyzed_at:
+            return None
+
+        return result
+
+    def _artifact_updates(self, records: List[Dict], analyses: List[Dict]) -> List[Dict]:
+        """Newly computed analyses to write back onto their photo/note rows"""
+
+        analyzed_at = datetime.now(timezone.utc).isoformat()
+
+        return [
+            {
+                "id": record['id'],
+                "analysis": analysis,
+                "status": "failed" if analysis.get('fallback') else "completed",
+                "analyzed_at": analyzed_at
+            }
+            for record, analysis in zip(records, analyses)
+            if record.get('id')
+        ]
+
     def _fuse_scores(self, baseline: float, vision_adj: float, nlp_adj: float) -> float:
         """
         Fuse ML baseline with Vision and NLP adjustments
 
         Formula: Final = Baseline + (Vision_Adj * 0.5) + (NLP_Adj * 0.5)
+        (weights from FUSION_WEIGHTS)
         """
 
-        final = baseline + (vision_adj * 0.5) + (nlp_adj * 0.5)
+        final = baseline + (vision_adj * FUSION_WEIGHTS['vision']) + (nlp_adj * FUSION_WEIGHTS['nlp'])
 
         # Cap between 0-100
         final = max(0, min(100, final))
@@ -240,15 +1000,11 @@ class AdaptiveScoringEngine:
         return final
 
     def _categorize_risk(self, score: float) -> str:
-        """Categorize risk based on final credit score"""
-        if score >= 75:
-            return "low"
-        elif score >= 55:
-            return "medium"
-        elif score >= 35:
-            return "high"
-        else:
-            return "very_high"
+        """Categorize risk based on final credit score (bands from RISK_CUTOFFS)"""
+        for cutoff, category in RISK_CUTOFFS:
+            if score >= cutoff:
+                return category
+        return LOWEST_RISK_CATEGORY
 
     def _validate_income(
         self,
@@ -259,24 +1015,10 @@ class AdaptiveScoringEngine:
     ) -> Dict:
         """Compare claimed income with AI-estimated income"""
 
-        # Estimate from NLP
-        nlp_estimate = 0
-        if nlp_result:
-            analyses = nlp_result.get('insights', {}).get('analyses', [])
-            if analyses:
-                estimates = [a.get('extracted_income_estimate', 0) for a in analyses]
-                nlp_estimate = sum(e for e in estimates if e > 0) / len([e for e in estimates if e > 0]) if any(e > 0 for e in estimates) else 0
+        nlp_estimate, vision_factor = self._income_signals(nlp_result, vision_result)
 
         # Estimate from vision (business scale based)
-        vision_estimate = claimed_income * 0.85  # Default conservative estimate
-        if vision_result:
-            analyses = vision_result.get('insights', {}).get('analyses', [])
-            for analysis in analyses:
-                scale = analysis.get('business_scale', 'small')
-                if scale == 'large':
-                    vision_estimate = claimed_income * 1.1
-                elif scale == 'medium':
-                    vision_estimate = claimed_income * 0.95
+        vision_estimate = claimed_income * vision_factor
 
         # Estimate from business type benchmarks
         business_type = borrower_data.get('business_type', '')
@@ -288,15 +1030,15 @@ class AdaptiveScoringEngine:
 
         if nlp_estimate > 0:
             estimates.append(nlp_estimate)
-            weights.append(0.40)
+            weights.append(INCOME_ESTIMATE_WEIGHTS['nlp'])
 
         if vision_estimate > 0:
             estimates.append(vision_estimate)
-            weights.append(0.35)
+            weights.append(INCOME_ESTIMATE_WEIGHTS['vision'])
 
         if benchmark_estimate > 0:
             estimates.append(benchmark_estimate)
-            weights.append(0.25)
+            weights.append(INCOME_ESTIMATE_WEIGHTS['benchmark'])
 
         if estimates:
             ai_estimate = sum(e * w for e, w in zip(estimates, weights)) / sum(weights)
@@ -325,26 +1067,44 @@ class AdaptiveScoringEngine:
             "assessment": assessment
         }
 
+    def _income_signals(self, nlp_result: Optional[Dict], vision_result: Optional[Dict]) -> tuple:
+        """
+        Per-borrower income inputs from the Gemini analyses
+
+        Returns:
+            (mean positive NLP income estimate or 0, multiplier applied to
+            the claimed income for the vision estimate)
+        """
+
+        # Estimate from NLP
+        nlp_estimate = 0
+        if nlp_result:
+            analyses = nlp_result.get('insights', {}).get('analyses', [])
+            if analyses:
+                estimates = [a.get('extracted_income_estimate', 0) for a in analyses]
+                nlp_estimate = sum(e for e in estimates if e > 0) / len([e for e in estimates if e > 0]) if any(e > 0 for e in estimates) else 0
+
+        # Vision estimate factor (business scale based), conservative by default
+        vision_factor = 0.85
+        if vision_result:
+            analyses = vision_result.get('insights', {}).get('analyses', [])
+            for analysis in analyses:
+                scale = analysis.get('business_scale', 'small')
+                if scale == 'large':
+                    vision_factor = 1.1
+                elif scale == 'medium':
+                    vision_factor = 0.95
+
+        return nlp_estimate, vision_factor
+
     def _get_benchmark_income(self, business_type: str) -> float:
         """Get typical income range for business type"""
 
-        benchmarks = {
-            "Warung Kelontong": 3500000,
-            "Warung Gorengan": 2500000,
-            "Jahit Pakaian": 3000000,
-            "Jualan Sayur": 2000000,
-            "Catering": 4500000,
-            "Salon": 3000000,
-            "Toko Pulsa": 3200000,
-            "Warung Nasi": 3800000,
-            "Industri Kerupuk": 2800000,
-        }
-
-        for key, value in benchmarks.items():
+        for key, value in INCOME_BENCHMARKS.items():
             if key in business_type:
                 return value
 
-        return 3000000  # Default
+        return DEFAULT_BENCHMARK_INCOME
 
     def _recommend_loan(
         self,
@@ -358,28 +1118,11 @@ class AdaptiveScoringEngine:
         monthly_income = income_validation['ai_estimated_income']
 
         # Safe repayment rate based on risk
-        safe_rates = {
-            "low": 0.30,      # 30% of monthly income
-            "medium": 0.25,   # 25%
-            "high": 0.20,     # 20%
-            "very_high": 0.15 # 15%
-        }
-
-        safe_rate = safe_rates.get(risk_category, 0.20)
+        safe_rate = SAFE_REPAYMENT_RATES.get(risk_category, 0.20)
 
         # Loan sizing based on risk
-        if risk_category == "low":
-            max_loan = monthly_income * 3.0
-            term_weeks = 24
-        elif risk_category == "medium":
-            max_loan = monthly_income * 2.0
-            term_weeks = 20
-        elif risk_category == "high":
-            max_loan = monthly_income * 1.0
-            term_weeks = 16
-        else:
-            max_loan = monthly_income * 0.5
-            term_weeks = 12
+        income_multiple, term_weeks = LOAN_SIZING.get(risk_category, LOAN_SIZING[LOWEST_RISK_CATEGORY])
+        max_loan = monthly_income * income_multiple
 
         # Conservative recommendation (80% of max)
         recommended_loan = max_loan * 0.8
@@ -388,19 +1131,13 @@ class AdaptiveScoringEngine:
         weekly_repayment = recommended_loan / term_weeks
 
         # Repayment to income ratio
-        monthly_repayment = weekly_repayment * 4.3
+        monthly_repayment = weekly_repayment * WEEKS_PER_MONTH
         repayment_ratio = (monthly_repayment / monthly_income) * 100
 
         # Confidence based on consistency
         consistency = income_validation['income_consistency_score']
         confidence = (consistency / 100) * 0.7 + 0.3  # 0.3 to 1.0
 
-        # Justification
-        justification = f"Based on {risk_category} risk profile and estimated monthly income of Rp {monthly_income:,.0f}, " \
-                       f"safe repayment capacity is approximately {safe_rate*100:.0f}% of income (Rp {monthly_income * safe_rate:,.0f}/month). " \
-                       f"Recommended loan of Rp {recommended_loan:,.0f} over {term_weeks} weeks results in weekly payments of Rp {weekly_repayment:,.0f}, " \
-                       f"which is {repayment_ratio:.1f}% of monthly income - within safe lending parameters."
-
         return {
             "recommended_loan_amount": round(recommended_loan, 2),
             "max_safe_loan_amount": round(max_loan, 2),
@@ -408,10 +1145,385 @@ class AdaptiveScoringEngine:
             "weekly_repayment": round(weekly_repayment, 2),
             "repayment_to_income_ratio": round(repayment_ratio, 2),
             "recommendation_confidence": round(confidence, 2),
-            "justification": justification
+            "justification": self._loan_justification(
+                risk_category, monthly_income, safe_rate, recommended_loan, term_weeks,
+                weekly_repayment, repayment_ratio
+            )
+        }
+
+    def _loan_justification(
+        self,
+        risk_category: str,
+        monthly_income: float,
+        safe_rate: float,
+        recommended_loan: float,
+        term_weeks: int,
+        weekly_repayment: float,
+        repayment_ratio: float
+    ) -> str:
+        """Human-readable reasoning for a loan recommendation"""
+        return f"Based on {risk_category} risk profile and estimated monthly income of Rp {monthly_income:,.0f}, " \
+               f"safe repayment capacity is approximately {safe_rate*100:.0f}% of income (Rp {monthly_income * safe_rate:,.0f}/month). " \
+               f"Recommended loan of Rp {recommended_loan:,.0f} over {term_weeks} weeks results in weekly payments of Rp {weekly_repayment:,.0f}, " \
+               f"which is {repayment_ratio:.1f}% of monthly income - within safe lending parameters."
+
+    def simulate_loans(
+        self,
+        risk_category: str,
+        monthly_income: float,
+        amounts: Sequence[float],
+        term_weeks: Sequence[int],
+        income_multipliers: Sequence[float]
+    ) -> Dict[str, np.ndarray]:
+        """
+        Repayment burden of a grid of loan scenarios for one borrower
+
+        Applies the _recommend_loan arithmetic to every (amount, term_weeks,
+        income multiplier) combination at once.
+
+        Args:
+            risk_category: Borrower risk category (sets the safe repayment rate
+                and the maximum loan multiple)
+            monthly_income: Estimated monthly income (ai_estimated_income)
+            amounts: Loan amounts to try
+            term_weeks: Terms to try
+            income_multipliers: Income scenarios as multiples of monthly_income
+
+        Returns:
+            Arrays of shape (amounts, terms, multipliers): loan_amount,
+            term_weeks, income_multiplier, monthly_income, weekly_repayment,
+            repayment_to_income_ratio (inf without income), max_safe_loan_amount,
+            affordable (ratio within the safe repayment rate) and within_max_loan
+        """
+
+        safe_rate = SAFE_REPAYMENT_RATES.get(risk_category, 0.20)
+        income_multiple, _ = LOAN_SIZING.get(risk_category, LOAN_SIZING[LOWEST_RISK_CATEGORY])
+
+        amounts = np.asarray(amounts, dtype=float)[:, None, None]
+        terms = np.asarray(term_weeks, dtype=float)[None, :, None]
+        multipliers = np.asarray(income_multipliers, dtype=float)[None, None, :]
+        shape = (amounts.shape[0], terms.shape[1], multipliers.shape[2])
+
+        income = np.broadcast_to(monthly_income * multipliers, shape)
+        weekly_repayment = np.broadcast_to(amounts / terms, shape)
+        monthly_repayment = weekly_repayment * WEEKS_PER_MONTH
+        repayment_ratio = np.divide(
+            monthly_repayment, income, out=np.full(shape, np.inf), where=income > 0
+        ) * 100
+        max_loan = income * income_multiple
+
+        return {
+            "loan_amount": np.broadcast_to(amounts, shape),
+            "term_weeks": np.broadcast_to(terms, shape).astype(int),
+            "income_multiplier": np.broadcast_to(multipliers, shape),
+            "monthly_income": _round_values(income, 2),
+            "weekly_repayment": _round_values(weekly_repayment, 2),
+            "repayment_to_income_ratio": _round_values(repayment_ratio, 2),
+            "max_safe_loan_amount": _round_values(max_loan, 2),
+            "affordable": repayment_ratio <= safe_rate * 100,
+            "within_max_loan": np.broadcast_to(amounts, shape) <= max_loan,
+        }
+
+    # Vectorized portfolio path: same rules as the scalar methods above, one
+    # NumPy pass over column arrays. Values are rounded with Python's round()
+    # so results are identical to the per-borrower path.
+
+    def score_portfolio(
+        self,
+        baseline_scores,
+        vision_adjustments,
+        nlp_adjustments,
+        claimed_incomes,
+        business_types: Sequence[str],
+        nlp_income_estimates=None,
+        vision_income_factors=None,
+        include_justification: bool = True,
+        fusion_weights: Optional[Dict[str, float]] = None,
+        risk_cutoffs: Optional[Sequence[tuple]] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        Fuse, band, validate income and size loans for a whole portfolio
+
+        Args:
+            baseline_scores: ML baseline scores
+            vision_adjustments: Vision score adjustments (0 when no photos)
+            nlp_adjustments: NLP score adjustments (0 when no notes)
+            claimed_incomes: Claimed monthly incomes
+            business_types: Business type strings
+            nlp_income_estimates: Mean positive NLP income estimates (0 if none),
+                see income_signal_columns
+            vision_income_factors: Vision income multipliers (0.85 if no photos)
+            include_justification: Also build the per-borrower justification text
+            fusion_weights: Override FUSION_WEIGHTS (for what-if rescoring)
+            risk_cutoffs: Override RISK_CUTOFFS (for what-if rescoring)
+
+        Returns:
+            Column arrays: final_credit_score, risk_category, the
+            income_validation fields and the loan_recommendation fields
+        """
+
+        baseline_scores = np.asarray(baseline_scores, dtype=float)
+        count = len(baseline_scores)
+        if nlp_income_estimates is None:
+            nlp_income_estimates = np.zeros(count)
+        if vision_income_factors is None:
+            vision_income_factors = np.full(count, 0.85)
+
+        final_scores = self._fuse_scores_batch(
+            baseline_scores, vision_adjustments, nlp_adjustments, fusion_weights
+        )
+        risk_categories = self._categorize_risk_batch(final_scores, risk_cutoffs)
+        income_validation = self._validate_income_batch(
+            claimed_incomes, nlp_income_estimates, vision_income_factors, business_types
+        )
+        loan_recommendation = self._recommend_loan_batch(
+            risk_categories, income_validation, include_justification
+        )
+
+        return {
+            "final_credit_score": _round_values(final_scores, 2),
+            "risk_category": risk_categories,
+            **income_validation,
+            **loan_recommendation
+        }
+
+    def score_borrowers(
+        self,
+        borrowers: Sequence[Dict],
+        vision_adjustments=None,
+        nlp_adjustments=None,
+        nlp_income_estimates=None,
+        vision_income_factors=None,
+        include_justification: bool = True
+    ) -> Dict[str, np.ndarray]:
+        """
+        score_portfolio straight from borrower records
+
+        ML baselines come from one ml_model.predict_batch call; adjustments
+        default to 0 (no photos or notes).
+
+        Returns:
+            The score_portfolio columns plus ml_baseline_score and ml_model_version
+        """
+
+        ml_results = self.ml_model.predict_batch(borrowers)
+        count = len(ml_results)
+        baseline_scores = np.array([result['baseline_score'] for result in ml_results], dtype=float)
+
+        result = self.score_portfolio(
+            baseline_scores,
+            vision_adjustments if vision_adjustments is not None else np.zeros(count),
+            nlp_adjustments if nlp_adjustments is not None else np.zeros(count),
+            [borrower.get('claimed_monthly_income', 0) for borrower in borrowers],
+            [borrower.get('business_type', '') for borrower in borrowers],
+            nlp_income_estimates,
+            vision_income_factors,
+            include_justification
+        )
+        return {
+            "ml_baseline_score": baseline_scores,
+            "ml_model_version": np.array([ml_result['model_version'] for ml_result in ml_results], dtype=object),
+            **result
+        }
+
+    def income_signal_columns(self, nlp_results: Sequence[Optional[Dict]], vision_results: Sequence[Optional[Dict]]) -> tuple:
+        """(nlp_income_estimates, vision_income_factors) arrays for score_portfolio"""
+
+        signals = [self._income_signals(nlp, vision) for nlp, vision in zip(nlp_results, vision_results)]
+        if not signals:
+            return np.zeros(0), np.zeros(0)
+        nlp_estimates, vision_factors = zip(*signals)
+        return np.asarray(nlp_estimates, dtype=float), np.asarray(vision_factors, dtype=float)
+
+    def _fuse_scores_batch(self, baseline_scores, vision_adjustments, nlp_adjustments, weights=None) -> np.ndarray:
+        """Vectorized _fuse_scores"""
+
+        weights = weights or FUSION_WEIGHTS
+        final = (
+            np.asarray(baseline_scores, dtype=float)
+            + (np.asarray(vision_adjustments, dtype=float) * weights['vision'])
+            + (np.asarray(nlp_adjustments, dtype=float) * weights['nlp'])
+        )
+        return np.clip(final, 0, 100)
+
+    def _categorize_risk_batch(self, scores: np.ndarray, cutoffs=None) -> np.ndarray:
+        """Vectorized _categorize_risk"""
+
+        cutoffs = cutoffs or RISK_CUTOFFS
+        scores = np.asarray(scores, dtype=float)
+        return np.select(
+            [scores >= cutoff for cutoff, _ in cutoffs],
+            [category for _, category in cutoffs],
+            default=LOWEST_RISK_CATEGORY
+        ).astype(object)
+
+    def _validate_income_batch(self, claimed_incomes, nlp_income_estimates, vision_income_factors, business_types) -> Dict[str, np.ndarray]:
+        """Vectorized _validate_income"""
+
+        claimed = np.asarray(claimed_incomes, dtype=float)
+        nlp_estimates = np.asarray(nlp_income_estimates, dtype=float)
+        vision_estimates = claimed * np.asarray(vision_income_factors, dtype=float)
+        benchmarks = self._benchmark_income_batch(business_types)
+
+        # Weighted average over the estimates that are available, in the scalar order
+        weighted_sum = np.zeros(len(claimed))
+        weight_total = np.zeros(len(claimed))
+        for estimates, weight in (
+            (nlp_estimates, INCOME_ESTIMATE_WEIGHTS['nlp']),
+            (vision_estimates, INCOME_ESTIMATE_WEIGHTS['vision']),
+            (benchmarks, INCOME_ESTIMATE_WEIGHTS['benchmark']),
+        ):
+            available = estimates > 0
+            weighted_sum = weighted_sum + np.where(available, estimates * weight, 0.0)
+            weight_total = weight_total + np.where(available, weight, 0.0)
+
+        has_estimate = weight_total > 0
+        ai_estimates = np.where(
+            has_estimate,
+            weighted_sum / np.where(has_estimate, weight_total, 1.0),
+            claimed * 0.85
+        )
+
+        positive = ai_estimates > 0
+        variance = np.where(
+            positive,
+            ((claimed - ai_estimates) / np.where(positive, ai_estimates, 1.0)) * 100,
+            0.0
+        )
+        consistency = np.maximum(0, 100 - np.abs(variance))
+
+        assessment = np.select(
+            [variance > 30, variance > 15, variance < -15],
+            [
+                "Claimed income significantly higher than AI estimate - verify carefully",
+                "Claimed income moderately higher than AI estimate",
+                "Claimed income lower than AI estimate - borrower may be conservative",
+            ],
+            default="Income claim appears consistent with AI estimate"
+        ).astype(object)
+
+        return {
+            "claimed_income": _round_values(claimed, 2),
+            "ai_estimated_income": _round_values(ai_estimates, 2),
+            "income_consistency_score": _round_values(consistency, 2),
+            "variance_percentage": _round_values(variance, 2),
+            "assessment": assessment
+        }
+
+    def _benchmark_income_batch(self, business_types: Sequence[str]) -> np.ndarray:
+        """Benchmark income per borrower, matching each distinct business type once"""
+
+        benchmark_by_type = {
+            business_type: self._get_benchmark_income(business_type or '')
+            for business_type in set(business_types)
         }
+        return np.asarray([benchmark_by_type[business_type] for business_type in business_types], dtype=float)
 
-    async def _generate_risk_explanation(
+    def _recommend_loan_batch(
+        self,
+        risk_categories: np.ndarray,
+        income_validation: Dict[str, np.ndarray],
+        include_justification: bool = True
+    ) -> Dict[str, np.ndarray]:
+        """Vectorized _recommend_loan (takes the rounded income validation, like the scalar path)"""
+
+        monthly_income = income_validation['ai_estimated_income']
+
+        default_multiple, default_term = LOAN_SIZING[LOWEST_RISK_CATEGORY]
+        safe_rate = np.full(len(monthly_income), 0.20)
+        income_multiple = np.full(len(monthly_income), default_multiple)
+        term_weeks = np.full(len(monthly_income), default_term, dtype=int)
+        for category, (multiple, term) in LOAN_SIZING.items():
+            in_category = risk_categories == category
+            income_multiple[in_category] = multiple
+            term_weeks[in_category] = term
+        for category, rate in SAFE_REPAYMENT_RATES.items():
+            safe_rate[risk_categories == category] = rate
+
+        max_loan = monthly_income * income_multiple
+        recommended_loan = max_loan * 0.8
+        weekly_repayment = recommended_loan / term_weeks
+        monthly_repayment = weekly_repayment * WEEKS_PER_MONTH
+        repayment_ratio = (monthly_repayment / monthly_income) * 100
+        confidence = (income_validation['income_consistency_score'] / 100) * 0.7 + 0.3
+
+        loan_recommendation = {
+            "recommended_loan_amount": _round_values(recommended_loan, 2),
+            "max_safe_loan_amount": _round_values(max_loan, 2),
+            "recommended_term_weeks": term_weeks,
+            "weekly_repayment": _round_values(weekly_repayment, 2),
+            "repayment_to_income_ratio": _round_values(repayment_ratio, 2),
+            "recommendation_confidence": _round_values(confidence, 2),
+        }
+
+        if include_justification:
+            loan_recommendation["justification"] = np.asarray([
+                self._loan_justification(*row)
+                for row in zip(
+                    risk_categories.tolist(), monthly_income.tolist(), safe_rate.tolist(),
+                    recommended_loan.tolist(), term_weeks.tolist(), weekly_repayment.tolist(),
+                    repayment_ratio.tolist()
+                )
+            ], dtype=object)
+
+        return loan_recommendation
+
+    def _explanation_context(
+        self,
+        borrower_data: Dict,
+        ml_result: Dict,
+        vision_result: Optional[Dict],
+        nlp_result: Optional[Dict],
+        final_score: float,
+        risk_category: str
+    ) -> Dict:
+        """Compact, JSON-safe inputs for generating the risk explanation later"""
+
+        return {
+            "borrower_data": {
+                field: borrower_data[field] for field in EXPLANATION_BORROWER_FIELDS if field in borrower_data
+            },
+            "ml_result": {"baseline_score": ml_result.get('baseline_score')},
+            "vision_result": {"score_adjustment": vision_result.get('score_adjustment', 0)} if vision_result else None,
+            "nlp_result": {"score_adjustment": nlp_result.get('score_adjustment', 0)} if nlp_result else None,
+            "final_score": final_score,
+            "risk_category": risk_category
+        }
+
+    def explanation_context_from_assessment(self, assessment: Dict) -> Dict:
+        """Rebuild explanation inputs from a stored credit_assessments row"""
+
+        borrower_data = assessment.get('ml_features_used') or {}
+
+        return {
+            "borrower_data": {
+                field: borrower_data[field] for field in EXPLANATION_BORROWER_FIELDS if field in borrower_data
+            },
+            "ml_result": {"baseline_score": float(assessment['ml_baseline_score'])},
+            "vision_result": {
+                "score_adjustment": float(assessment.get('vision_score_adjustment') or 0)
+            } if assessment.get('vision_insights') else None,
+            "nlp_result": {
+                "score_adjustment": float(assessment.get('nlp_score_adjustment') or 0)
+            } if assessment.get('nlp_insights') else None,
+            "final_score": float(assessment['final_credit_score']),
+            "risk_category": assessment['risk_category']
+        }
+
+    async def generate_explanation(self, context: Dict) -> str:
+        """
+        Generate a deferred risk explanation from an explanation context
+
+        Raises on Gemini failure, so callers can tell the real explanation
+        from fallback_explanation(context).
+        """
+        return await self._request_risk_explanation(**context)
+
+    def fallback_explanation(self, context: Dict) -> str:
+        """Rule-based explanation for an explanation context"""
+        return self._fallback_explanation(context['borrower_data'], context['final_score'], context['risk_category'])
+
+    async def _request_risk_explanation(
         self,
         borrower_data: Dict,
         ml_result: Dict,
@@ -420,10 +1532,9 @@ class AdaptiveScoringEngine:
         final_score: float,
         risk_category: str
     ) -> str:
-        """Generate human-readable risk explanation using Gemini"""
+        """Ask Gemini for the risk explanation (raises on failure)"""
 
-        try:
-            prompt = f"""
+        prompt = f"""
 You are a credit analyst explaining credit assessment results to field agents at Amartha, a microfinance institution in Indonesia.
 
 **Borrower Profile:**
@@ -453,14 +1564,10 @@ Please write a clear, 2-3 paragraph explanation in Indonesian (Bahasa Indonesia)
 Keep it professional but accessible to field agents. Focus on practical insights.
 """
 
-            response = self.explanation_model.generate_content(prompt)
-            explanation = response.text.strip()
+        response_text = await generate_text(self.explanation_model_name, prompt, breaker="explanation")
+        explanation = response_text.strip()
 
-            return explanation
-
-        except Exception as e:
-            logger.error(f"Error generating risk explanation: {e}")
-            return self._fallback_explanation(borrower_data, final_score, risk_category)
+        return explanation
 
     def _fallback_explanation(self, borrower_data: Dict, final_score: float, risk_category: str) -> str:
         """Fallback explanation when Gemini is unavailable"""
@@ -0,0 +1,335 @@
+"""
+Backtesting of score fusion and risk bands against loan outcomes
+
+Joins stored credit assessments to the loans they preceded and the realized
+outcome of those loans (loans.loan_status, repayments.days_overdue), then
+evaluates a grid of fusion weights and risk-band cutoffs in one NumPy pass:
+every configuration gets its AUC, approval rate, default and overdue rates
+and expected loss.
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from services.scoring.adaptive_engine import (
+    FUSION_WEIGHTS,
+    LOWEST_RISK_CATEGORY,
+    RISK_CUTOFFS,
+    _parse_timestamp,
+)
+from services.scoring.rescoring import RescoringEngine
+from utils.logger import logger
+
+# Loan statuses with an observable outcome (pending loans were never disbursed)
+OUTCOME_LOAN_STATUSES = ("active", "completed", "defaulted", "written_off")
+DEFAULTED_LOAN_STATUSES = ("defaulted", "written_off")
+
+# A repayment this late counts as a default; this late as overdue (PAR30)
+DEFAULT_DAYS_OVERDUE = 90
+OVERDUE_DAYS = 30
+
+# Share of the exposure lost when a loan defaults
+LOSS_GIVEN_DEFAULT = 0.45
+
+# Risk categories, best first
+RISK_CATEGORIES = tuple(category for _, category in RISK_CUTOFFS) + (LOWEST_RISK_CATEGORY,)
+DEFAULT_APPROVE_CATEGORIES = ("low", "medium")
+
+# Largest band matrix (cutoff sets x weight sets x loans) built at once
+MAX_BAND_CELLS = 20_000_000
+
+
+def join_outcomes(
+    assessments: Sequence[Dict],
+    loans: Sequence[Dict],
+    repayments: Sequence[Dict]
+) -> Tuple[List[Dict], Dict[str, np.ndarray]]:
+    """
+    Pair each loan with the assessment it was decided on and its outcome
+
+    An assessment linked through credit_assessments.loan_id wins; otherwise
+    the borrower's latest assessment made before the loan was created is
+    used. Loans without such an assessment are left out, as are loans still
+    pending.
+
+    Returns:
+        (assessment rows, outcome columns: loan_id, defaulted, overdue,
+        exposure (loan amount) and outstanding (unpaid amount))
+    """
+
+    linked: Dict[str, Dict] = {}
+    by_borrower: Dict[str, List[Tuple]] = {}
+    for row in assessments:
+        if row.get('loan_id'):
+            linked.setdefault(row['loan_id'], row)
+        assessed_at = _parse_timestamp(row.get('assessed_at'))
+        if assessed_at is not None:
+            by_borrower.setdefault(row.get('borrower_id'), []).append((assessed_at, row))
+
+    max_overdue: Dict[str, int] = {}
+    paid: Dict[str, float] = {}
+    for repayment in repayments:
+        loan_id = repayment.get('loan_id')
+        max_overdue[loan_id] = max(max_overdue.get(loan_id, 0), int(repayment.get('days_overdue') or 0))
+        paid[loan_id] = paid.get(loan_id, 0.0) + float(repayment.get('paid_amount') or 0)
+
+    rows: List[Dict] = []
+    outcomes: Dict[str, List] = {"loan_id": [], "defaulted": [], "overdue": [], "exposure": [], "outstanding": []}
+    for loan in loans:
+        if loan.get('loan_status') not in OUTCOME_LOAN_STATUSES:
+            continue
+
+        row = linked.get(loan['id'])
+        if row is None:
+            created_at = _parse_timestamp(loan.get('created_at'))
+            earlier = [
+                (assessed_at, candidate) for assessed_at, candidate in by_borrower.get(loan.get('borrower_id'), [])
+                if created_at is None or assessed_at <= created_at
+            ]
+            if not earlier:
+                continue
+            row = max(earlier, key=lambda entry: entry[0])[1]
+
+        days_overdue = max_overdue.get(loan['id'], 0)
+        defaulted = loan['loan_status'] in DEFAULTED_LOAN_STATUSES or days_overdue >= DEFAULT_DAYS_OVERDUE
+        amount = float(loan.get('loan_amount') or 0)
+
+        rows.append(row)
+        outcomes["loan_id"].append(loan['id'])
+        outcomes["defaulted"].append(defaulted)
+        outcomes["overdue"].append(defaulted or days_overdue >= OVERDUE_DAYS)
+        outcomes["exposure"].append(amount)
+        outcomes["outstanding"].append(max(0.0, amount - paid.get(loan['id'], 0.0)))
+
+    return rows, {
+        "loan_id": np.array(outcomes["loan_id"], dtype=object),
+        "defaulted": np.array(outcomes["defaulted"], dtype=bool),
+        "overdue": np.array(outcomes["overdue"], dtype=bool),
+        "exposure": np.array(outcomes["exposure"], dtype=float),
+        "outstanding": np.array(outcomes["outstanding"], dtype=float),
+    }
+
+
+def weight_grid(vision_weights: Sequence[float], nlp_weights: Sequence[float]) -> np.ndarray:
+    """Every (vision, nlp) weight pair, shape (configs, 2)"""
+    vision, nlp = np.meshgrid(np.asarray(vision_weights, dtype=float), np.asarray(nlp_weights, dtype=float), indexing='ij')
+    return np.column_stack([vision.ravel(), nlp.ravel()])
+
+
+def rank_auc(scores: np.ndarray, positives: np.ndarray) -> np.ndarray:
+    """
+    AUC of each row of scores, where positives should score higher
+
+    Uses the rank-sum (Mann-Whitney) form with tied scores sharing their
+    average rank, computed for all rows at once.
+    """
+
+    scores = np.atleast_2d(scores)
+    rows, count = scores.shape
+    positive_count = int(np.count_nonzero(positives))
+    negative_count = count - positive_count
+    if positive_count == 0 or negative_count == 0:
+        return np.full(rows, np.nan)
+
+    # Offset each row past the previous one so one sorted array serves all rows
+    span = np.ptp(scores) + 1.0
+    offset = scores - scores.min() + (np.arange(rows) * span)[:, None]
+    ordered = np.sort(offset, axis=None)
+    lower = np.searchsorted(ordered, offset, side='left')
+    upper = np.searchsorted(ordered, offset, side='right')
+    ranks = (lower + upper + 1) / 2.0 - (np.arange(rows) * count)[:, None]
+
+    positive_rank_sum = ranks[:, positives].sum(axis=1)
+    return (positive_rank_sum - positive_count * (positive_count + 1) / 2.0) / (positive_count * negative_count)
+
+
+class Backtester:
+    """
+    Grid evaluation of fusion weights and risk cutoffs on realized outcomes
+
+    Args:
+        rescoring: Provides the vision/NLP adjustments (and their point
+            tables) for stored assessments
+        loss_given_default: Share of the exposure lost on default
+    """
+
+    def __init__(self, rescoring: Optional[RescoringEngine] = None, loss_given_default: float = LOSS_GIVEN_DEFAULT):
+        self.rescoring = rescoring or RescoringEngine()
+        self.loss_given_default = loss_given_default
+
+    def backtest(
+        self,
+        rows: Sequence[Dict],
+        outcomes: Dict[str, np.ndarray],
+        vision_weights: Optional[Sequence[float]] = None,
+        nlp_weights: Optional[Sequence[float]] = None,
+        cutoff_grid: Optional[Sequence[Sequence[float]]] = None,
+        approve_categories: Sequence[str] = DEFAULT_APPROVE_CATEGORIES,
+        min_approval_rate: float = 0.5
+    ) -> Dict:
+        """
+        Evaluate every combination of weights and cutoffs
+
+        Args:
+            rows: Assessment rows, one per loan (see join_outcomes)
+            outcomes: Outcome columns from join_outcomes
+            vision_weights: Vision fusion weights to try (default: live weight)
+            nlp_weights: NLP fusion weights to try (default: live weight)
+            cutoff_grid: Cutoff sets to try, each the minimum scores of the
+                RISK_CUTOFFS categories in order (default: live cutoffs)
+            approve_categories: Risk categories that would be lent to
+            min_approval_rate: Approval rate the recommended configuration must reach
+
+        Returns:
+            Sample counts, one metrics dict per configuration (weights
+            outermost) and the recommended configuration: lowest expected
+            loss among those reaching min_approval_rate, ties to higher AUC
+        """
+
+        weights = weight_grid(
+            vision_weights if vision_weights is not None else [FUSION_WEIGHTS['vision']],
+            nlp_weights if nlp_weights is not None else [FUSION_WEIGHTS['nlp']]
+        )
+        cutoffs = np.asarray(
+            cutoff_grid if cutoff_grid is not None else [[cutoff for cutoff, _ in RISK_CUTOFFS]], dtype=float
+        ).reshape(-1, len(RISK_CUTOFFS))
+        # Best band first, like RISK_CUTOFFS
+        cutoffs = -np.sort(-cutoffs, axis=1)
+        unknown = set(approve_categories) - set(RISK_CATEGORIES)
+        if unknown:
+            raise ValueError(f"Unknown risk categories: {', '.join(sorted(unknown))}")
+        approve_band = np.array([category in approve_categories for category in RISK_CATEGORIES])
+
+        defaulted = outcomes['defaulted']
+        metrics = self._evaluate(rows, outcomes, weights, cutoffs, approve_band)
+
+        configurations = []
+        for weight_index, (vision_weight, nlp_weight) in enumerate(weights):
+            for cutoff_index, cutoff_set in enumerate(cutoffs):
+                values = {name: column[weight_index, cutoff_index] for name, column in metrics.items()}
+                configurations.append({
+                    "vision_weight": float(vision_weight),
+                    "nlp_weight": float(nlp_weight),
+                    "risk_cutoffs": [
+                        (float(cutoff), category) for cutoff, (_, category) in zip(cutoff_set, RISK_CUTOFFS)
+                    ],
+                    "auc": _metric(values['auc'], 4),
+                    "approval_rate": _metric(values['approval_rate'], 4),
+                    "default_rate": _metric(values['default_rate'], 4),
+                    "overdue_rate": _metric(values['overdue_rate'], 4),
+                    "expected_loss": _metric(values['expected_loss'], 2),
+                    "loss_rate": _metric(values['loss_rate'], 4),
+                    "realized_loss": _metric(values['realized_loss'], 2),
+                    "band_default_rates": {
+                        category: _metric(values['band_default_rates'][band], 4)
+                        for band, category in enumerate(RISK_CATEGORIES)
+                    },
+                })
+
+        eligible = [c for c in configurations if (c['approval_rate'] or 0) >= min_approval_rate]
+        best = min(
+            eligible,
+            key=lambda c: (c['expected_loss'], -(c['auc'] if c['auc'] is not None else 0))
+        ) if eligible else None
+
+        logger.info(
+            f"Backtested {len(configurations)} configurations on {len(defaulted)} loans "
+            f"({int(np.count_nonzero(defaulted))} defaults)"
+        )
+
+        return {
+            "loans": int(len(defaulted)),
+            "defaults": int(np.count_nonzero(defaulted)),
+            "overdue": int(np.count_nonzero(outcomes['overdue'])),
+            "configurations": configurations,
+            "best": best,
+        }
+
+    def _evaluate(
+        self,
+        rows: Sequence[Dict],
+        outcomes: Dict[str, np.ndarray],
+        weights: np.ndarray,
+        cutoffs: np.ndarray,
+        approve_band: np.ndarray
+    ) -> Dict[str, np.ndarray]:
+        """Metric arrays of shape (weight sets, cutoff sets)"""
+
+        defaulted = outcomes['defaulted']
+        overdue = outcomes['overdue']
+        exposure = outcomes['exposure']
+        outstanding = outcomes['outstanding']
+        count = len(defaulted)
+
+        baseline = np.array([float(row.get('ml_baseline_score') or 0) for row in rows], dtype=float)
+        vision_adjustments, nlp_adjustments = self.rescoring.adjustment_columns(rows)
+
+        # Same formula as _fuse_scores, one row per weight set
+        scores = np.clip(
+            baseline
+            + weights[:, :1] * vision_adjustments
+            + weights[:, 1:] * nlp_adjustments,
+            0, 100
+        )
+
+        # Higher scores should go to loans that did not default
+        auc = np.broadcast_to(rank_auc(scores, ~defaulted)[:, None], (len(weights), len(cutoffs)))
+
+        shape = (len(weights), len(cutoffs))
+        approved_count = np.zeros(shape)
+        approved_defaults = np.zeros(shape)
+        approved_overdue = np.zeros(shape)
+        approved_exposure = np.zeros(shape)
+        realized_loss = np.zeros(shape)
+        expected_loss = np.zeros(shape)
+        band_default_rates = np.full(shape + (len(RISK_CATEGORIES),), np.nan)
+
+        # Cutoffs in RISK_CUTOFFS order descend, so a score's band is the
+        # number of cutoffs it falls below (0 = low ... 3 = very_high)
+        chunk = max(1, MAX_BAND_CELLS // max(1, scores.size * cutoffs.shape[1]))
+        for start in range(0, len(cutoffs), chunk):
+            cutoff_chunk = cutoffs[start:start + chunk]
+            bands = (scores[:, None, :, None] < cutoff_chunk[None, :, None, :]).sum(axis=-1, dtype=np.int8)
+            approved = approve_band[bands]
+            columns = slice(start, start + len(cutoff_chunk))
+
+            approved_count[:, columns] = approved.sum(axis=-1)
+            approved_defaults[:, columns] = (approved & defaulted).sum(axis=-1)
+            approved_overdue[:, columns] = (approved & overdue).sum(axis=-1)
+            approved_exposure[:, columns] = approved @ exposure
+            realized_loss[:, columns] = (approved & defaulted) @ outstanding
+
+            # Expected loss = band default rate (PD) x exposure x LGD over approved bands
+            for band in range(len(RISK_CATEGORIES)):
+                in_band = bands == band
+                band_count = in_band.sum(axis=-1)
+                band_defaults = (in_band & defaulted).sum(axis=-1)
+                band_pd = np.divide(
+                    band_defaults, band_count, out=np.full(band_count.shape, np.nan), where=band_count > 0
+                )
+                band_default_rates[:, columns, band] = band_pd
+                if approve_band[band]:
+                    expected_loss[:, columns] += np.nan_to_num(band_pd) * (in_band @ exposure)
+
+        expected_loss *= self.loss_given_default
+
+        return {
+            "auc": auc,
+            "approval_rate": approved_count / count if count else np.full(shape, np.nan),
+            "default_rate": _ratio(approved_defaults, approved_count),
+            "overdue_rate": _ratio(approved_overdue, approved_count),
+            "expected_loss": expected_loss,
+            "loss_rate": _ratio(expected_loss, approved_exposure),
+            "realized_loss": realized_loss,
+            "band_default_rates": band_default_rates,
+        }
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    return np.divide(numerator, denominator, out=np.full(numerator.shape, np.nan), where=denominator > 0)
+
+
+def _metric(value, ndigits: int) -> Optional[float]:
+    """Rounded float, None where the metric is undefined"""
+    value = float(value)
+    return None if np.isnan(value) else round(value, ndigits)
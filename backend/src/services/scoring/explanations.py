@@ -0,0 +1,102 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Optional
+
+from services.gemini.cache import TTLCache
+from utils.logger import logger
+
+
+class DeferredExplanations:
+    """
+    Risk explanations generated after the numeric assessment is returned
+
+    Each explanation is addressed by the saved assessment id. Generation
+    runs at most once per handle at a time, either started in the background
+    right away or on the first fetch, and the text is handed to the persist
+    callback. When generation fails the fallback text is returned but neither
+    kept nor persisted, so a later fetch tries again.
+    """
+
+    def __init__(
+        self,
+        generate: Callable[[Dict], Awaitable[str]],
+        persist: Optional[Callable[[str, str], None]] = None,
+        fallback: Optional[Callable[[Dict], str]] = None,
+        max_entries: int = 4096,
+        ttl_seconds: float = 24 * 3600,
+    ):
+        self._generate = generate
+        self._persist = persist
+        self._fallback = fallback
+        self._entries = TTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def register(self, explanation_id: str, context: Dict) -> None:
+        """Remember the inputs needed to generate an explanation later"""
+        self._entries.set(explanation_id, {"context": context, "explanation": None})
+
+    def start(self, explanation_id: str) -> None:
+        """Start generating a registered explanation in the background"""
+        entry = self._entries.get(explanation_id)
+        if entry is None or entry["explanation"] is not None:
+            return
+        self._ensure_task(explanation_id, entry["context"])
+
+    def status(self, explanation_id: str) -> Optional[str]:
+        """completed, generating, pending, or None if the handle is unknown here"""
+        entry = self._entries.get(explanation_id)
+        if entry is None:
+            return None
+        if entry["explanation"] is not None:
+            return "completed"
+        return "generating" if explanation_id in self._tasks else "pending"
+
+    async def resolve(self, explanation_id: str, context: Optional[Dict] = None) -> str:
+        """
+        Return the explanation, generating it now if needed
+
+        Args:
+            explanation_id: Explanation handle
+            context: Inputs to use if the handle is not registered in this process
+
+        Raises:
+            KeyError: Handle is unknown and no context was given
+        """
+
+        entry = self._entries.get(explanation_id)
+        if entry is not None:
+            if entry["explanation"] is not None:
+                return entry["explanation"]
+            context = entry["context"]
+
+        if context is None:
+            raise KeyError(explanation_id)
+
+        return await asyncio.shield(self._ensure_task(explanation_id, context))
+
+    def _ensure_task(self, explanation_id: str, context: Dict) -> asyncio.Task:
+        task = self._tasks.get(explanation_id)
+        if task is None:
+            task = asyncio.ensure_future(self._run(explanation_id, context))
+            self._tasks[explanation_id] = task
+            task.add_done_callback(lambda _: self._tasks.pop(explanation_id, None))
+        return task
+
+    async def _run(self, explanation_id: str, context: Dict) -> str:
+        try:
+            explanation = await self._generate(context)
+        except Exception as e:
+            if self._fallback is None:
+                raise
+            logger.error(f"Deferred risk explanation {explanation_id} failed, using fallback: {e}")
+            return self._fallback(context)
+
+        self._entries.set(explanation_id, {"context": context, "explanation": explanation})
+
+        if self._persist is not None:
+            try:
+                self._persist(explanation_id, explanation)
+            except Exception as e:
+                logger.error(f"Could not store explanation {explanation_id}: {e}")
+
+        logger.info(f"Deferred risk explanation {explanation_id} generated")
+        return explanation
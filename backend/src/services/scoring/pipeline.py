@@ -0,0 +1,76 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Sequence, Tuple
+
+from utils.logger import logger
+
+
+StageFunc = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+
+class Stage:
+    """A named pipeline step and the stages whose outputs it consumes"""
+
+    def __init__(self, name: str, func: StageFunc, depends_on: Sequence[str] = ()):
+        self.name = name
+        self.func = func
+        self.depends_on = tuple(depends_on)
+
+
+class StagePipeline:
+    """
+    Dependency graph of async stages
+
+    Every stage is started at once and waits only on its own dependencies,
+    so independent stages run concurrently and downstream stages start as
+    soon as their inputs are ready.
+    """
+
+    def __init__(self):
+        self._stages: Dict[str, Stage] = {}
+
+    def add_stage(self, name: str, func: StageFunc, depends_on: Sequence[str] = ()) -> "StagePipeline":
+        """Register a stage; dependencies must already be registered"""
+
+        if name in self._stages:
+            raise ValueError(f"Stage '{name}' is already registered")
+
+        missing = [dep for dep in depends_on if dep not in self._stages]
+        if missing:
+            raise ValueError(f"Stage '{name}' depends on unknown stages: {missing}")
+
+        self._stages[name] = Stage(name, func, depends_on)
+        return self
+
+    async def run(self) -> Tuple[Dict[str, Any], Dict[str, float]]:
+        """
+        Execute all stages
+
+        Returns:
+            (results by stage name, wall time per stage in milliseconds)
+        """
+
+        tasks: Dict[str, asyncio.Task] = {}
+        timings: Dict[str, float] = {}
+
+        async def run_stage(stage: Stage) -> Any:
+            inputs = {dep: await tasks[dep] for dep in stage.depends_on}
+
+            start = time.perf_counter()
+            result = await stage.func(inputs)
+            timings[stage.name] = round((time.perf_counter() - start) * 1000, 2)
+
+            logger.debug(f"Stage '{stage.name}' finished in {timings[stage.name]:.2f} ms")
+            return result
+
+        for name, stage in self._stages.items():
+            tasks[name] = asyncio.ensure_future(run_stage(stage))
+
+        try:
+            results = await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            raise
+
+        return dict(zip(tasks.keys(), results)), timings
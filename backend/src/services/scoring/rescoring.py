@@ -0,0 +1,295 @@
+"""
+Rescoring of stored assessments
+
+Rebuilds final scores, risk categories, income validation and loan
+recommendations from the vision_insights, nlp_insights and ml_features_used
+JSON stored on credit_assessments rows. The Gemini adjustment point tables,
+fusion weights and risk cutoffs can be overridden, so a new rule set can be
+backtested over the whole assessment history without calling Gemini or
+re-running the ML model.
+"""
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from services.gemini.nlp_extractor import (
+    NLP_BEHAVIOR_POINTS,
+    NLP_DEFAULT_SENTIMENT,
+    NLP_LOW_SENTIMENT_POINTS,
+    NLP_RISK_FLAG_POINTS,
+    NLP_SENTIMENT_POINTS,
+)
+from services.gemini.vision_analyzer import VISION_ADJUSTMENT_POINTS
+from services.scoring.adaptive_engine import (
+    FUSION_WEIGHTS,
+    RISK_CUTOFFS,
+    AdaptiveScoringEngine,
+    _round_values,
+)
+from utils.logger import logger
+
+# Confidence assumed for analyses stored without confidence_score
+DEFAULT_ANALYSIS_CONFIDENCE = 0.7
+
+RULE_NAMES = (
+    "fusion_weights",
+    "risk_cutoffs",
+    "vision_points",
+    "nlp_sentiment_points",
+    "nlp_low_sentiment_points",
+    "nlp_behavior_points",
+    "nlp_risk_flag_points",
+)
+
+
+def default_rules() -> Dict:
+    """The rule set live assessments use"""
+    return {
+        "fusion_weights": dict(FUSION_WEIGHTS),
+        "risk_cutoffs": [tuple(cutoff) for cutoff in RISK_CUTOFFS],
+        "vision_points": {field: (default, dict(points)) for field, (default, points) in VISION_ADJUSTMENT_POINTS.items()},
+        "nlp_sentiment_points": [tuple(threshold) for threshold in NLP_SENTIMENT_POINTS],
+        "nlp_low_sentiment_points": NLP_LOW_SENTIMENT_POINTS,
+        "nlp_behavior_points": {field: (default, dict(points)) for field, (default, points) in NLP_BEHAVIOR_POINTS.items()},
+        "nlp_risk_flag_points": dict(NLP_RISK_FLAG_POINTS),
+    }
+
+
+def merge_rules(overrides: Optional[Dict] = None) -> Dict:
+    """
+    Apply rule overrides on top of the default rules
+
+    vision_points and nlp_behavior_points take {field: {value: points}} and
+    only replace the listed values; fusion_weights and nlp_risk_flag_points
+    are merged key by key; the remaining rules are replaced as a whole.
+    """
+
+    rules = default_rules()
+    for name, value in (overrides or {}).items():
+        if value is None:
+            continue
+        if name not in RULE_NAMES:
+            raise ValueError(f"Unknown rescoring rule: {name}")
+
+        if name in ("vision_points", "nlp_behavior_points"):
+            for field, points in value.items():
+                default, current = rules[name].get(field, (None, {}))
+                rules[name][field] = (default, {**current, **points})
+        elif name in ("fusion_weights", "nlp_risk_flag_points"):
+            rules[name].update(value)
+        elif name in ("risk_cutoffs", "nlp_sentiment_points"):
+            # Best band first, like the module tables
+            rules[name] = sorted((tuple(entry) for entry in value), key=lambda entry: entry[0], reverse=True)
+        else:
+            rules[name] = value
+
+    missing = {"vision", "nlp"} - set(rules["fusion_weights"])
+    if missing:
+        raise ValueError(f"fusion_weights missing: {', '.join(sorted(missing))}")
+
+    return rules
+
+
+class RescoringEngine:
+    """
+    Vectorized re-fusion of stored assessments
+
+    Args:
+        engine: Scoring engine providing the portfolio scoring path (a new
+            one is created if omitted; it is only used for NumPy scoring)
+        rules: Rule overrides, see merge_rules
+    """
+
+    def __init__(self, engine: Optional[AdaptiveScoringEngine] = None, rules: Optional[Dict] = None):
+        self.engine = engine or AdaptiveScoringEngine()
+        self.rules = merge_rules(rules)
+
+    def rescore(self, rows: Sequence[Dict], include_justification: bool = False) -> Dict[str, np.ndarray]:
+        """
+        Rescore credit_assessments rows with this engine's rules
+
+        Args:
+            rows: Rows with ml_baseline_score, vision_insights, nlp_insights,
+                ml_features_used and (for comparison) final_credit_score and
+                risk_category
+            include_justification: Also build the loan justification text
+
+        Returns:
+            Column arrays: assessment_id, borrower_id, the adjustments, the
+            score_portfolio columns, previous_score, previous_category,
+            score_change and category_changed
+        """
+
+        rows = list(rows)
+        vision_insights = [row.get('vision_insights') or {} for row in rows]
+        nlp_insights = [row.get('nlp_insights') or {} for row in rows]
+        borrowers = [row.get('ml_features_used') or {} for row in rows]
+
+        vision_adjustments = self._vision_adjustments(vision_insights)
+        nlp_adjustments = self._nlp_adjustments(nlp_insights)
+        nlp_estimates, vision_factors = self.engine.income_signal_columns(
+            [{"insights": insights} if insights else None for insights in nlp_insights],
+            [{"insights": insights} if insights else None for insights in vision_insights]
+        )
+
+        result = self.engine.score_portfolio(
+            baseline_scores=[float(row.get('ml_baseline_score') or 0) for row in rows],
+            vision_adjustments=vision_adjustments,
+            nlp_adjustments=nlp_adjustments,
+            claimed_incomes=[borrower.get('claimed_monthly_income', 0) or 0 for borrower in borrowers],
+            business_types=[borrower.get('business_type', '') or '' for borrower in borrowers],
+            nlp_income_estimates=nlp_estimates,
+            vision_income_factors=vision_factors,
+            include_justification=include_justification,
+            fusion_weights=self.rules['fusion_weights'],
+            risk_cutoffs=self.rules['risk_cutoffs']
+        )
+
+        previous_scores = np.array(
+            [np.nan if row.get('final_credit_score') is None else float(row['final_credit_score']) for row in rows],
+            dtype=float
+        )
+        previous_categories = np.array([row.get('risk_category') for row in rows], dtype=object)
+
+        return {
+            "assessment_id": np.array([row.get('id') for row in rows], dtype=object),
+            "borrower_id": np.array([row.get('borrower_id') for row in rows], dtype=object),
+            "vision_score_adjustment": _round_values(vision_adjustments, 2),
+            "nlp_score_adjustment": _round_values(nlp_adjustments, 2),
+            **result,
+            "previous_score": previous_scores,
+            "previous_category": previous_categories,
+            "score_change": _round_values(result['final_credit_score'] - previous_scores, 2),
+            "category_changed": result['risk_category'] != previous_categories,
+        }
+
+    def adjustment_columns(self, rows: Sequence[Dict]) -> tuple:
+        """(vision_adjustments, nlp_adjustments) arrays for rows under this engine's point tables"""
+        return (
+            self._vision_adjustments([row.get('vision_insights') or {} for row in rows]),
+            self._nlp_adjustments([row.get('nlp_insights') or {} for row in rows])
+        )
+
+    def summarize(self, rescored: Dict[str, np.ndarray]) -> Dict:
+        """Category shifts and score movement of a rescore() result"""
+
+        count = len(rescored['final_credit_score'])
+        if not count:
+            return {"rescored": 0}
+
+        score_change = rescored['score_change']
+        compared = ~np.isnan(score_change)
+        categories = [category for _, category in self.rules['risk_cutoffs']]
+        categories += sorted(set(rescored['risk_category']) - set(categories))
+
+        transitions: Dict[str, Dict[str, int]] = {}
+        for before, after in zip(rescored['previous_category'], rescored['risk_category']):
+            if before is None:
+                continue
+            transitions.setdefault(before, {})
+            transitions[before][after] = transitions[before].get(after, 0) + 1
+
+        return {
+            "rescored": count,
+            "category_changes": int(np.count_nonzero(rescored['category_changed'] & compared)),
+            "mean_score_change": round(float(score_change[compared].mean()), 2) if compared.any() else 0.0,
+            "max_score_change": round(float(np.abs(score_change[compared]).max()), 2) if compared.any() else 0.0,
+            "mean_final_score": round(float(rescored['final_credit_score'].mean()), 2),
+            "risk_distribution": {
+                category: int(np.count_nonzero(rescored['risk_category'] == category))
+                for category in categories
+            },
+            "category_transitions": transitions,
+            "total_recommended_loan_amount": round(float(rescored['recommended_loan_amount'].sum()), 2),
+            "rules": self.rules,
+        }
+
+    def _vision_adjustments(self, insights: List[Dict]) -> np.ndarray:
+        """Average calculate_vision_score_adjustment per row, over the stored photo analyses"""
+
+        owners, analyses = _flatten_analyses(insights)
+        points = np.zeros(len(analyses))
+        for field, (default, table) in self.rules['vision_points'].items():
+            points += _lookup_points([a.get(field, default) for a in analyses], table)
+
+        return self._average_per_row(owners, analyses, points, len(insights))
+
+    def _nlp_adjustments(self, insights: List[Dict]) -> np.ndarray:
+        """Average calculate_nlp_score_adjustment per row, over the stored note analyses"""
+
+        owners, analyses = _flatten_analyses(insights)
+        sentiment = np.array(
+            [a.get('sentiment_score', NLP_DEFAULT_SENTIMENT) for a in analyses], dtype=float
+        )
+        bands = self.rules['nlp_sentiment_points']
+        points = np.select(
+            [sentiment >= threshold for threshold, _ in bands],
+            [float(band_points) for _, band_points in bands],
+            default=float(self.rules['nlp_low_sentiment_points'])
+        ) if len(analyses) else np.zeros(0)
+
+        for field, (default, table) in self.rules['nlp_behavior_points'].items():
+            points = points + _lookup_points(
+                [(a.get('behavioral_insights') or {}).get(field, default) for a in analyses], table
+            )
+
+        for severity, severity_points in self.rules['nlp_risk_flag_points'].items():
+            flag_counts = np.array(
+                [sum(1 for f in a.get('risk_flags') or [] if f.get('severity') == severity) for a in analyses],
+                dtype=float
+            )
+            points = points + flag_counts * severity_points
+
+        return self._average_per_row(owners, analyses, points, len(insights))
+
+    @staticmethod
+    def _average_per_row(owners: np.ndarray, analyses: List[Dict], points: np.ndarray, rows: int) -> np.ndarray:
+        """Scale points by analysis confidence, round like the analyzers, then average per row"""
+
+        confidence = np.array(
+            [a.get('confidence_score', DEFAULT_ANALYSIS_CONFIDENCE) for a in analyses], dtype=float
+        )
+        adjustments = _round_values(points * confidence, 2)
+
+        totals = np.bincount(owners, weights=adjustments, minlength=rows)
+        counts = np.bincount(owners, minlength=rows)
+        return np.divide(totals, counts, out=np.zeros(rows), where=counts > 0)
+
+
+def _flatten_analyses(insights: List[Dict]) -> tuple:
+    """(owning row index per analysis, analyses) across all rows"""
+
+    owners: List[int] = []
+    analyses: List[Dict] = []
+    for index, row_insights in enumerate(insights):
+        row_analyses = row_insights.get('analyses') or []
+        owners.extend([index] * len(row_analyses))
+        analyses.extend(row_analyses)
+
+    return np.array(owners, dtype=np.intp), analyses
+
+
+def _lookup_points(values: List, table: Dict) -> np.ndarray:
+    """Points for each categorical value (0 for values missing from the table)"""
+
+    if not values:
+        return np.zeros(0)
+
+    # Table keys are strings; anything else scores 0
+    keys = np.array([value if isinstance(value, str) else '' for value in values], dtype=object)
+    distinct, inverse = np.unique(keys, return_inverse=True)
+    distinct_points = np.array([float(table.get(value, 0)) for value in distinct])
+    return distinct_points[inverse.reshape(-1)]
+
+
+def rescore_assessments(rows: Sequence[Dict], rules: Optional[Dict] = None, engine: Optional[AdaptiveScoringEngine] = None) -> Dict:
+    """Rescore rows with the given rule overrides and summarize the effect"""
+
+    rescoring = RescoringEngine(engine=engine, rules=rules)
+    rescored = rescoring.rescore(rows)
+    summary = rescoring.summarize(rescored)
+    logger.info(
+        f"Rescored {summary['rescored']} assessments, "
+        f"{summary.get('category_changes', 0)} risk category changes"
+    )
+    return {"summary": summary, "rescored": rescored}
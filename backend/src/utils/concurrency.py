@@ -0,0 +1,173 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, Sequence
+
+from utils.logger import logger
+
+
+_process_limiters: Dict[str, asyncio.Semaphore] = {}
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """Raised when work could not finish before the caller's deadline"""
+
+
+def make_deadline(budget_seconds: Optional[float]) -> Optional[float]:
+    """Turn a time budget into an absolute monotonic deadline (None for no budget)"""
+    if not budget_seconds or budget_seconds <= 0:
+        return None
+    return time.monotonic() + budget_seconds
+
+
+def remaining_time(deadline: Optional[float]) -> Optional[float]:
+    """Seconds left before deadline, never negative (None when there is no deadline)"""
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+def get_process_limiter(name: str, limit: int) -> asyncio.Semaphore:
+    """Get a process-wide semaphore shared by every assessment in this worker"""
+    limiter = _process_limiters.get(name)
+    if limiter is None:
+        limiter = asyncio.Semaphore(max(1, limit))
+        _process_limiters[name] = limiter
+    return limiter
+
+
+@asynccontextmanager
+async def acquire_slot(limiter: asyncio.Semaphore, deadline: Optional[float] = None) -> AsyncIterator[None]:
+    """
+    Hold a limiter slot, waiting for it no longer than the deadline allows
+
+    Raises:
+        DeadlineExceeded: If no slot frees up before the deadline
+    """
+
+    remaining = remaining_time(deadline)
+    if remaining is None:
+        await limiter.acquire()
+    else:
+        if remaining <= 0:
+            raise DeadlineExceeded("deadline passed before a slot was free")
+        try:
+            await asyncio.wait_for(limiter.acquire(), remaining)
+        except asyncio.TimeoutError as e:
+            raise DeadlineExceeded("deadline passed while waiting for a slot") from e
+
+    try:
+        yield
+    finally:
+        limiter.release()
+
+
+async def gather_bounded(
+    items: Sequence[Any],
+    worker: Callable[[Any], Awaitable[Any]],
+    limit: int,
+    fallback: Optional[Callable[[Any, Exception], Any]] = None,
+    process_limiter: Optional[asyncio.Semaphore] = None,
+    timeout: Optional[float] = None,
+    on_result: Optional[Callable[[Any, Any], Awaitable[None]]] = None,
+    deadline: Optional[float] = None,
+) -> List[Any]:
+    """
+    Run worker over items concurrently with bounded parallelism
+
+    Args:
+        items: Inputs to process
+        worker: Coroutine function called once per item
+        limit: Max items in flight for this call
+        fallback: Called with (item, error) when the worker raises
+        process_limiter: Optional shared semaphore capping in-flight work process-wide
+        timeout: Optional per-item timeout in seconds, timed out items use fallback
+        on_result: Awaited with (item, result) as each item finishes
+        deadline: Optional monotonic deadline shared by all items; items still
+            running or not yet started when it passes use fallback with DeadlineExceeded
+
+    Returns:
+        Results in the same order as items
+    """
+
+    local_limiter = asyncio.Semaphore(max(1, limit))
+
+    async def run(item):
+        try:
+            async with acquire_slot(local_limiter, deadline):
+                if process_limiter is not None:
+                    async with acquire_slot(process_limiter, deadline):
+                        result = await _call(item)
+                else:
+                    result = await _call(item)
+        except DeadlineExceeded as e:
+            # Raised only while queued for a slot; _call applies the fallback itself
+            if fallback is None:
+                raise
+            logger.error(f"Bounded task not started before the deadline, using fallback: {e}")
+            result = fallback(item, e)
+
+        if on_result is not None:
+            await on_result(item, result)
+        return result
+
+    async def _call(item):
+        try:
+            item_timeout = timeout
+            budget_bound = False
+            remaining = remaining_time(deadline)
+            if remaining is not None:
+                if remaining <= 0:
+                    raise DeadlineExceeded("deadline passed before the task started")
+                if not item_timeout or remaining < item_timeout:
+                    item_timeout, budget_bound = remaining, True
+
+            if not item_timeout:
+                return await worker(item)
+            try:
+                return await asyncio.wait_for(worker(item), item_timeout)
+            except asyncio.TimeoutError as e:
+                if budget_bound:
+                    raise DeadlineExceeded("deadline passed while the task was running") from e
+                raise
+        except Exception as e:
+            if fallback is None:
+                raise
+            logger.error(f"Bounded task failed, using fallback: {e}")
+            return fallback(item, e)
+
+    return await asyncio.gather(*(run(item) for item in items))
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into one execution
+
+    The first caller for a key starts the work; callers arriving while it
+    runs await the same task and get the same result (or exception). The
+    task is shielded, so one caller going away does not cancel it for the
+    others. Nothing is kept once the work finishes.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, work: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(work())
+            self._tasks[key] = task
+            task.add_done_callback(lambda finished: self._forget(key, finished))
+        else:
+            logger.info(f"Joining in-flight call for {key}")
+        return await asyncio.shield(task)
+
+    def in_flight(self) -> int:
+        return len(self._tasks)
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        # Mark the exception retrieved when every caller has gone away
+        if not task.cancelled():
+            task.exception()
@@ -23,6 +23,46 @@ class Settings(BaseSettings):
     GEMINI_MODEL: str = "gemini-2.5-pro"
     GEMINI_VISION_MODEL: str = "gemini-2.5-flash"
 
+    GEMINI_REQUEST_TIMEOUT_SECONDS: float = 60.0
+
+    # Gemini Concurrency
+    GEMINI_MAX_CONCURRENCY: int = 8  # In-flight Gemini calls per process
+    VISION_MAX_CONCURRENCY: int = 4  # In-flight photo analyses per assessment
+    VISION_BATCH_MODE: bool = False  # One multimodal request for all of a borrower's photos
+    VISION_BATCH_MAX_IMAGES: int = 8
+    VISION_BATCH_MAX_BYTES: int = 15 * 1024 * 1024
+    NLP_MAX_CONCURRENCY: int = 4  # In-flight field note analyses per assessment
+    NLP_NOTE_TIMEOUT_SECONDS: float = 60.0
+    NLP_BATCH_MODE: bool = False  # One Gemini request for all of a borrower's pending notes
+    NLP_BATCH_MAX_NOTES: int = 10
+
+    # Gemini Result Caches
+    VISION_CACHE_MAX_ENTRIES: int = 2048
+    VISION_CACHE_TTL_SECONDS: float = 7 * 24 * 3600
+    NLP_CACHE_MAX_ENTRIES: int = 4096
+    NLP_CACHE_TTL_SECONDS: float = 30 * 24 * 3600
+    NLP_CACHE_DB_PATH: str = ""  # Optional SQLite file for persistent NLP results
+
+    # Gemini Quota (per model, 0 disables a limit)
+    GEMINI_RPM_LIMIT: int = 60
+    GEMINI_TPM_LIMIT: int = 1_000_000
+    GEMINI_ESTIMATED_OUTPUT_TOKENS: int = 1024
+    GEMINI_QUOTA_DB_PATH: str = ""  # Optional SQLite file sharing quota across workers
+    GEMINI_QUOTA_BATCH_RESERVE: float = 0.2  # Share of quota batch work may not use
+    GEMINI_QUOTA_MAX_WAIT_SECONDS: float = 30.0
+
+    # Gemini Circuit Breakers (one each for vision, NLP and explanations)
+    GEMINI_BREAKER_WINDOW_SECONDS: float = 60.0
+    GEMINI_BREAKER_MIN_CALLS: int = 5  # Calls in the window before the breaker may open
+    GEMINI_BREAKER_FAILURE_RATE: float = 0.5
+    GEMINI_BREAKER_SLOW_CALL_SECONDS: float = 20.0
+    GEMINI_BREAKER_SLOW_CALL_RATE: float = 0.8
+    GEMINI_BREAKER_OPEN_SECONDS: float = 30.0
+    GEMINI_BREAKER_HALF_OPEN_CALLS: int = 1
+
+    # Assessment Latency
+    ASSESSMENT_TIME_BUDGET_SECONDS: float = 0.0  # Default per-assessment budget, 0 disables it
+
     # Security
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
@@ -35,6 +75,9 @@ class Settings(BaseSettings):
     # ML Model
     ML_MODEL_PATH: str = "./src/services/ml_model/models/credit_model.pkl"
     ML_MODEL_VERSION: str = "1.0.0"
+    ML_COMPILED_MODEL_PATH: str = ""  # export_compiled directory, used instead of ML_MODEL_PATH when set
+    ML_MODEL_MMAP: bool = True  # Map compiled model arrays read-only so workers share one physical copy
+    ML_MODEL_PRELOAD: bool = False  # Load the model when app is imported (before gunicorn --preload forks)
 
     # API
     API_V1_PREFIX: str = "/api/v1"
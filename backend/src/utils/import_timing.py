@@ -0,0 +1,108 @@
+"""
+Import-time report
+
+Imports a module in a fresh interpreter with -X importtime, so the numbers
+match a cold worker start, and breaks the cost down by package and by
+first-party module.
+
+    python -m utils.import_timing app --top 15
+"""
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+SRC_DIR = Path(__file__).resolve().parent.parent
+IMPORT_TIME_PREFIX = "import time:"
+
+
+def measure_imports(module: str = "app") -> List[Dict]:
+    """
+    Per-module import times for importing a module from backend/src
+
+    Returns:
+        One entry per imported module, in import order: module, depth
+        (nesting level), self_us and cumulative_us (microseconds)
+    """
+
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SRC_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        error = completed.stderr.strip().splitlines()[-1:] or ["unknown error"]
+        raise RuntimeError(f"Importing {module} failed: {error[0]}")
+
+    entries = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith(IMPORT_TIME_PREFIX) or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len(IMPORT_TIME_PREFIX):].split("|")
+        entries.append({
+            "module": name.strip(),
+            "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us),
+        })
+    return entries
+
+
+def summarize_imports(entries: List[Dict], top: int = 15) -> Dict:
+    """
+    Total import time, the slowest packages (by summed self time) and the
+    slowest first-party modules (by cumulative time, which includes the
+    third-party imports they trigger)
+    """
+
+    first_party = {path.name for path in SRC_DIR.iterdir() if path.is_dir() or path.suffix == ".py"}
+    first_party = {name[:-3] if name.endswith(".py") else name for name in first_party}
+
+    packages: Dict[str, int] = {}
+    for entry in entries:
+        package = entry["module"].split(".")[0]
+        packages[package] = packages.get(package, 0) + entry["self_us"]
+
+    own_modules = [entry for entry in entries if entry["module"].split(".")[0] in first_party]
+
+    return {
+        "total_seconds": round(sum(entry["self_us"] for entry in entries) / 1e6, 3),
+        "modules_imported": len(entries),
+        "packages": [
+            {"package": package, "seconds": round(self_us / 1e6, 3)}
+            for package, self_us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+        ],
+        "first_party_modules": [
+            {"module": entry["module"], "seconds": round(entry["cumulative_us"] / 1e6, 3)}
+            for entry in sorted(own_modules, key=lambda entry: entry["cumulative_us"], reverse=True)[:top]
+        ],
+    }
+
+
+def format_report(module: str, summary: Dict) -> str:
+    """Plain-text version of summarize_imports for the console"""
+
+    total = summary["total_seconds"] or 1.0
+    lines = [
+        f"Importing {module}: {summary['total_seconds']:.3f}s across {summary['modules_imported']} modules",
+        "",
+        "Slowest packages (self time):",
+    ]
+    lines += [
+        f"  {row['package']:<40} {row['seconds']:>7.3f}s  {row['seconds'] / total:>6.1%}"
+        for row in summary["packages"]
+    ]
+    lines += ["", "Slowest first-party modules (including what they import):"]
+    lines += [f"  {row['module']:<40} {row['seconds']:>7.3f}s" for row in summary["first_party_modules"]]
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Break down the import time of a backend module")
+    parser.add_argument("module", nargs="?", default="app", help="Module to import (default: app)")
+    parser.add_argument("--top", type=int, default=15, help="Rows per section (default: 15)")
+    args = parser.parse_args()
+
+    print(format_report(args.module, summarize_imports(measure_imports(args.module), args.top)))
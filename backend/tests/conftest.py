@@ -0,0 +1,26 @@
+import importlib
+import os
+import sys
+import tempfile
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+# Settings are required at import time; tests never reach Supabase or Gemini
+os.environ.setdefault("SUPABASE_URL", "https://test.supabase.co")
+os.environ.setdefault("SUPABASE_KEY", "test-key")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "test-service-key")
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/test")
+os.environ.setdefault("GOOGLE_API_KEY", "test-google-key")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("LOG_FILE", os.path.join(tempfile.gettempdir(), "amara_api_test.log"))
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+
+@pytest.fixture(scope="session")
+def credit_scoring_routes():
+    """The credit scoring routes module, with a mock Supabase client"""
+    with patch("supabase.create_client", return_value=MagicMock()):
+        return importlib.import_module("api.v1.routes.credit_scoring")
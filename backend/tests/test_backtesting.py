@@ -0,0 +1,31 @@
+import numpy as np
+
+from services.scoring.backtesting import rank_auc
+
+
+def _pairwise_auc(scores: np.ndarray, positives: np.ndarray) -> float:
+    """Share of (positive, negative) pairs the positive wins, ties counting half"""
+    wins = scores[positives][:, None] - scores[~positives][None, :]
+    return float(((wins > 0) + 0.5 * (wins == 0)).mean())
+
+
+def test_rank_auc_matches_pairwise_counting_with_ties():
+    rng = np.random.default_rng(8)
+    # Rounded scores so every row has plenty of ties
+    scores = np.round(rng.normal(60, 15, size=(6, 400)))
+    positives = rng.random(400) < 0.3
+    scores[:, positives] += np.arange(6)[:, None] * 3
+
+    auc = rank_auc(scores, positives)
+
+    assert np.allclose(auc, [_pairwise_auc(row, positives) for row in scores])
+    assert np.all(np.diff(auc) > 0)
+
+
+def test_rank_auc_edge_cases():
+    positives = np.array([True, True, False, False])
+
+    assert rank_auc(np.array([90.0, 80.0, 40.0, 30.0]), positives).tolist() == [1.0]
+    assert rank_auc(np.array([10.0, 20.0, 40.0, 30.0]), positives).tolist() == [0.0]
+    assert rank_auc(np.full(4, 55.0), positives).tolist() == [0.5]
+    assert np.isnan(rank_auc(np.ones((2, 4)), np.zeros(4, dtype=bool))).all()
@@ -0,0 +1,73 @@
+import time
+
+from services.gemini.cache import SQLiteResultStore, TTLCache
+
+
+def test_lru_eviction_keeps_recently_used_entries():
+    cache = TTLCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_ttl():
+    cache = TTLCache(ttl_seconds=0.05)
+    cache.set("a", {"score": 1})
+    assert cache.get("a") == {"score": 1}
+
+    time.sleep(0.06)
+
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_values_are_copied_in_and_out():
+    cache = TTLCache()
+    value = {"flags": []}
+    cache.set("a", value)
+    value["flags"].append("changed")
+    cache.get("a")["flags"].append("changed")
+
+    assert cache.get("a") == {"flags": []}
+
+
+def test_invalidate_tag_drops_every_tagged_entry(tmp_path):
+    cache = TTLCache(backing_store=SQLiteResultStore(str(tmp_path / "cache.sqlite3")))
+    cache.set("a", 1, tag="note-1")
+    cache.set("b", 2, tag="note-1")
+    cache.set("c", 3, tag="note-2")
+
+    assert cache.invalidate_tag("note-1") == 2
+
+    assert cache.get("a") is None and cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_backing_store_survives_a_new_cache(tmp_path):
+    db_path = str(tmp_path / "cache.sqlite3")
+    TTLCache(backing_store=SQLiteResultStore(db_path)).set("a", {"score": 1}, tag="note-1")
+
+    reloaded = TTLCache(backing_store=SQLiteResultStore(db_path))
+
+    assert reloaded.get("a") == {"score": 1}
+    assert reloaded.invalidate_tag("note-1") == 1
+    assert reloaded.get("a") is None
+
+
+def test_reloaded_entries_keep_their_stored_expiry(tmp_path):
+    db_path = str(tmp_path / "cache.sqlite3")
+    TTLCache(ttl_seconds=0.2, backing_store=SQLiteResultStore(db_path, ttl_seconds=0.2)).set("a", 1)
+    time.sleep(0.15)
+
+    # A fresh cache loads the entry with its remaining ~0.05s, not a new 0.2s
+    reloaded = TTLCache(ttl_seconds=0.2, backing_store=SQLiteResultStore(db_path, ttl_seconds=0.2))
+    assert reloaded.get("a") == 1
+    time.sleep(0.1)
+
+    assert reloaded.get("a") is None
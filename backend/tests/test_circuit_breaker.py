@@ -0,0 +1,101 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import services.gemini.client as client
+from services.gemini.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+from services.gemini.rate_limiter import QuotaScheduler
+
+
+@pytest.fixture
+def slow_gemini(monkeypatch):
+    """generate_text wired to a model that takes 0.2s and a breaker treating 0.05s as slow"""
+
+    breaker = CircuitBreaker("test", min_calls=2, slow_call_seconds=0.05, slow_call_rate_threshold=0.5, open_seconds=60)
+
+    async def generate_content_async(contents, request_options=None):
+        await asyncio.sleep(0.2)
+        return SimpleNamespace(text="ok", usage_metadata=None)
+
+    monkeypatch.setattr(client, "get_model", lambda model_name: SimpleNamespace(generate_content_async=generate_content_async))
+    monkeypatch.setattr(client, "get_breaker", lambda name: breaker)
+    monkeypatch.setattr(client, "get_quota_scheduler", lambda: QuotaScheduler(0, 0))
+    return breaker
+
+
+def test_calls_cancelled_after_the_slow_threshold_open_the_breaker(slow_gemini):
+    async def call_with_timeout():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(client.generate_text("model", "prompt", breaker="test"), 0.1)
+
+    asyncio.run(call_with_timeout())
+    assert slow_gemini.state == CLOSED
+    asyncio.run(call_with_timeout())
+
+    assert slow_gemini.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(client.generate_text("model", "prompt", breaker="test"))
+
+
+def test_calls_cancelled_early_are_not_counted(slow_gemini):
+    async def call_with_timeout():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(client.generate_text("model", "prompt", breaker="test"), 0.01)
+
+    for _ in range(3):
+        asyncio.run(call_with_timeout())
+
+    assert slow_gemini.state == CLOSED
+    assert slow_gemini.stats()["window_calls"] == 0
+
+
+def test_slow_cancelled_probe_reopens_a_half_open_breaker():
+    breaker = CircuitBreaker("test", min_calls=1, open_seconds=0, slow_call_seconds=1.0)
+    breaker.record_failure(0.1)
+    assert breaker.state == HALF_OPEN
+
+    breaker.before_call()
+    breaker.record_cancelled(2.0)
+
+    assert breaker.stats()["times_opened"] == 2
+
+
+def test_breaker_opens_on_failures_then_half_opens_and_closes_on_a_good_probe():
+    breaker = CircuitBreaker("test", min_calls=4, failure_rate_threshold=0.5, open_seconds=0.05)
+    breaker.record_success(0.1)
+    breaker.record_failure(0.1)
+    breaker.record_failure(0.1)
+    assert breaker.state == CLOSED
+
+    breaker.record_failure(0.1)
+
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    time.sleep(0.06)
+    assert breaker.state == HALF_OPEN
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record_success(0.1)
+
+    assert breaker.state == CLOSED
+    assert breaker.stats()["window_calls"] == 0
+    assert breaker.stats()["rejected_calls"] == 2
+    breaker.before_call()
+
+
+def test_failed_probe_reopens_the_breaker():
+    breaker = CircuitBreaker("test", min_calls=1, open_seconds=0.05)
+    breaker.record_failure(0.1)
+    time.sleep(0.06)
+    breaker.before_call()
+
+    breaker.record_failure(0.1)
+
+    assert breaker.state == OPEN
+    assert breaker.stats()["times_opened"] == 2
@@ -0,0 +1,154 @@
+import random
+
+import numpy as np
+import pytest
+
+pytest.importorskip("sklearn")
+
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+from services.ml_model.compiled_forest import CompiledForest
+from services.ml_model.credit_risk_model import CreditRiskModel
+
+BUSINESS_TYPES = ['Warung Kelontong', 'Warung Nasi', 'Salon', 'Tailor', 'Other']
+
+
+def _borrower(rng: random.Random) -> dict:
+    borrower = {
+        'age': rng.randint(18, 70),
+        'years_in_business': rng.uniform(0, 20),
+        'num_dependents': rng.randint(0, 7),
+        'claimed_monthly_income': rng.randint(500_000, 10_000_000),
+        'financial_literacy_score': rng.randint(0, 100),
+        'has_bank_account': rng.random() < 0.5,
+        'keeps_financial_records': rng.random() < 0.5,
+        'business_type': rng.choice(BUSINESS_TYPES),
+        'loan_history': {
+            'num_loans': rng.randint(0, 5),
+            'avg_loan_amount': rng.uniform(0, 5_000_000),
+            'total_borrowed': rng.uniform(0, 20_000_000),
+        },
+        'repayment_history': {
+            'on_time_rate': rng.random(),
+            'avg_days_overdue': rng.uniform(0, 30),
+            'default_rate': rng.random() * 0.3,
+            'total_repayments': rng.randint(0, 50),
+        },
+    }
+    # Missing fields take the feature defaults
+    for field in ('age', 'years_in_business', 'financial_literacy_score'):
+        if rng.random() < 0.1:
+            borrower.pop(field)
+    return borrower
+
+
+def _label(borrower: dict) -> int:
+    repayment = borrower['repayment_history']
+    return int(repayment['on_time_rate'] > 0.5 and repayment['default_rate'] < 0.2)
+
+
+@pytest.fixture(scope="module")
+def credit_model():
+    rng = random.Random(11)
+    borrowers = [_borrower(rng) for _ in range(400)]
+    model = CreditRiskModel()
+    model.train(borrowers, [_label(borrower) for borrower in borrowers])
+    assert model.forest is not None
+    return model
+
+
+@pytest.fixture(scope="module")
+def nan_forest():
+    """A forest trained on data with NaNs, so trees carry real missing-value routing"""
+
+    rng = np.random.default_rng(5)
+    X = rng.normal(size=(600, 6)) * [1, 10, 100, 1000, 0.1, 5]
+    y = (X[:, 0] + X[:, 1] / 10 > 0).astype(int)
+    X[rng.random(X.shape) < 0.15] = np.nan
+
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(n_estimators=25, max_depth=8, random_state=0).fit(scaler.transform(X), y)
+    forest = CompiledForest.from_sklearn(model, scaler, [f"f{index}" for index in range(6)])
+    return model, scaler, forest, X
+
+
+def _feature_rows(credit_model, count: int, seed: int) -> np.ndarray:
+    rng = random.Random(seed)
+    return credit_model.feature_spec.matrix([_borrower(rng) for _ in range(count)])
+
+
+def test_matches_sklearn_exactly(credit_model):
+    X = _feature_rows(credit_model, 2000, seed=1)
+
+    expected = credit_model.model.predict_proba(credit_model.scaler.transform(X))
+
+    assert np.array_equal(credit_model.forest.predict_proba(X), expected)
+
+
+def test_matches_sklearn_with_missing_values(nan_forest):
+    model, scaler, forest, X = nan_forest
+    assert forest.supports_missing
+
+    expected = model.predict_proba(scaler.transform(X))
+
+    assert np.array_equal(forest.predict_proba(X), expected)
+
+
+def test_nan_rows_on_trees_without_missing_training(credit_model):
+    X = _feature_rows(credit_model, 500, seed=2)
+    X[np.random.default_rng(4).random(X.shape) < 0.05] = np.nan
+
+    expected = credit_model.model.predict_proba(credit_model.scaler.transform(X))
+
+    assert np.array_equal(credit_model.forest.predict_proba(X), expected)
+
+
+def test_rejects_infinite_features(credit_model):
+    X = _feature_rows(credit_model, 1, seed=3)
+    X[0, 3] = np.inf
+
+    with pytest.raises(ValueError):
+        credit_model.forest.predict_proba(X)
+
+
+def test_save_load_round_trip_memory_mapped(credit_model, tmp_path):
+    X = _feature_rows(credit_model, 500, seed=4)
+    credit_model.export_compiled(str(tmp_path / "compiled"))
+
+    forest = CompiledForest.load(str(tmp_path / "compiled"), mmap_mode="r")
+
+    assert forest.memory_mapped
+    assert np.array_equal(forest.predict_proba(X), credit_model.forest.predict_proba(X))
+
+    loaded = CreditRiskModel(str(tmp_path / "compiled"), mmap_mode="r")
+    assert loaded.model is None and loaded.has_model
+    rng = random.Random(5)
+    for borrower in (_borrower(rng) for _ in range(20)):
+        assert loaded.predict(borrower) == credit_model.predict(borrower)
+
+
+def test_predict_matches_predict_batch(credit_model):
+    rng = random.Random(6)
+    borrowers = [_borrower(rng) for _ in range(200)] + [{}, {'business_type': 'Salon'}]
+
+    assert credit_model.predict_batch(borrowers) == [credit_model.predict(borrower) for borrower in borrowers]
+
+
+def test_save_swaps_versions_without_touching_mapped_files(credit_model, tmp_path):
+    X = _feature_rows(credit_model, 200, seed=7)
+    target = tmp_path / "compiled"
+    # An artifact saved as a plain directory by an older version
+    target.mkdir()
+    credit_model.forest._write(target)
+
+    mapped = CompiledForest.load(str(target), mmap_mode="r")
+    expected = mapped.predict_proba(X)
+    for _ in range(3):
+        credit_model.forest.save(str(target))
+
+    assert target.is_symlink()
+    versions = sorted(path.name for path in tmp_path.iterdir() if path.name != "compiled")
+    assert len(versions) == 2 and all(name.startswith(".compiled.v") for name in versions)
+    assert np.array_equal(mapped.predict_proba(X), expected)
+    assert np.array_equal(CompiledForest.load(str(target), mmap_mode="r").predict_proba(X), expected)
@@ -0,0 +1,150 @@
+import asyncio
+import random
+
+from utils.concurrency import DeadlineExceeded, SingleFlight, acquire_slot, gather_bounded, make_deadline
+
+
+def test_gather_bounded_keeps_input_order_and_limit():
+    in_flight = 0
+    peak = 0
+
+    async def worker(item):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(random.uniform(0, 0.02))
+        in_flight -= 1
+        return item * 10
+
+    results = asyncio.run(gather_bounded(list(range(20)), worker, limit=3))
+
+    assert results == [item * 10 for item in range(20)]
+    assert peak == 3
+
+
+def test_gather_bounded_uses_fallback_for_failed_items():
+    async def worker(item):
+        if item % 2:
+            raise ValueError(f"bad {item}")
+        return item
+
+    results = asyncio.run(gather_bounded(
+        [0, 1, 2, 3], worker, limit=2, fallback=lambda item, error: f"fallback {error}"
+    ))
+
+    assert results == [0, "fallback bad 1", 2, "fallback bad 3"]
+
+
+def test_gather_bounded_times_out_single_items():
+    async def worker(item):
+        await asyncio.sleep(item)
+        return item
+
+    results = asyncio.run(gather_bounded(
+        [0, 1], worker, limit=2, timeout=0.05, fallback=lambda item, error: type(error).__name__
+    ))
+
+    assert results == [0, "TimeoutError"]
+
+
+def test_gather_bounded_falls_back_once_the_deadline_passes():
+    started = []
+
+    async def worker(item):
+        started.append(item)
+        await asyncio.sleep(0.2 if item == 0 else 0)
+        return item
+
+    async def run():
+        # One slot: item 0 overruns the deadline and the rest never start
+        return await gather_bounded(
+            [0, 1, 2], worker, limit=1, deadline=make_deadline(0.05),
+            fallback=lambda item, error: isinstance(error, DeadlineExceeded)
+        )
+
+    assert asyncio.run(run()) == [True, True, True]
+    assert started == [0]
+
+
+def test_waiting_for_a_process_slot_counts_against_the_deadline():
+    async def run():
+        limiter = asyncio.Semaphore(1)
+        await limiter.acquire()
+        results = await gather_bounded(
+            [0, 1], lambda item: asyncio.sleep(0, item), limit=2, process_limiter=limiter,
+            deadline=make_deadline(0.05), fallback=lambda item, error: type(error).__name__
+        )
+        return results, limiter.locked()
+
+    results, still_held = asyncio.run(run())
+
+    assert results == ["DeadlineExceeded", "DeadlineExceeded"]
+    assert still_held
+
+
+def test_acquire_slot_releases_on_exit():
+    async def run():
+        limiter = asyncio.Semaphore(1)
+        async with acquire_slot(limiter, make_deadline(1)):
+            assert limiter.locked()
+        return limiter.locked()
+
+    assert asyncio.run(run()) is False
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    flights = SingleFlight()
+    runs = []
+
+    async def work():
+        runs.append(1)
+        await asyncio.sleep(0.02)
+        return {"score": 70}
+
+    async def run():
+        results = await asyncio.gather(*(flights.do("b1", work) for _ in range(5)), flights.do("b2", work))
+        return results, flights.in_flight()
+
+    results, in_flight = asyncio.run(run())
+
+    assert len(runs) == 2
+    assert all(result is results[0] for result in results[:5])
+    assert in_flight == 0
+
+
+def test_single_flight_shares_errors_and_runs_again_afterwards():
+    flights = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        if len(calls) == 1:
+            raise RuntimeError("Gemini down")
+        return "ok"
+
+    async def run():
+        first = await asyncio.gather(flights.do("b1", work), flights.do("b1", work), return_exceptions=True)
+        return first, await flights.do("b1", work)
+
+    first, second = asyncio.run(run())
+
+    assert all(isinstance(result, RuntimeError) for result in first)
+    assert second == "ok" and len(calls) == 2
+
+
+def test_single_flight_survives_one_caller_cancelling():
+    flights = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def run():
+        impatient = asyncio.ensure_future(flights.do("b1", work))
+        patient = asyncio.ensure_future(flights.do("b1", work))
+        await asyncio.sleep(0.01)
+        impatient.cancel()
+        return await patient
+
+    assert asyncio.run(run()) == "done"
@@ -0,0 +1,64 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+
+def test_batch_assess_survives_prefetch_failure(credit_scoring_routes, monkeypatch):
+    routes = credit_scoring_routes
+    engine = routes.scoring_engine
+    assessed = []
+
+    def load_inputs(request):
+        borrower = {'id': request.borrower_id}
+        return borrower, [], [{'id': f"{request.borrower_id}-note", 'note_text': 'warung ramai'}]
+
+    async def load_ml_model():
+        return SimpleNamespace(predict_batch=lambda borrowers: [
+            {'baseline_score': 60.0, 'model_version': '1.0.0'} for _ in borrowers
+        ])
+
+    async def failing_prefetch(borrowers):
+        raise RuntimeError("Gemini unavailable")
+
+    async def run_assessment(request, inputs=None, ml_result=None):
+        assessed.append(request.borrower_id)
+        return {'borrower_id': request.borrower_id, 'final_credit_score': ml_result['baseline_score']}
+
+    monkeypatch.setattr(routes.settings, 'NLP_BATCH_MODE', True)
+    monkeypatch.setattr(routes, '_load_assessment_inputs', load_inputs)
+    monkeypatch.setattr(routes, '_run_assessment', run_assessment)
+    monkeypatch.setattr(engine, 'load_ml_model', load_ml_model)
+    monkeypatch.setattr(engine, 'prefetch_field_note_analyses', failing_prefetch)
+
+    response = asyncio.run(routes.batch_assess_borrowers(['b1', 'b2'], save_to_database=False))
+
+    assert response['successful'] == 2
+    assert response['failed'] == 0
+    assert assessed == ['b1', 'b2']
+
+
+def test_assess_runs_supabase_calls_off_the_event_loop(credit_scoring_routes, monkeypatch):
+    routes = credit_scoring_routes
+    threads = {}
+    main_thread = threading.current_thread()
+
+    def record(name, value=None):
+        def call(*args):
+            threads[name] = threading.current_thread()
+            return value
+        return call
+
+    async def assess_borrower(borrower_data, photos, field_notes, options):
+        return {'final_credit_score': 70.0, 'artifact_updates': {'photos': [], 'field_notes': []}}
+
+    monkeypatch.setattr(routes, '_latest_assessment_row', record('latest'))
+    monkeypatch.setattr(routes, '_persist_artifact_analyses', record('persist'))
+    monkeypatch.setattr(routes, '_save_assessment', record('save', 'assessment-1'))
+    monkeypatch.setattr(routes.scoring_engine, 'assess_borrower', assess_borrower)
+
+    request = routes.CreditAssessmentRequest(borrower_id='b1', explanation_mode='inline')
+    response = asyncio.run(routes._run_assessment(request, inputs=({'id': 'b1'}, [], [])))
+
+    assert response['assessment_id'] == 'assessment-1'
+    assert set(threads) == {'latest', 'persist', 'save'}
+    assert all(thread is not main_thread for thread in threads.values())
@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+import services.scoring.adaptive_engine as engine_module
+from services.scoring.adaptive_engine import AdaptiveScoringEngine
+
+BORROWER = {
+    'id': 'b1',
+    'business_type': 'Warung Kelontong',
+    'claimed_monthly_income': 3_000_000,
+    'updated_at': '2024-05-01T00:00:00+00:00',
+}
+ML_RESULT = {
+    'baseline_score': 70.0,
+    'model_version': '1.0.0',
+    'default_probability': 0.3,
+    'feature_importance': {},
+}
+OPTIONS = {'include_vision': False, 'include_nlp': False}
+
+
+@pytest.fixture
+def gemini(monkeypatch):
+    """generate_text stub counting its calls; set gemini["fail"] to make it raise"""
+
+    state = {"calls": 0, "fail": False}
+
+    async def generate_text(model_name, contents, breaker=None):
+        state["calls"] += 1
+        if state["fail"]:
+            raise RuntimeError("Gemini quota exhausted")
+        return "Steady repayments and a growing warung."
+
+    monkeypatch.setattr(engine_module, 'generate_text', generate_text)
+    return state
+
+
+def _stored_row(engine: AdaptiveScoringEngine) -> dict:
+    return {
+        'id': 'a1',
+        'input_fingerprint': engine.input_fingerprint(BORROWER, None, None),
+        'ml_baseline_score': 70.0,
+        'final_credit_score': 72.5,
+        'risk_category': 'low',
+        'risk_explanation': "Stored explanation",
+    }
+
+
+def test_matching_fingerprint_returns_the_stored_assessment(gemini):
+    engine = AdaptiveScoringEngine()
+    latest = _stored_row(engine)
+
+    result = asyncio.run(engine.assess_borrower(BORROWER, [], [], {**OPTIONS, 'latest_assessment': latest}))
+
+    assert result['reused_assessment_id'] == 'a1'
+    assert result['final_credit_score'] == 72.5
+    assert result['risk_explanation'] == "Stored explanation"
+    assert result['input_fingerprint'] == latest['input_fingerprint']
+    assert gemini["calls"] == 0
+
+
+def test_changed_inputs_are_scored_again(gemini):
+    engine = AdaptiveScoringEngine()
+    latest = _stored_row(engine)
+    changed = {**BORROWER, 'updated_at': '2024-06-01T00:00:00+00:00'}
+
+    result = asyncio.run(engine.assess_borrower(
+        changed, [], [], {**OPTIONS, 'latest_assessment': latest, 'ml_result': ML_RESULT}
+    ))
+
+    assert 'reused_assessment_id' not in result
+    assert gemini["calls"] == 1
+    assert result['input_fingerprint'] == engine.input_fingerprint(changed, None, None, '1.0.0')
+
+
+def test_degraded_results_get_no_fingerprint(gemini):
+    gemini["fail"] = True
+    engine = AdaptiveScoringEngine()
+
+    result = asyncio.run(engine.assess_borrower(BORROWER, [], [], {**OPTIONS, 'ml_result': ML_RESULT}))
+
+    assert result['degraded_stages'] == ['explanation']
+    assert result['input_fingerprint'] is None
+
+
+def test_rule_based_scores_get_no_fingerprint(gemini):
+    engine = AdaptiveScoringEngine()
+    rule_based = {**ML_RESULT, 'model_version': '1.0.0-rule-based'}
+
+    result = asyncio.run(engine.assess_borrower(BORROWER, [], [], {**OPTIONS, 'ml_result': rule_based}))
+
+    assert result['degraded_stages'] == []
+    assert result['input_fingerprint'] is None
+
+
+def test_fallback_photo_analyses_are_not_reusable():
+    engine = AdaptiveScoringEngine()
+    vision_result = {'insights': {'analyses': [{'business_scale': 'small'}, {'fallback': True}]}}
+
+    assert not engine._is_reusable(ML_RESULT, vision_result, None, [])
+    assert engine._is_reusable(ML_RESULT, {'insights': {'analyses': [{'business_scale': 'small'}]}}, None, [])
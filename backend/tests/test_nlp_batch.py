@@ -0,0 +1,39 @@
+import json
+
+from services.gemini.nlp_extractor import GeminiNLPExtractor
+
+
+def test_partial_response_keeps_the_notes_it_covers():
+    response = "```json\n" + json.dumps([
+        {"note_id": "n1", "sentiment": "positive", "confidence": 0.8},
+        {"note_id": "n9", "sentiment": "negative"},
+    ]) + "\n```"
+
+    analyses = GeminiNLPExtractor()._parse_nlp_batch_response(response, ["n1", "n2"])
+
+    assert list(analyses) == ["n1"]
+    assert analyses["n1"]["sentiment"] == "positive"
+    assert "note_id" not in analyses["n1"]
+    assert json.loads(analyses["n1"]["raw_analysis"]) == {"sentiment": "positive", "confidence": 0.8}
+
+
+def test_malformed_items_and_duplicates_are_dropped():
+    response = json.dumps([
+        "not an analysis",
+        {"sentiment": "neutral"},
+        {"note_id": "n2", "sentiment": "neutral"},
+        {"note_id": "n2", "sentiment": "negative"},
+    ])
+
+    analyses = GeminiNLPExtractor()._parse_nlp_batch_response(response, ["n1", "n2"])
+
+    assert list(analyses) == ["n2"]
+    assert analyses["n2"]["sentiment"] == "neutral"
+
+
+def test_unparseable_responses_give_no_analyses():
+    extractor = GeminiNLPExtractor()
+
+    assert extractor._parse_nlp_batch_response("Sorry, I can't help with that.", ["n1"]) == {}
+    assert extractor._parse_nlp_batch_response('[{"note_id": "n1",', ["n1"]) == {}
+    assert extractor._parse_nlp_batch_response('{"note_id": "n1"}', ["n1"]) == {}
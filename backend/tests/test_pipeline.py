@@ -0,0 +1,62 @@
+import asyncio
+import time
+
+import pytest
+
+from services.scoring.pipeline import StagePipeline
+
+
+def test_independent_stages_run_concurrently():
+    events = []
+
+    def stage(name, seconds, result=None):
+        async def run(inputs):
+            events.append(("start", name))
+            await asyncio.sleep(seconds)
+            events.append(("end", name))
+            return result if result is not None else inputs
+        return run
+
+    pipeline = StagePipeline()
+    pipeline.add_stage('ml', stage('ml', 0.1, 60))
+    pipeline.add_stage('vision', stage('vision', 0.1, 2))
+    pipeline.add_stage('nlp', stage('nlp', 0.1, 3))
+    pipeline.add_stage('fusion', stage('fusion', 0), depends_on=['ml', 'vision', 'nlp'])
+
+    started = time.perf_counter()
+    results, timings = asyncio.run(pipeline.run())
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < 0.2
+    assert events[:3] == [("start", "ml"), ("start", "vision"), ("start", "nlp")]
+    assert events[-2:] == [("start", "fusion"), ("end", "fusion")]
+    assert results['fusion'] == {'ml': 60, 'vision': 2, 'nlp': 3}
+    assert set(timings) == {'ml', 'vision', 'nlp', 'fusion'}
+
+
+def test_stage_failure_cancels_the_rest():
+    cancelled = []
+
+    async def slow(inputs):
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append('slow')
+            raise
+
+    async def failing(inputs):
+        raise RuntimeError("stage failed")
+
+    pipeline = StagePipeline()
+    pipeline.add_stage('slow', slow)
+    pipeline.add_stage('failing', failing)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(pipeline.run())
+    assert cancelled == ['slow']
+
+
+def test_unknown_dependencies_are_rejected():
+    pipeline = StagePipeline()
+    with pytest.raises(ValueError):
+        pipeline.add_stage('fusion', lambda inputs: None, depends_on=['ml'])
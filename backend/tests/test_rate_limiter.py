@@ -0,0 +1,89 @@
+import asyncio
+import time
+
+import pytest
+
+from services.gemini.rate_limiter import (
+    BATCH,
+    INTERACTIVE,
+    MemoryBucketStore,
+    QuotaExceededError,
+    QuotaScheduler,
+    SQLiteBucketStore,
+    current_priority,
+    quota_priority,
+)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteBucketStore(str(tmp_path / "quota.sqlite3"))
+    return MemoryBucketStore()
+
+
+def test_batch_calls_leave_the_reserve_to_interactive_calls(store):
+    # 6 requests per minute refill one request every 10s, so nothing refills during the test
+    scheduler = QuotaScheduler(6, 0, store=store, batch_reserve=0.5, max_wait_seconds=0.1)
+
+    async def run():
+        for _ in range(3):
+            await scheduler.acquire("flash", 100, priority=BATCH)
+        with pytest.raises(QuotaExceededError):
+            await scheduler.acquire("flash", 100, priority=BATCH)
+
+        for _ in range(3):
+            await scheduler.acquire("flash", 100, priority=INTERACTIVE)
+        with pytest.raises(QuotaExceededError):
+            await scheduler.acquire("flash", 100, priority=INTERACTIVE)
+
+    asyncio.run(run())
+
+    stats = scheduler.stats()
+    assert stats["granted"] == {INTERACTIVE: 3, BATCH: 3}
+    assert stats["rejected"] == 2
+    assert stats["shared"] == isinstance(store, SQLiteBucketStore)
+
+
+def test_interactive_calls_go_before_waiting_batch_calls():
+    # 6000 tokens per minute: an empty bucket covers a 10-token call after 0.1s
+    scheduler = QuotaScheduler(0, 6000, batch_reserve=0, max_wait_seconds=2)
+    granted = []
+
+    async def call(name, priority):
+        await scheduler.acquire("flash", 10, priority=priority)
+        granted.append(name)
+
+    async def run():
+        await scheduler.acquire("flash", 6000)
+        batch = asyncio.ensure_future(call("batch", BATCH))
+        await asyncio.sleep(0)
+        await call("interactive", INTERACTIVE)
+        await batch
+
+    started = time.monotonic()
+    asyncio.run(run())
+
+    assert granted == ["interactive", "batch"]
+    assert time.monotonic() - started >= 0.15
+    assert scheduler.stats()["waited_seconds"][INTERACTIVE] > 0
+
+
+def test_reported_over_use_delays_the_next_call():
+    scheduler = QuotaScheduler(0, 6000, max_wait_seconds=2)
+
+    async def run():
+        await scheduler.acquire("flash", 10)
+        await scheduler.record_usage("flash", estimated_tokens=10, actual_tokens=6000)
+        started = time.monotonic()
+        await scheduler.acquire("flash", 10)
+        return time.monotonic() - started
+
+    assert asyncio.run(run()) >= 0.09
+
+
+def test_quota_priority_applies_to_the_enclosed_context():
+    assert current_priority() == INTERACTIVE
+    with quota_priority(BATCH):
+        assert current_priority() == BATCH
+    assert current_priority() == INTERACTIVE
@@ -0,0 +1,114 @@
+import random
+
+import numpy as np
+import pytest
+
+from services.gemini.nlp_extractor import GeminiNLPExtractor
+from services.gemini.vision_analyzer import GeminiVisionAnalyzer
+from services.scoring.adaptive_engine import AdaptiveScoringEngine
+from services.scoring.rescoring import RescoringEngine
+
+LEVELS = ["high", "medium", "low", "large", "small", "moderate", "excellent", "good", "fair", "poor",
+          "adequate", "basic", "strong", "weak", "unknown", None]
+
+
+def _photo_analysis(rng: random.Random) -> dict:
+    analysis = {
+        field: rng.choice(LEVELS)
+        for field in ("business_scale", "inventory_density", "asset_quality", "housing_condition")
+        if rng.random() < 0.8
+    }
+    if rng.random() < 0.8:
+        analysis['confidence_score'] = round(rng.random(), 2)
+    return analysis
+
+
+def _note_analysis(rng: random.Random) -> dict:
+    analysis = {
+        'behavioral_insights': {
+            field: rng.choice(LEVELS)
+            for field in ("cooperation_level", "transparency", "financial_planning")
+            if rng.random() < 0.8
+        },
+        'risk_flags': [{'severity': rng.choice(["high", "medium", "low"])} for _ in range(rng.randint(0, 3))],
+    }
+    if rng.random() < 0.8:
+        analysis['sentiment_score'] = rng.choice([0.8, 0.7, 0.5, round(rng.random(), 2)])
+    if rng.random() < 0.8:
+        analysis['confidence_score'] = round(rng.random(), 2)
+    return analysis
+
+
+def _row(rng: random.Random, index: int) -> dict:
+    photos = [_photo_analysis(rng) for _ in range(rng.randint(0, 4))]
+    notes = [_note_analysis(rng) for _ in range(rng.randint(0, 3))]
+    return {
+        'id': f"a{index}",
+        'borrower_id': f"b{index}",
+        'ml_baseline_score': rng.uniform(20, 95),
+        'vision_insights': {'analyses': photos} if photos else None,
+        'nlp_insights': {'analyses': notes} if notes else None,
+        'ml_features_used': {'claimed_monthly_income': rng.randint(1, 10) * 1_000_000, 'business_type': 'Salon'},
+        'final_credit_score': 60.0,
+        'risk_category': 'medium',
+    }
+
+
+@pytest.fixture(scope="module")
+def rows():
+    rng = random.Random(3)
+    return [_row(rng, index) for index in range(300)]
+
+
+def _mean(values) -> float:
+    return sum(values) / len(values) if values else 0.0
+
+
+def test_adjustments_match_the_scalar_functions(rows):
+    vision, nlp = GeminiVisionAnalyzer(), GeminiNLPExtractor()
+
+    vision_adjustments, nlp_adjustments = RescoringEngine().adjustment_columns(rows)
+
+    expected_vision = [
+        _mean([vision.calculate_vision_score_adjustment(a, "business") for a in (row['vision_insights'] or {}).get('analyses', [])])
+        for row in rows
+    ]
+    expected_nlp = [
+        _mean([nlp.calculate_nlp_score_adjustment(a) for a in (row['nlp_insights'] or {}).get('analyses', [])])
+        for row in rows
+    ]
+    assert np.allclose(vision_adjustments, expected_vision, rtol=0, atol=1e-9)
+    assert np.allclose(nlp_adjustments, expected_nlp, rtol=0, atol=1e-9)
+
+
+def test_scores_match_the_scalar_fusion(rows):
+    engine = AdaptiveScoringEngine()
+    rescoring = RescoringEngine(engine=engine)
+    vision_adjustments, nlp_adjustments = rescoring.adjustment_columns(rows)
+
+    rescored = rescoring.rescore(rows)
+
+    for index, row in enumerate(rows):
+        score = engine._fuse_scores(row['ml_baseline_score'], vision_adjustments[index], nlp_adjustments[index])
+        assert rescored['final_credit_score'][index] == round(score, 2)
+        assert rescored['risk_category'][index] == engine._categorize_risk(score)
+    assert np.allclose(rescored['score_change'], np.round(rescored['final_credit_score'] - 60.0, 2))
+
+
+def test_rule_overrides_change_only_the_overridden_points():
+    row = {
+        'ml_baseline_score': 70.0,
+        'vision_insights': {'analyses': [{'business_scale': 'large', 'asset_quality': 'good', 'confidence_score': 1.0}]},
+    }
+
+    default_vision, _ = RescoringEngine().adjustment_columns([row])
+    overridden, _ = RescoringEngine(rules={'vision_points': {'business_scale': {'large': 10}}}).adjustment_columns([row])
+
+    # inventory_density defaults to "moderate" (1 point)
+    assert default_vision[0] == 5 + 3 + 1
+    assert overridden[0] == 10 + 3 + 1
+
+
+def test_unknown_rules_are_rejected():
+    with pytest.raises(ValueError):
+        RescoringEngine(rules={'vision_weight': 0.5})
@@ -0,0 +1,123 @@
+import random
+
+import numpy as np
+import pytest
+
+from services.scoring.adaptive_engine import AdaptiveScoringEngine, _round_values
+
+BUSINESS_TYPES = ['Warung Kelontong', 'Warung Nasi', 'Salon', 'Tailor', 'Other', '']
+BUSINESS_SCALES = ['small', 'medium', 'large']
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return AdaptiveScoringEngine()
+
+
+def _portfolio(count: int, seed: int = 7):
+    """Random borrowers with the Gemini results the scalar path reads"""
+
+    rng = random.Random(seed)
+    borrowers = []
+    for _ in range(count):
+        nlp_result = None
+        if rng.random() < 0.7:
+            nlp_result = {"insights": {"analyses": [
+                {"extracted_income_estimate": rng.choice([0, rng.randint(500_000, 8_000_000)])}
+                for _ in range(rng.randint(0, 3))
+            ]}}
+        vision_result = None
+        if rng.random() < 0.7:
+            vision_result = {"insights": {"analyses": [
+                {"business_scale": rng.choice(BUSINESS_SCALES)} for _ in range(rng.randint(0, 3))
+            ]}}
+
+        borrowers.append({
+            # Quarter points make fusion land on exact .xx5 ties
+            "baseline_score": rng.choice([rng.uniform(0, 100), rng.randint(0, 400) / 4]),
+            "vision_adjustment": rng.choice([0.0, rng.uniform(-15, 15), 0.01]) if vision_result else 0.0,
+            "nlp_adjustment": rng.choice([0.0, rng.uniform(-15, 15), 0.005]) if nlp_result else 0.0,
+            "borrower_data": {
+                "claimed_monthly_income": rng.choice([0, 1_000_005, rng.randint(300_000, 12_000_000)]),
+                "business_type": rng.choice(BUSINESS_TYPES),
+            },
+            "nlp_result": nlp_result,
+            "vision_result": vision_result,
+        })
+    return borrowers
+
+
+def _score_scalar(engine, borrower):
+    final_score = engine._fuse_scores(
+        borrower['baseline_score'], borrower['vision_adjustment'], borrower['nlp_adjustment']
+    )
+    risk_category = engine._categorize_risk(final_score)
+    borrower_data = borrower['borrower_data']
+    income_validation = engine._validate_income(
+        claimed_income=borrower_data['claimed_monthly_income'],
+        nlp_result=borrower['nlp_result'],
+        vision_result=borrower['vision_result'],
+        borrower_data=borrower_data
+    )
+    loan_recommendation = engine._recommend_loan(final_score, risk_category, income_validation, borrower_data)
+    return {
+        "final_credit_score": round(final_score, 2),
+        "risk_category": risk_category,
+        **income_validation,
+        **loan_recommendation
+    }
+
+
+def test_score_portfolio_matches_scalar_path(engine):
+    borrowers = _portfolio(500)
+    nlp_estimates, vision_factors = engine.income_signal_columns(
+        [b['nlp_result'] for b in borrowers], [b['vision_result'] for b in borrowers]
+    )
+
+    columns = engine.score_portfolio(
+        baseline_scores=[b['baseline_score'] for b in borrowers],
+        vision_adjustments=[b['vision_adjustment'] for b in borrowers],
+        nlp_adjustments=[b['nlp_adjustment'] for b in borrowers],
+        claimed_incomes=[b['borrower_data']['claimed_monthly_income'] for b in borrowers],
+        business_types=[b['borrower_data']['business_type'] for b in borrowers],
+        nlp_income_estimates=nlp_estimates,
+        vision_income_factors=vision_factors,
+    )
+
+    for index, borrower in enumerate(borrowers):
+        expected = _score_scalar(engine, borrower)
+        actual = {name: columns[name][index] for name in expected}
+        assert actual == expected, f"borrower {index}"
+
+
+def test_score_portfolio_empty(engine):
+    columns = engine.score_portfolio([], [], [], [], [])
+    assert all(len(column) == 0 for column in columns.values())
+
+
+@pytest.mark.parametrize("value, ndigits", [
+    (2.675, 2),
+    (1.005, 2),
+    (0.125, 2),
+    (0.375, 2),
+    (-2.675, 2),
+    (0.5, 0),
+    (1.5, 0),
+    (2.5, 0),
+    (-0.5, 0),
+    (1234567.125, 2),
+    (99.995, 2),
+    (0.0, 2),
+])
+def test_round_values_matches_round_on_ties(value, ndigits):
+    assert _round_values(np.array([value]), ndigits)[0] == round(value, ndigits)
+
+
+def test_round_values_keeps_shape():
+    rng = np.random.default_rng(3)
+    values = np.round(rng.uniform(-1000, 1000, size=(40, 25)) * 8) / 8 + rng.choice([0, 0.005], size=(40, 25))
+
+    rounded = _round_values(values, 2)
+
+    assert rounded.shape == values.shape
+    assert all(rounded[index] == round(float(values[index]), 2) for index in np.ndindex(values.shape))
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from services.scoring.adaptive_engine import LOAN_SIZING, SAFE_REPAYMENT_RATES, AdaptiveScoringEngine
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return AdaptiveScoringEngine()
+
+
+@pytest.mark.parametrize("risk_category", list(LOAN_SIZING))
+def test_recommended_scenario_matches_recommend_loan(engine, risk_category):
+    income_validation = {'ai_estimated_income': 3_250_000.0, 'income_consistency_score': 80}
+    recommendation = engine._recommend_loan(70.0, risk_category, income_validation, {})
+
+    simulated = engine.simulate_loans(
+        risk_category, 3_250_000.0,
+        amounts=[recommendation['recommended_loan_amount']],
+        term_weeks=[recommendation['recommended_term_weeks']],
+        income_multipliers=[1.0]
+    )
+
+    assert simulated['weekly_repayment'][0, 0, 0] == recommendation['weekly_repayment']
+    assert simulated['repayment_to_income_ratio'][0, 0, 0] == recommendation['repayment_to_income_ratio']
+    assert simulated['max_safe_loan_amount'][0, 0, 0] == recommendation['max_safe_loan_amount']
+    assert simulated['within_max_loan'][0, 0, 0]
+
+
+def test_grid_matches_scenario_by_scenario_arithmetic(engine):
+    amounts, terms, multipliers = [1_000_000, 2_500_000, 6_000_000], [12, 20, 24, 52], [0.5, 1.0, 1.5]
+
+    simulated = engine.simulate_loans("medium", 2_000_000.0, amounts, terms, multipliers)
+
+    assert simulated['loan_amount'].shape == (3, 4, 3)
+    for i, amount in enumerate(amounts):
+        for j, term in enumerate(terms):
+            for k, multiplier in enumerate(multipliers):
+                income = 2_000_000.0 * multiplier
+                weekly = amount / term
+                ratio = weekly * 4.3 / income * 100
+                assert simulated['term_weeks'][i, j, k] == term
+                assert simulated['weekly_repayment'][i, j, k] == round(weekly, 2)
+                assert simulated['repayment_to_income_ratio'][i, j, k] == round(ratio, 2)
+                assert simulated['affordable'][i, j, k] == (ratio <= SAFE_REPAYMENT_RATES["medium"] * 100)
+                assert simulated['within_max_loan'][i, j, k] == (amount <= income * LOAN_SIZING["medium"][0])
+
+
+def test_without_income_nothing_is_affordable(engine):
+    simulated = engine.simulate_loans("unknown", 0.0, [500_000], [12], [1.0, 2.0])
+
+    assert np.isinf(simulated['repayment_to_income_ratio']).all()
+    assert not simulated['affordable'].any()
+    assert not simulated['within_max_loan'].any()
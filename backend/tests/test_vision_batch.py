@@ -0,0 +1,118 @@
+import asyncio
+import json
+
+import pytest
+
+import services.gemini.vision_analyzer as vision_module
+import utils.concurrency as concurrency
+from services.gemini.vision_analyzer import GeminiVisionAnalyzer, get_vision_cache
+from services.scoring.adaptive_engine import AdaptiveScoringEngine
+
+
+@pytest.fixture
+def fake_gemini(monkeypatch):
+    """Batch requests answer for photo 1 only; single-photo requests are tracked for overlap"""
+
+    calls = {"batch": 0, "single": 0, "in_flight": 0, "max_in_flight": 0}
+
+    async def generate_text(model_name, contents, breaker=None):
+        if sum(isinstance(part, dict) for part in contents) > 1:
+            calls["batch"] += 1
+            return json.dumps({
+                "photos": [{"photo_number": 1, "business_scale": "large", "confidence_score": 0.9}],
+                "summary": "Busy warung"
+            })
+
+        calls["single"] += 1
+        calls["in_flight"] += 1
+        calls["max_in_flight"] = max(calls["max_in_flight"], calls["in_flight"])
+        await asyncio.sleep(0.05)
+        calls["in_flight"] -= 1
+        return json.dumps({"business_scale": "medium", "confidence_score": 0.8})
+
+    async def load_image(self, image_source):
+        return image_source.encode()
+
+    monkeypatch.setattr(vision_module, "generate_text", generate_text)
+    monkeypatch.setattr(GeminiVisionAnalyzer, "_load_image", load_image)
+    monkeypatch.setattr(concurrency, "_process_limiters", {})
+    get_vision_cache().clear()
+    yield calls
+    get_vision_cache().clear()
+
+
+def test_uncovered_photos_are_retried_concurrently_after_the_batch(fake_gemini, monkeypatch):
+    import services.scoring.adaptive_engine as engine_module
+
+    # Two process-wide slots: retries can only overlap if the batch gave its slot back
+    monkeypatch.setattr(engine_module.settings, "GEMINI_MAX_CONCURRENCY", 2)
+    engine = AdaptiveScoringEngine()
+    photos = [
+        {"id": f"p{index}", "storage_path": f"photo-{index}.jpg", "photo_type": "business_interior"}
+        for index in range(3)
+    ]
+
+    analyses, summary = asyncio.run(engine._analyze_photos_batched(photos, {"business_type": "Warung"}))
+
+    assert fake_gemini["batch"] == 1
+    assert fake_gemini["single"] == 2
+    assert fake_gemini["max_in_flight"] == 2
+    assert [analysis["business_scale"] for analysis in analyses] == ["large", "medium", "medium"]
+    assert summary == "Busy warung"
+
+
+def test_batch_leaves_uncovered_photos_for_the_caller(fake_gemini):
+    analyzer = GeminiVisionAnalyzer()
+    photos = [{"image_path": f"photo-{index}.jpg", "photo_type": "inventory"} for index in range(2)]
+
+    result = asyncio.run(analyzer.analyze_photos_batch(photos))
+
+    assert result["analyses"][0]["business_scale"] == "large"
+    assert result["analyses"][1] is None
+    assert fake_gemini["single"] == 0
+
+
+def test_batch_parser_keeps_the_photos_it_covers():
+    response = "```json\n" + json.dumps({
+        "photos": [
+            {"photo_number": 2, "business_scale": "small"},
+            {"photo_number": "3", "business_scale": "large"},
+        ],
+        "summary": "Small kiosk",
+    }) + "\n```"
+
+    analyses, summary = GeminiVisionAnalyzer()._parse_vision_batch_response(response, 3)
+
+    assert analyses[0] is None
+    assert [analysis["business_scale"] for analysis in analyses[1:]] == ["small", "large"]
+    assert "photo_number" not in analyses[1]
+    assert summary == "Small kiosk"
+
+
+def test_batch_parser_drops_malformed_and_out_of_range_photos():
+    response = json.dumps({
+        "photos": [
+            "not an analysis",
+            {"business_scale": "large"},
+            {"photo_number": "first", "business_scale": "large"},
+            {"photo_number": 0, "business_scale": "large"},
+            {"photo_number": 3, "business_scale": "large"},
+            {"photo_number": 1, "business_scale": "small"},
+            {"photo_number": 1, "business_scale": "large"},
+        ],
+        "summary": ["not", "a", "string"],
+    })
+
+    analyses, summary = GeminiVisionAnalyzer()._parse_vision_batch_response(response, 2)
+
+    assert analyses[0]["business_scale"] == "small"
+    assert analyses[1] is None
+    assert summary == ""
+
+
+def test_batch_parser_without_a_photos_array_covers_nothing():
+    analyzer = GeminiVisionAnalyzer()
+
+    assert analyzer._parse_vision_batch_response("No photos visible.", 2) == ([None, None], "")
+    assert analyzer._parse_vision_batch_response('{"summary": "Warung"}', 2) == ([None, None], "")
+    assert analyzer._parse_vision_batch_response('[{"photo_number": 1}]', 1) == ([None], "")
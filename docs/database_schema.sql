@@ -254,6 +254,7 @@ CREATE TABLE credit_assessments (
     -- Metadata
     assessed_at TIMESTAMPTZ DEFAULT NOW(),
     assessment_version VARCHAR(50),
+    input_fingerprint VARCHAR(64),
 
     CONSTRAINT valid_risk_category CHECK (
         risk_category IN ('low', 'medium', 'high', 'very_high')
@@ -269,6 +270,7 @@ CREATE INDEX idx_credit_assessments_borrower_id ON credit_assessments(borrower_i
 CREATE INDEX idx_credit_assessments_loan_id ON credit_assessments(loan_id);
 CREATE INDEX idx_credit_assessments_risk_category ON credit_assessments(risk_category);
 CREATE INDEX idx_credit_assessments_assessed_at ON credit_assessments(assessed_at);
+CREATE INDEX idx_credit_assessments_fingerprint ON credit_assessments(borrower_id, input_fingerprint);
 
 -- ============================================
 -- AUDIT LOG TABLE